@@ -0,0 +1,101 @@
+'''
+Bandwidth and speed of streaming games as deltas against sending a full snapshot after every step
+Games are between RandomAIPlayers. Each stream starts with a keyframe and has one every --interval steps, for late
+joiners; snapshots are serialize_state's fixed layout and pickled GameStateDicts. Encoding is per step on the
+server, applying is per step on the viewer.
+
+    python -m benchmarks.bench_delta --games 200
+'''
+import argparse
+import pickle
+import time
+from game.delta import ALL_SEATS, DeltaApplier, DeltaRecorder
+from game.mahjong import MahjongGame
+from game.player import RandomAIPlayer
+from game.serialize import deserialize_state, serialize_state
+
+
+def new_game(seed: int) -> MahjongGame:
+    game = MahjongGame(seed, verbose=False)
+    game.set_players([RandomAIPlayer(i, seed) for i in range(4)])
+    return game
+
+
+def stream(num_games: int, interval: int, reveal: frozenset[int]) -> tuple[list[list[bytes]], float]:
+    '''The messages of every game and the seconds spent recording and packing them'''
+    games = []
+    seconds = 0.0
+    for seed in range(num_games):
+        game = new_game(seed)
+        recorder = DeltaRecorder(game, interval)
+        messages = [recorder.keyframe(reveal)]
+        while not game.game_state["done"]:
+            game.step()
+            start = time.perf_counter()
+            messages.append(recorder.message(recorder.flush(), reveal))
+            if recorder.keyframe_due:
+                messages.append(recorder.keyframe(reveal))
+            seconds += time.perf_counter() - start
+        games.append(messages)
+    return games, seconds
+
+
+def snapshots(num_games: int) -> tuple[list[bytes], list[bytes], float, float]:
+    '''The snapshots after every step of every game in both formats and the seconds spent encoding each'''
+    fixed, pickled = [], []
+    fixed_seconds = pickle_seconds = 0.0
+    for seed in range(num_games):
+        game = new_game(seed)
+        while not game.game_state["done"]:
+            game.step()
+            start = time.perf_counter()
+            fixed.append(bytes(serialize_state(game.game_state)))
+            fixed_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            pickled.append(pickle.dumps(game.game_state))
+            pickle_seconds += time.perf_counter() - start
+    return fixed, pickled, fixed_seconds, pickle_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=32, help="steps between keyframes")
+    args = parser.parse_args()
+
+    fixed, pickled, fixed_seconds, pickle_seconds = snapshots(args.games)
+    steps = len(fixed)
+    print(f"{steps / args.games:.1f} steps per game")
+
+    results = {
+        "snapshot (serialize_state)": (fixed, fixed_seconds, deserialize_state),
+        "snapshot (pickle)": (pickled, pickle_seconds, pickle.loads),
+    }
+    for name, (messages, encode_seconds, decode) in results.items():
+        start = time.perf_counter()
+        for message in messages:
+            decode(message)
+        seconds = time.perf_counter() - start
+        print(
+            f"{name}: {sum(map(len, messages)) / args.games / 1024:.1f} KiB per game, "
+            f"{steps / encode_seconds:,.0f} steps/s encoded, {steps / seconds:,.0f} steps/s applied"
+        )
+
+    for name, reveal in {"deltas (all hands)": ALL_SEATS, "deltas (no hands)": frozenset()}.items():
+        games, encode_seconds = stream(args.games, args.interval, reveal)
+        start = time.perf_counter()
+        for messages in games:
+            applier = DeltaApplier()
+            for message in messages:
+                applier.apply(message)
+        seconds = time.perf_counter() - start
+        size = sum(len(message) for messages in games for message in messages)
+        keyframes = sum(len(messages[0]) for messages in games)
+        print(
+            f"{name}: {size / args.games / 1024:.1f} KiB per game ({keyframes / args.games:.0f} B first keyframe), "
+            f"{steps / encode_seconds:,.0f} steps/s encoded, {steps / seconds:,.0f} steps/s applied"
+        )
+
+
+if __name__ == "__main__":
+    main()
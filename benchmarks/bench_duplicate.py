@@ -0,0 +1,54 @@
+'''
+Variance reduction of duplicate-format evaluation against independent random deals
+Both play the same number of games between agents a and b seated as in the lineup. Independent games each get a
+fresh wall and a random rotation of the lineup, duplicate games play each wall once per rotation. The ratio of the
+per-game variances of the score difference is how many times more games independent deals need for the same
+confidence interval.
+
+    python -m benchmarks.bench_duplicate --walls 200 --a heuristic --b heuristic-fast --lineup abab
+'''
+import argparse
+import random
+import statistics
+import time
+from game.evaluate import evaluate_duplicate, format_result, play_game
+from game.league import AGENTS
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--walls", type=int, default=200)
+    parser.add_argument("--a", choices=list(AGENTS), default="heuristic")
+    parser.add_argument("--b", choices=list(AGENTS), default="heuristic-fast")
+    parser.add_argument("--lineup", default="abab", help="agent of each seat")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    agents = {"a": AGENTS[args.a], "b": AGENTS[args.b]}
+
+    start = time.perf_counter()
+    result = evaluate_duplicate(agents, list(args.lineup), range(args.seed, args.seed + args.walls), args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"duplicate ({result['games'] / elapsed:.0f} games/s)")
+    print(format_result(result))
+    difference = result["differences"]["a - b"]
+    # variance of one game's worth of the paired difference
+    dup_var = (difference["ci"] / 1.96) ** 2 * result["games"]
+
+    rng = random.Random(args.seed)
+    samples = []
+    for g in range(result["games"]):
+        shift = rng.randrange(4)
+        seating = [args.lineup[(seat - shift) % 4] for seat in range(4)]
+        payoffs = play_game(agents, seating, args.seed + args.walls + g)
+        a = [payoff for name, payoff in zip(seating, payoffs) if name == "a"]
+        b = [payoff for name, payoff in zip(seating, payoffs) if name == "b"]
+        samples.append(statistics.fmean(a) - statistics.fmean(b))
+    ind_var = statistics.variance(samples)
+    ci = 1.96 * (ind_var / len(samples)) ** 0.5
+    print(f"independent\na - b: {statistics.fmean(samples):+.3f} +- {ci:.3f} faan per game")
+    print(f"games needed, independent / duplicate: {ind_var / dup_var:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+'''
+Speed of the exact endgame solver by number of tiles left in the wall
+Positions are states between steps of games between RandomAIPlayers with the wall down to the given size.
+Positions are solved with a fresh transposition table each, so the node counts do not depend on the order.
+
+    python -m benchmarks.bench_endgame --positions 10 --max-wall 3
+'''
+import argparse
+import statistics
+from game.endgame import EndgameSolver
+from game.scenario import snapshot_states
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=10, help="positions per wall size")
+    parser.add_argument("--max-wall", type=int, default=3)
+    parser.add_argument("--max-nodes", type=int, default=1_000_000)
+    parser.add_argument("--max-time", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for wall in range(1, args.max_wall + 1):
+        states = snapshot_states(args.positions, lambda s: len(s["wall"]) == wall, seed=args.seed)
+        results = [EndgameSolver(args.max_nodes, args.max_time).solve(state) for state in states]
+        solved = [result for result in results if result["solved"]]
+        nodes = sum(result["nodes"] for result in results)
+        seconds = sum(result["seconds"] for result in results)
+        decided = sum(1 for result in solved if result["values"] and any(result["values"]))
+        hit_rate = statistics.fmean(result["table"]["hit_rate"] for result in results)
+        print(
+            f"wall {wall}: {len(solved)}/{len(results)} solved, {decided} with a nonzero value, "
+            f"{nodes / len(results):,.0f} nodes and {seconds / len(results):.3f} s per position, "
+            f"{nodes / seconds:,.0f} nodes/s, table hit rate {hit_rate:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
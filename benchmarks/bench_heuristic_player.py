@@ -0,0 +1,66 @@
+'''
+Decision latency of HeuristicAIPlayer and its win rate against RandomAIPlayer
+One heuristic seat plays three random seats, rotating the heuristic seat every game
+
+    python -m benchmarks.bench_heuristic_player --games 1000 --budget 50e-6
+'''
+import argparse
+import contextlib
+import os
+import time
+from game.mahjong import MahjongGame, WINDS
+from game.player import Player, HeuristicAIPlayer, RandomAIPlayer
+
+
+def play_game(heuristic: HeuristicAIPlayer, seat: int, seed: int) -> MahjongGame:
+    heuristic.id = seat
+    players: list[Player] = [RandomAIPlayer(i, seed) for i in range(4)]
+    players[seat] = heuristic
+    game = MahjongGame(seed)
+    game.set_players(players)
+    while not game.game_state["done"]:
+        game.step()
+    return game
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--budget", type=float, default=50e-6, help="per-decision budget in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=200, help="games played first to fill the shanten caches")
+    args = parser.parse_args()
+
+    heuristic = HeuristicAIPlayer(0, budget=args.budget)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for g in range(args.warmup):
+            play_game(heuristic, g % 4, -1 - g)
+    heuristic.num_decisions = 0
+    heuristic.total_time = 0.0
+    heuristic.max_time = 0.0
+
+    wins = {"heuristic": 0, "random": 0, "draw": 0}
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for g in range(args.games):
+            seat = g % 4
+            game = play_game(heuristic, seat, args.seed + g)
+            if game.game_state["draw"]:
+                wins["draw"] += 1
+            elif WINDS.index(game.game_state["winning_hand_state"]["seat_wind"]) == seat:
+                wins["heuristic"] += 1
+            else:
+                wins["random"] += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"games: {args.games} ({args.games / elapsed:.1f} games/s)")
+    print(f"budget: {args.budget * 1e6:.1f} us")
+    print(f"decisions: {heuristic.num_decisions}")
+    print(f"mean latency: {heuristic.mean_time * 1e6:.1f} us, max latency: {heuristic.max_time * 1e6:.1f} us")
+    print(f"heuristic win rate: {wins['heuristic'] / args.games:.3f} (1 seat)")
+    print(f"random win rate: {wins['random'] / args.games:.3f} (3 seats combined)")
+    print(f"draw rate: {wins['draw'] / args.games:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+'''
+Search throughput of ISMCTSPlayer, optionally spreading iterations over a process pool,
+and its results against three HeuristicAIPlayers
+
+    python -m benchmarks.bench_ismcts --games 4 --budget 0.5 --workers 4
+'''
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game.ismcts import ISMCTSPlayer
+from game.mahjong import MahjongGame
+from game.player import Player, HeuristicAIPlayer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=0.5, help="search time per decision in seconds")
+    parser.add_argument("--workers", type=int, default=0, help="size of the process pool (0 searches in-process)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    executor = ProcessPoolExecutor(args.workers) if args.workers else None
+    player = ISMCTSPlayer(0, budget=args.budget, executor=executor, num_workers=max(args.workers, 1), seed=args.seed)
+    payoff = 0
+    start = time.perf_counter()
+    try:
+        for g in range(args.games):
+            seat = g % 4
+            player.id = seat
+            players: list[Player] = [HeuristicAIPlayer(i) for i in range(4)]
+            players[seat] = player
+            game = MahjongGame(args.seed + g, verbose=False)
+            game.set_players(players)
+            while not game.game_state["done"]:
+                game.step()
+            payoff += game.get_payoffs()[seat]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    print(f"games: {args.games} in {elapsed:.1f} s")
+    print(f"searches: {player.searches}, iterations: {player.iterations}")
+    print(f"iterations/s: {player.iterations_per_second:.1f}")
+    print(f"mean payoff vs heuristic players: {payoff / args.games:.2f} faan/game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+'''
+Cost of starting games: a new MahjongGame for every deal (with set_players, as runners used to) against games from a
+GamePool, which are reset in place. Reports deals/s, whole games/s between RandomAIPlayers and the memory a deal
+allocates (tracemalloc peak over the deal).
+
+    python -m benchmarks.bench_reset --games 2000
+'''
+import argparse
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from game.mahjong import GamePool, MahjongGame
+from game.player import Player, RandomAIPlayer
+
+Dealer = Callable[[int, list[Player]], Iterator[MahjongGame]]
+
+
+@contextmanager
+def new_game(seed: int, players: list[Player]) -> Iterator[MahjongGame]:
+    game = MahjongGame(seed, verbose=False)
+    game.set_players(players)
+    yield game
+
+
+def deal_kib(deal: Dealer, players: list[Player], n: int = 100) -> float:
+    '''Mean KiB allocated over a deal, at its peak'''
+    sizes = []
+    tracemalloc.start()
+    for seed in range(n):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        with deal(seed, players):
+            sizes.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return statistics.fmean(sizes) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    args = parser.parse_args()
+
+    pool = GamePool(1)
+    dealers: dict[str, Dealer] = {"new game": new_game, "pool reset": pool.game}
+    players: list[Player] = [RandomAIPlayer(i, 0) for i in range(4)]
+    for name, deal in dealers.items():
+        start = time.perf_counter()
+        for seed in range(args.games):
+            with deal(seed, players):
+                pass
+        deals = args.games / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for seed in range(args.games):
+            with deal(seed, [RandomAIPlayer(i, seed) for i in range(4)]) as game:
+                while not game.game_state["done"]:
+                    game.step()
+        games = args.games / (time.perf_counter() - start)
+        kib = deal_kib(deal, players)
+        print(f"{name}: {deals:,.0f} deals/s, {games:,.0f} games/s, {kib:.1f} KiB allocated per deal")
+
+
+if __name__ == "__main__":
+    main()
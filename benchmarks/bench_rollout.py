@@ -0,0 +1,131 @@
+'''
+Decisions per second moved from worker processes to the learner through a SharedRolloutBuffer, against
+multiprocessing.Queue carrying one pickled decision, or one pickled chunk of arrays, per message
+Workers replay decisions recorded from heuristic games, so only the transport is measured. The learner's CPU time
+per decision is what the transport costs the process that also has to train.
+
+    python -m benchmarks.bench_rollout --workers 4 --decisions 20000
+'''
+import argparse
+import multiprocessing as mp
+import time
+from game.dataset import RecordingPlayer, empty_batch
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+from game.rollout import RolloutWriter, SharedRolloutBuffer
+
+Decision = tuple[list[int], list[int], int, int]
+
+
+def record_decisions(num_games: int) -> list[Decision]:
+    decisions: list[Decision] = []
+    for seed in range(num_games):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([RecordingPlayer(HeuristicAIPlayer(i), decisions) for i in range(4)])
+        while not game.game_state["done"]:
+            game.step()
+    return decisions
+
+
+def queue_worker(decisions: list[Decision], num: int, out: mp.Queue) -> None:
+    for i in range(num):
+        obs, mask, action, seat = decisions[i % len(decisions)]
+        out.put((obs, mask, action, seat, 0))
+    out.put(None)
+
+
+def queue_chunk_worker(decisions: list[Decision], num: int, chunk_size: int, out: mp.Queue) -> None:
+    batch = empty_batch(chunk_size)
+    size = 0
+    for i in range(num):
+        obs, mask, action, seat = decisions[i % len(decisions)]
+        batch["obs"][size] = obs
+        batch["mask"][size] = mask
+        batch["action"][size] = action
+        batch["seat"][size] = seat
+        size += 1
+        if size == chunk_size or i == num - 1:
+            out.put({key: value[:size] for key, value in batch.items()})
+            size = 0
+    out.put(None)
+
+
+def shm_worker(decisions: list[Decision], num: int, writer: RolloutWriter) -> None:
+    for i in range(num):
+        obs, mask, action, seat = decisions[i % len(decisions)]
+        writer.add(obs, mask, action, seat, 0)
+    writer.close()
+
+
+def run_queue(decisions: list[Decision], workers: int, num: int, chunk_size: int | None) -> tuple[float, float]:
+    out: mp.Queue = mp.Queue(maxsize=1024)
+    if chunk_size is None:
+        procs = [mp.Process(target=queue_worker, args=(decisions, num, out)) for _ in range(workers)]
+    else:
+        procs = [mp.Process(target=queue_chunk_worker, args=(decisions, num, chunk_size, out)) for _ in range(workers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    cpu_start = time.process_time()
+    done = received = 0
+    while done < workers:
+        item = out.get()
+        if item is None:
+            done += 1
+        elif chunk_size is None:
+            received += 1
+        else:
+            received += len(item["action"])
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    for p in procs:
+        p.join()
+    assert received == workers * num
+    return received / elapsed, cpu / received
+
+
+def run_shm(decisions: list[Decision], workers: int, num: int, chunk_size: int) -> tuple[float, float]:
+    with SharedRolloutBuffer(workers, chunk_size=chunk_size, num_chunks=8) as buffer:
+        procs = [mp.Process(target=shm_worker, args=(decisions, num, buffer.make_writer(w))) for w in range(workers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        cpu_start = time.process_time()
+        received = 0
+        while received < workers * num:
+            item = buffer.get()
+            assert item is not None
+            w, chunk = item
+            received += int(chunk["action"].size)
+            del chunk
+            buffer.release(w)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        for p in procs:
+            p.join()
+    return received / elapsed, cpu / received
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--decisions", type=int, default=20000, help="decisions sent by each worker")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--games", type=int, default=20, help="games recorded for the decisions")
+    args = parser.parse_args()
+
+    decisions = record_decisions(args.games)
+    print(f"{len(decisions)} recorded decisions, {args.workers} workers x {args.decisions} decisions")
+    results = {
+        "mp.Queue, one decision per message": run_queue(decisions, args.workers, args.decisions, None),
+        f"mp.Queue, {args.chunk_size} decisions per message": run_queue(
+            decisions, args.workers, args.decisions, args.chunk_size
+        ),
+        "SharedRolloutBuffer": run_shm(decisions, args.workers, args.decisions, args.chunk_size)
+    }
+    for name, (rate, cpu) in results.items():
+        print(f"{name}: {rate:,.0f} decisions/s, learner CPU {cpu * 1e6:.2f} us/decision")
+
+
+if __name__ == "__main__":
+    main()
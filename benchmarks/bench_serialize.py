@@ -0,0 +1,61 @@
+'''
+Size and speed of serialize_state/deserialize_state against pickling the GameStateDict
+States are taken after every step of games between HeuristicAIPlayers
+
+    python -m benchmarks.bench_serialize --games 20
+'''
+import argparse
+import pickle
+import time
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+from game.serialize import STATE_SIZE, serialize_state, deserialize_state
+from game.utils import GameStateDict, copy_game_state
+
+
+def collect_states(num_games: int) -> list[GameStateDict]:
+    states = []
+    for seed in range(num_games):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([HeuristicAIPlayer(i) for i in range(4)])
+        while not game.game_state["done"]:
+            game.step()
+            states.append(copy_game_state(game.game_state))
+    return states
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20)
+    args = parser.parse_args()
+
+    states = collect_states(args.games)
+    print(f"states: {len(states)}")
+
+    start = time.perf_counter()
+    pickled = [pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL) for state in states]
+    dump = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in pickled:
+        pickle.loads(data)
+    load = time.perf_counter() - start
+    size = sum(map(len, pickled)) / len(states)
+    print(f"pickle: {size:.0f} bytes, dumps {dump / len(states) * 1e6:.1f} us, loads {load / len(states) * 1e6:.1f} us")
+
+    pool = memoryview(bytearray(len(states) * STATE_SIZE))
+    start = time.perf_counter()
+    for i, state in enumerate(states):
+        serialize_state(state, pool, i * STATE_SIZE)
+    dump = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(len(states)):
+        deserialize_state(pool, i * STATE_SIZE)
+    load = time.perf_counter() - start
+    print(
+        f"serialize_state: {STATE_SIZE} bytes, serialize {dump / len(states) * 1e6:.1f} us, "
+        f"deserialize {load / len(states) * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
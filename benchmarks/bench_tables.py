@@ -0,0 +1,58 @@
+'''
+Import time and first-call latency of the rule tables, each measured in a fresh interpreter
+The first call either builds the tables and writes them to an empty cache (cold) or maps the cached files (warm)
+
+    python -m benchmarks.bench_tables --runs 5
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+IMPORT = '''
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+FIRST_CALL = '''
+import time
+import numpy as np
+from game.batch import check_win_batch
+counts = np.zeros((1, 34), dtype=np.int8)
+counts[0, :14] = 1
+start = time.perf_counter()
+check_win_batch(counts)
+print(time.perf_counter() - start)
+'''
+
+
+def run(code: str, table_dir: str) -> float:
+    env = {**os.environ, "HKMAHJONG_TABLES": table_dir}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        for module in ("game.utils", "game.batch"):
+            times = [run(IMPORT.format(module=module), table_dir) for _ in range(args.runs)]
+            print(f"import {module}: {statistics.median(times) * 1e3:.1f} ms")
+
+        cold = []
+        for i in range(args.runs):
+            cold.append(run(FIRST_CALL, os.path.join(table_dir, str(i))))
+        warm = [run(FIRST_CALL, os.path.join(table_dir, "0")) for _ in range(args.runs)]
+        print(f"first check_win_batch call, cold cache: {statistics.median(cold) * 1e3:.1f} ms")
+        print(f"first check_win_batch call, warm cache: {statistics.median(warm) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+'''
+Self-play throughput on a pool of threads, by number of threads
+Games are independent, so on a free-threaded interpreter (python3.13t and later with the GIL disabled) games per
+second should scale with the threads up to the number of cores; with the GIL they stay flat or drop.
+
+    python -m benchmarks.bench_threads --games 40 --max-threads 8
+'''
+import argparse
+import os
+import sys
+import time
+from game.evaluate import play_games
+from game.player import HeuristicAIPlayer, Player, RandomAIPlayer
+
+
+def heuristic(seat: int, seed: int) -> Player:
+    return HeuristicAIPlayer(seat, budget=float("inf"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--agent", choices=["random", "heuristic"], default="heuristic")
+    args = parser.parse_args()
+
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if is_gil_enabled() else 'disabled'}, "
+          f"{os.cpu_count()} cpus")
+    agents = {"agent": heuristic if args.agent == "heuristic" else RandomAIPlayer}
+    seeds = range(args.games)
+    serial = None
+    base = 0.0
+    threads = 1
+    while threads <= args.max_threads:
+        start = time.perf_counter()
+        payoffs = play_games(agents, ["agent"] * 4, seeds, threads)
+        rate = args.games / (time.perf_counter() - start)
+        serial = serial or payoffs
+        base = base or rate
+        assert payoffs == serial, "threaded games differ from the serial ones"
+        print(f"{threads} threads: {rate:.1f} games/s, {rate / base:.2f}x")
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Latency of calc_ukeire against checking every (discard, draw) pair with calc_shanten
+Hands are the 14-tile hands of players about to discard in games between heuristic players
+
+    python -m benchmarks.bench_ukeire --games 50
+'''
+import argparse
+import time
+from game.constants import NUM_TILES
+from game.mahjong import MahjongGame
+from game.player import Player, HeuristicAIPlayer
+from game.tile import Suit
+from game.utils import GameStateDict, tiles_to_counts, calc_shanten, calc_ukeire
+
+
+class RecordingPlayer(HeuristicAIPlayer):
+    '''Records the hand and visible tiles of every discard decision'''
+
+    def __init__(self, id: int, hands: list[tuple[list[int], list[int], int]]) -> None:
+        super().__init__(id)
+        self.hands = hands
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        player_state = state["players"][self.id]
+        num_melds = sum(1 for meld in player_state["melds"] if meld[0].suit != Suit.FLOWER)
+        self.hands.append((tiles_to_counts(player_state["hand"]), state["visible"].copy(), num_melds))
+        return super().query_discard(state, sorted_hand)
+
+
+def brute_force(counts: list[int], num_melds: int) -> dict[int, list[int]]:
+    result = {}
+    for discard in range(NUM_TILES):
+        if not counts[discard]:
+            continue
+        counts[discard] -= 1
+        shanten = calc_shanten(counts, num_melds)
+        accepted = []
+        for draw in range(NUM_TILES):
+            if counts[draw] < 4:
+                counts[draw] += 1
+                if calc_shanten(counts, num_melds) < shanten:
+                    accepted.append(draw)
+                counts[draw] -= 1
+        counts[discard] += 1
+        result[discard] = accepted
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hands: list[tuple[list[int], list[int], int]] = []
+    for g in range(args.games):
+        players: list[Player] = [RecordingPlayer(i, hands) for i in range(4)]
+        game = MahjongGame(args.seed + g, verbose=False)
+        game.set_players(players)
+        while not game.game_state["done"]:
+            game.step()
+
+    # first passes fill the per-suit decomposition caches, both methods share them
+    for counts, visible, num_melds in hands:
+        calc_ukeire(counts, visible, num_melds)
+        brute_force(counts, num_melds)
+
+    start = time.perf_counter()
+    for counts, visible, num_melds in hands:
+        calc_ukeire(counts, visible, num_melds)
+    ukeire_time = (time.perf_counter() - start) / len(hands)
+
+    start = time.perf_counter()
+    for counts, _, num_melds in hands:
+        brute_force(counts, num_melds)
+    brute_time = (time.perf_counter() - start) / len(hands)
+
+    print(f"hands: {len(hands)}")
+    print(f"calc_ukeire: {ukeire_time * 1e3:.3f} ms/hand")
+    print(f"calc_shanten per (discard, draw): {brute_time * 1e3:.3f} ms/hand ({brute_time / ukeire_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
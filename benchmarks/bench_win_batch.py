@@ -0,0 +1,67 @@
+'''
+Throughput of check_win_batch against check_win, on 14-tile concealed hands
+Half the hands are dealt from a narrow range of tiles so that some of them are wins
+
+    python -m benchmarks.bench_win_batch --hands 200000
+'''
+import argparse
+import time
+import numpy as np
+from game.batch import check_win_batch
+from game.constants import ID_TO_TILE, NUM_TILES
+from game.utils import PlayerStateDict, check_win, score_hand
+
+
+def deal_hands(num_hands: int, rng: np.random.Generator) -> np.ndarray:
+    wall = np.repeat(np.arange(NUM_TILES), 4)
+    order = np.argsort(rng.random((num_hands, len(wall))), axis=1)[:, :14]
+    tiles = wall[order]
+    # the second half only uses 9 consecutive tile ids
+    narrow = np.arange(num_hands) >= num_hands // 2
+    low = rng.integers(0, NUM_TILES - 9, num_hands)
+    narrow_order = np.argsort(rng.random((narrow.sum(), 36)), axis=1)[:, :14]
+    tiles[narrow] = low[narrow, None] + narrow_order // 4
+    counts = np.zeros((num_hands, NUM_TILES), dtype=np.int8)
+    np.add.at(counts, (np.arange(num_hands)[:, None], tiles), 1)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hands", type=int, default=200000)
+    parser.add_argument("--scalar-hands", type=int, default=5000, help="hands checked with check_win")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    counts = deal_hands(args.hands, rng)
+    player_state: PlayerStateDict = {"id": 0, "seat_wind": "east", "hand": [], "melds": [], "discards": []}
+
+    start = time.perf_counter()
+    check_win_batch(counts[:1])
+    print(f"table build: {time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    wins = check_win_batch(counts, player_state, self_pick=True)
+    elapsed = time.perf_counter() - start
+    print(f"hands: {args.hands}, wins: {wins.mean():.3f}")
+    print(f"check_win_batch: {args.hands / elapsed:,.0f} hands/s")
+
+    start = time.perf_counter()
+    check_win_batch(counts, player_state, self_pick=True, round_wind="east", faan=True)
+    elapsed = time.perf_counter() - start
+    print(f"check_win_batch with faan: {args.hands / elapsed:,.0f} hands/s")
+
+    hands = [[ID_TO_TILE[t] for t in np.repeat(np.arange(NUM_TILES), row)] for row in counts[:args.scalar_hands]]
+    start = time.perf_counter()
+    for hand in hands:
+        melds, hand_state = check_win({**player_state, "hand": hand}, None, True)
+        if melds:
+            hand_state["round_wind"] = "east"
+            score_hand(melds, hand_state)
+    elapsed = time.perf_counter() - start
+    print(f"check_win + score_hand: {len(hands) / elapsed:,.0f} hands/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+'''
+Suit-permutation augmentation of encoded decisions
+
+The three number suits are interchangeable under the rules, so relabelling them turns every recorded decision
+into six equivalent ones. A permutation is a tuple perm where suit s (0 DOT, 1 BAMBOO, 2 CHARACTER) becomes suit
+perm[s]. Observations and action masks are permuted by gathering with precomputed index arrays, action indices
+by a lookup table, so whole batches are augmented in a few array operations.
+'''
+from __future__ import annotations
+import itertools
+from functools import lru_cache
+from typing import Sequence
+import numpy as np
+from game.constants import Action, Observation, ID_TO_TILE, TILE_TO_ID, NUM_ACTIONS, NUM_OBSERVATIONS, NUM_TILES
+from game.tile import Suit, Tile
+from game.utils import GameStateDict, copy_game_state
+
+SuitPermutation = tuple[int, int, int]
+
+# identity first
+SUIT_PERMUTATIONS: list[SuitPermutation] = [(a, b, c) for a, b, c in itertools.permutations(range(3))]
+
+# first index of every block of 34 tile counts in an observation
+_OBS_TILE_BLOCKS = [Observation.HAND] + [
+    start + seat * NUM_TILES for start in (Observation.MELDS, Observation.DISCARDS) for seat in range(4)
+]
+
+
+@lru_cache
+def tile_permutation(perm: SuitPermutation) -> np.ndarray:
+    '''Returns the new id of every tile id, honors are left in place'''
+    ids = np.arange(NUM_TILES)
+    number = ids < 27
+    ids[number] = np.asarray(perm)[ids[number] // 9] * 9 + ids[number] % 9
+    ids.flags.writeable = False
+    return ids
+
+
+@lru_cache
+def _index_arrays(perm: SuitPermutation) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''(observation gather index, action gather index, action map) of a permutation'''
+    tiles = tile_permutation(perm)
+    chows = np.arange(21)
+    chows = np.asarray(perm)[chows // 7] * 7 + chows % 7
+
+    action_map = np.arange(NUM_ACTIONS)
+    for start, new_ids in ((Action.DISCARD, tiles), (Action.CHOW, chows), (Action.PUNG, tiles), (Action.KONG, tiles)):
+        action_map[start:start + len(new_ids)] = start + new_ids
+    obs_map = np.arange(NUM_OBSERVATIONS)
+    for start in _OBS_TILE_BLOCKS:
+        obs_map[start:start + NUM_TILES] = start + tiles
+
+    # the maps send each original entry to its new position, gathering needs the inverse
+    obs_gather = np.argsort(obs_map)
+    action_gather = np.argsort(action_map)
+    for arr in (obs_gather, action_gather, action_map):
+        arr.flags.writeable = False
+    return obs_gather, action_gather, action_map
+
+
+def permute_observations(obs: np.ndarray, perm: SuitPermutation) -> np.ndarray:
+    '''Permutes the suits of one observation or a batch of them (last axis)'''
+    return np.asarray(obs)[..., _index_arrays(perm)[0]]
+
+
+def permute_masks(masks: np.ndarray, perm: SuitPermutation) -> np.ndarray:
+    '''Permutes the suits of one action mask or a batch of them (last axis)'''
+    return np.asarray(masks)[..., _index_arrays(perm)[1]]
+
+
+def permute_actions(actions: np.ndarray | int, perm: SuitPermutation) -> np.ndarray:
+    '''Permutes the suits of action indices'''
+    return _index_arrays(perm)[2][actions]
+
+
+def augment_batch(
+    obs: np.ndarray,
+    masks: np.ndarray,
+    actions: np.ndarray,
+    perms: Sequence[SuitPermutation] = SUIT_PERMUTATIONS
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns a batch of decisions under every permutation in perms, as len(perms) * N rows
+    Rows are grouped by permutation -- rows k*N..(k+1)*N-1 are the whole batch under perms[k]
+    '''
+    obs, masks, actions = np.asarray(obs), np.asarray(masks), np.asarray(actions)
+    obs_gather, action_gather, action_map = (np.stack(arrs) for arrs in zip(*map(_index_arrays, perms)))
+    num = len(perms) * len(obs)
+    # take on the last axis gives (N, P, width), moving the permutation axis first keeps the groups contiguous
+    new_obs = np.take(obs, obs_gather, axis=-1).swapaxes(0, 1).reshape(num, NUM_OBSERVATIONS)
+    new_masks = np.take(masks, action_gather, axis=-1).swapaxes(0, 1).reshape(num, NUM_ACTIONS)
+    new_actions = action_map[:, actions].reshape(num)
+    return new_obs, new_masks, new_actions
+
+
+def permute_tile(tile: Tile, perm: SuitPermutation) -> Tile:
+    if tile.suit == Suit.FLOWER:
+        return tile
+    return ID_TO_TILE[tile_permutation(perm)[TILE_TO_ID[tile]]]
+
+
+def permute_state(game_state: GameStateDict, perm: SuitPermutation) -> GameStateDict:
+    '''Returns a copy of the game state with the suits of every tile permuted'''
+    new_state = copy_game_state(game_state)
+    new_state["wall"] = [permute_tile(tile, perm) for tile in game_state["wall"]]
+    visible = [0] * NUM_TILES
+    for tile_id, new_id in enumerate(tile_permutation(perm)):
+        visible[new_id] = game_state["visible"][tile_id]
+    new_state["visible"] = visible
+    for player_state in new_state["players"].values():
+        player_state["hand"] = [permute_tile(tile, perm) for tile in player_state["hand"]]
+        player_state["melds"] = [[permute_tile(tile, perm) for tile in meld] for meld in player_state["melds"]]
+        player_state["discards"] = [permute_tile(tile, perm) for tile in player_state["discards"]]
+    return new_state
@@ -0,0 +1,285 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Literal, overload
+import numpy as np
+from game.constants import ID_TO_TILE, NUM_TILES
+from game.tables import INCOMPLETE, SETS, SETS_AND_PAIR, SUIT_WEIGHTS, load_tables
+from game.tile import Suit
+from game.utils import FAAN, WIND_VALUES, PlayerStateDict, check_win, score_hand
+
+
+_ORPHAN_IDS = np.array([0, 8, 9, 17, 18, 26] + list(range(27, NUM_TILES)))
+_SIMPLE_IDS = np.array([i for i in range(27) if i % 9 not in (0, 8)])  # number tiles 2 to 8
+
+
+@lru_cache(maxsize=None)
+def _block_tables() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''The "win" tables of game.tables, loaded from the table cache'''
+    tables = load_tables("win")
+    return (
+        tables["suit_kinds"], tables["chow_kinds"], tables["honor_kinds"], tables["all_honors"], tables["complete"]
+    )
+
+
+def _combine(kinds: np.ndarray, honor_kinds: np.ndarray) -> np.ndarray:
+    '''Index into the complete table of the (rows, 3) number suit kinds and the honor kinds'''
+    return 27 * kinds[:, 0] + 9 * kinds[:, 1] + 3 * kinds[:, 2] + honor_kinds
+
+
+class _Exposed:
+    '''The faan relevant facts about one player's exposed melds (incl. flowers) and winds'''
+
+    def __init__(self, melds_info: PlayerStateDict | None, round_wind: str | None) -> None:
+        melds = melds_info["melds"] if melds_info is not None else []
+        seat_wind = melds_info["seat_wind"] if melds_info is not None else None
+        self.num_melds = 0
+        self.chows = self.pungs = self.kongs = 0
+        self.dragons = self.winds = 0
+        self.suits = np.zeros(5, dtype=np.bool_)  # number suits, dragons, winds
+        self.orphan = True
+        self.const = 0  # faan that do not depend on the concealed tiles
+
+        flowers = [int(meld[0].value) for meld in melds if meld[0].suit == Suit.FLOWER]
+        if not flowers:
+            self.const += FAAN["no_flowers"]
+        for flower in flowers:
+            if ["east", "south", "west", "north"][(flower - 1) % 4] == seat_wind:
+                self.const += FAAN["own_flower"]
+        for first in (1, 5):  # flowers, then seasons
+            if all(value in flowers for value in range(first, first + 4)):
+                self.const += FAAN["set_of_flowers"]
+
+        for meld in melds:
+            tile = meld[0]
+            if tile.suit == Suit.FLOWER:
+                continue
+            self.num_melds += 1
+            self.suits[[Suit.DOT, Suit.BAMBOO, Suit.CHARACTER, Suit.DRAGON, Suit.WIND].index(tile.suit)] = True
+            simple = tile.suit not in (Suit.DRAGON, Suit.WIND) and tile.value not in ("1", "9")
+            if len(meld) == 3 and meld[1] != tile:
+                self.chows += 1
+                self.orphan = False
+                continue
+            if len(meld) == 4:
+                self.kongs += 1
+            else:
+                self.pungs += 1
+            if simple:
+                self.orphan = False
+            if tile.suit == Suit.DRAGON:
+                self.dragons += 1
+            elif tile.suit == Suit.WIND:
+                self.winds += 1
+                self.const += FAAN["round_wind"] * (tile.value == round_wind)
+                self.const += FAAN["seat_wind"] * (tile.value == seat_wind)
+        if self.num_melds == 0:
+            self.const += FAAN["concealed_hand"]
+        self.concealed = self.num_melds == 0
+        # faan of a concealed pung of each wind
+        self.wind_faan = np.array([
+            FAAN["round_wind"] * (wind == round_wind) + FAAN["seat_wind"] * (wind == seat_wind)
+            for wind in WIND_VALUES
+        ])
+
+
+def _is_nine_gates(gates: np.ndarray) -> np.ndarray:
+    '''Which rows of (rows, 9) counts of a suit hold every number and exactly three 1s and three 9s'''
+    return (gates >= 1).all(axis=1) & (gates[:, 0] == 3) & (gates[:, 8] == 3)
+
+
+def _score_rows(
+    counts: np.ndarray,
+    base: np.ndarray,
+    self_pick: np.ndarray,
+    has_tiles: bool,
+    exposed: _Exposed,
+    thirteen_orphans: np.ndarray
+) -> np.ndarray:
+    '''
+    Faan of complete rows of (rows, NUM_TILES) counts, as scored by score_hand for their best meld combination
+    base is each row before its tile was added. Only the choice between chows and pungs depends on how a hand
+    is split into melds, so the best split is whichever of all pungs or all chows is possible.
+    '''
+    _, chow_kinds, _, _, complete = _block_tables()
+    honors = counts[:, 27:]
+    suited = counts[:, :27].reshape(-1, 3, 9)
+    dragons = (honors[:, :3] == 3).sum(axis=1) + exposed.dragons
+    wind_pungs = honors[:, 3:] == 3
+    winds = wind_pungs.sum(axis=1) + exposed.winds
+    score = exposed.const + FAAN["self_pick"] * self_pick + wind_pungs @ exposed.wind_faan
+
+    # all pungs (or kongs) -- every count is a pung but one pair
+    pung_split = ((counts == 0) | (counts == 3) | (counts == 2)).all(axis=1) & ((counts == 2).sum(axis=1) == 1)
+    all_pungs = pung_split & (exposed.chows == 0)
+    # common hand -- only chows
+    honor_kinds = np.where(
+        ~honors.any(axis=1),
+        SETS,
+        np.where(((honors == 0) | (honors == 2)).all(axis=1) & (honors.sum(axis=1) == 2), SETS_AND_PAIR, INCOMPLETE)
+    )
+    chow_split = complete[_combine(chow_kinds[suited @ SUIT_WEIGHTS], honor_kinds)]
+    common = chow_split & (exposed.pungs == 0) & (exposed.kongs == 0)
+    score += np.where(
+        all_pungs,
+        FAAN["eighteen_arhats"] if exposed.kongs == 4 else FAAN["all_pung_kong"],
+        np.where(common, FAAN["common_hand"], 0)
+    )
+
+    number_suits = (suited.any(axis=2) | exposed.suits[:3]).sum(axis=1)
+    has_dragons = honors[:, :3].any(axis=1) | exposed.suits[3]
+    has_winds = honors[:, 3:].any(axis=1) | exposed.suits[4]
+    num_suits = number_suits + has_dragons + has_winds
+    has_honors = has_dragons | has_winds
+    both = has_dragons & has_winds
+    orphan = ~counts[:, _SIMPLE_IDS].any(axis=1) & exposed.orphan
+    score += FAAN["half_flush"] * (has_honors & np.where(both, num_suits == 3, num_suits == 2))
+    score += FAAN["all_honors"] * (both & (num_suits == 2))
+    score += FAAN["great_dragons"] * (dragons == 3)
+    score += FAAN["small_dragons"] * ((dragons == 2) & (honors[:, :3] == 2).any(axis=1))
+    score += FAAN["great_winds"] * (winds == 4)
+    score += FAAN["small_winds"] * ((winds == 3) & (honors[:, 3:] == 2).any(axis=1))
+    score += FAAN["mixed_orphans"] * (has_honors & orphan)
+    score += FAAN["full_flush"] * (~has_honors & (num_suits == 1))
+    score += FAAN["orphans"] * (~has_honors & orphan)
+    score += dragons
+    score = np.minimum(score, 13)
+
+    # nine gates -- 1112345678999 of one suit and one more of the same suit, concealed
+    rows = np.arange(len(counts))
+    suit = suited.sum(axis=2).argmax(axis=1)
+    gates = suited[rows, suit]
+    single_suit = gates.sum(axis=1) == counts.sum(axis=1)
+    if has_tiles:
+        gates_before = base[:, :27].reshape(-1, 3, 9)[rows, suit]
+        on_discard = _is_nine_gates(gates_before)
+    else:
+        # without the discard, any tile of the hand could have been the one that completed it
+        on_discard = (gates >= 1).all(axis=1) & (gates[:, 0] >= 3) & (gates[:, 8] >= 3)
+    nine_gates = single_suit & np.where(self_pick, _is_nine_gates(gates), on_discard & exposed.concealed)
+    score[nine_gates] = FAAN["nine_gates"]
+    score[thirteen_orphans] = FAAN["thirteen_orphans"]
+    return score
+
+
+@overload
+def check_win_batch(
+    counts: np.ndarray,
+    melds_info: PlayerStateDict | list[PlayerStateDict] | None = None,
+    tiles: np.ndarray | None = None,
+    self_pick: bool | np.ndarray = False,
+    round_wind: str | None = None,
+    faan: Literal[False] = False
+) -> np.ndarray: ...
+
+
+@overload
+def check_win_batch(
+    counts: np.ndarray,
+    melds_info: PlayerStateDict | list[PlayerStateDict] | None = None,
+    tiles: np.ndarray | None = None,
+    self_pick: bool | np.ndarray = False,
+    round_wind: str | None = None,
+    *,
+    faan: Literal[True]
+) -> tuple[np.ndarray, np.ndarray]: ...
+
+
+def check_win_batch(
+    counts: np.ndarray,
+    melds_info: PlayerStateDict | list[PlayerStateDict] | None = None,
+    tiles: np.ndarray | None = None,
+    self_pick: bool | np.ndarray = False,
+    round_wind: str | None = None,
+    faan: bool = False
+) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+    '''
+    check_win for every row of a (rows, NUM_TILES) array of concealed tile counts, by table lookups on the
+    base-5 encoding of each suit. Returns which rows are wins, and with faan also the faan of each win (0 for
+    the other rows) as score_hand gives it for the best meld combination -- for the win conditions check_win
+    knows about (self pick, concealed hand), plus the round wind if given.
+    tiles are added to the counts first, e.g. the discard for a win by discard. melds_info holds the exposed
+    melds (incl. flowers) and seat wind of the player, either once for all rows or per row -- rows that share
+    a dict are scored together. Rows whose size implies kongs still in the hand fall back to check_win.
+    '''
+    suit_kinds, _, honor_kinds, all_honors, complete = _block_tables()
+    num_rows = len(counts)
+    codes = counts[:, :27].reshape(-1, 3, 9) @ SUIT_WEIGHTS
+    honor_codes = counts[:, 27:] @ SUIT_WEIGHTS[:7]
+    sizes = counts.sum(axis=1)
+    if tiles is not None:
+        suited = np.flatnonzero(tiles < 27)
+        codes[suited, tiles[suited] // 9] += SUIT_WEIGHTS[tiles[suited] % 9]
+        honor_rows = np.flatnonzero(tiles >= 27)
+        honor_codes[honor_rows] += SUIT_WEIGHTS[tiles[honor_rows] - 27]
+        sizes += 1
+    wins = complete[_combine(suit_kinds[codes], honor_kinds[honor_codes])]
+
+    # thirteen orphans needs every honor
+    thirteen_orphans = np.zeros(num_rows, dtype=np.bool_)
+    rows = np.flatnonzero(all_honors[honor_codes])
+    if len(rows):
+        orphans = counts[rows][:, _ORPHAN_IDS]
+        if tiles is not None:
+            orphans += tiles[rows, None] == _ORPHAN_IDS
+        thirteen_orphans[rows] = (orphans >= 1).all(axis=1) & (orphans.sum(axis=1) == sizes[rows])
+        wins |= thirteen_orphans
+
+    if melds_info is None or isinstance(melds_info, dict):
+        groups = [(melds_info, np.arange(num_rows))]
+    else:
+        by_dict: dict[int, list[int]] = {}
+        for row, info in enumerate(melds_info):
+            by_dict.setdefault(id(info), []).append(row)
+        groups = [(melds_info[group[0]], np.array(group)) for group in by_dict.values()]
+    # the tables never split off kongs, which is right as long as the hand has 3 tiles per missing set and a pair
+    exposed = [_Exposed(info, round_wind) for info, _ in groups]
+    fallback = sizes % 3 != 2
+    for (info, group), melds in zip(groups, exposed):
+        if info is not None:
+            fallback[group] = sizes[group] != 3 * (4 - melds.num_melds) + 2
+    if not faan and not fallback.any():
+        return wins
+
+    self_picks = np.broadcast_to(np.asarray(self_pick, dtype=np.bool_), (num_rows,))
+    scores = np.zeros(num_rows, dtype=np.int64)
+    full = counts.astype(np.int64)
+    if tiles is not None:
+        full[np.arange(num_rows), tiles] += 1
+    for (info, group), melds in zip(groups, exposed):
+        for row in group[fallback[group]].tolist():
+            wins[row], scores[row] = _check_win_row(full[row], info, tiles, row, bool(self_picks[row]), round_wind)
+        scored = group[~fallback[group] & wins[group]]
+        if faan and len(scored):
+            base = full[scored] if tiles is None else counts[scored]
+            scores[scored] = _score_rows(
+                full[scored], base, self_picks[scored], tiles is not None, melds, thirteen_orphans[scored]
+            )
+    if faan:
+        return wins, scores
+    return wins
+
+
+def _check_win_row(
+    counts: np.ndarray,
+    melds_info: PlayerStateDict | None,
+    tiles: np.ndarray | None,
+    row: int,
+    self_pick: bool,
+    round_wind: str | None
+) -> tuple[bool, int]:
+    '''check_win and score_hand for a single row, which includes its tile'''
+    hand = [ID_TO_TILE[t] for t, count in enumerate(counts.tolist()) for _ in range(count)]
+    if not hand:
+        return False, 0
+    tile = ID_TO_TILE[int(tiles[row])] if tiles is not None else min(hand)
+    if not self_pick:
+        hand.remove(tile)
+    if melds_info is None:
+        player_state: PlayerStateDict = {"id": -1, "seat_wind": "", "hand": hand, "melds": [], "discards": []}
+    else:
+        player_state = {**melds_info, "hand": hand}
+    melds, hand_state = check_win(player_state, tile, self_pick)
+    if not melds:
+        return False, 0
+    hand_state["round_wind"] = round_wind
+    return True, score_hand(player_state["melds"] + melds, hand_state)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Sequence, TypedDict
+import numpy as np
+from game.player import Player
+from game.tile import Tile
+from game.utils import GameStateDict, get_observation, get_action_mask, get_options_mask
+from game.utils import decode_meld_action, decode_discard_action
+
+
+# policy(obs_batch, mask_batch) -> one action index per row
+PolicyFn = Callable[[np.ndarray, np.ndarray], Sequence[int]]
+
+
+class BrokerStatsDict(TypedDict):
+    requests: int
+    batches: int
+    full_batches: int  # flushed because max_batch_size was reached
+    timeout_batches: int  # flushed because max_wait ran out
+    mean_batch_size: float
+    fill_rate: float  # mean batch size / max batch size
+    mean_queue_latency: float  # seconds between a request being submitted and its batch being evaluated
+    max_queue_latency: float
+
+
+class _Request:
+    __slots__ = ("obs", "mask", "submitted", "reply", "fail")
+
+    def __init__(
+        self,
+        obs: Sequence[int],
+        mask: Sequence[int],
+        reply: Callable[[int], Any],
+        fail: Callable[[BaseException], Any]
+    ) -> None:
+        self.obs = obs
+        self.mask = mask
+        self.submitted = time.perf_counter()
+        self.reply = reply
+        self.fail = fail
+
+
+class InferenceBroker:
+    '''
+    Collects decision requests from many games and evaluates them in batches with a single policy call
+    A batch is flushed once max_batch_size requests are pending or the oldest pending request has waited max_wait
+    seconds, whichever comes first. Threads call request() directly, worker processes go through make_client().
+    '''
+
+    def __init__(self, policy: PolicyFn, max_batch_size: int = 64, max_wait: float = 0.001) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._requests: queue.Queue[_Request | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+        # Process support -- a relay thread forwards requests from worker processes into the local queue
+        self._mp_requests: Any = None
+        self._mp_responses: list[Any] = []
+        self._relay: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="inference-broker", daemon=True)
+        self._thread.start()
+        if self._mp_requests is not None:
+            self._start_relay()
+
+    def stop(self) -> None:
+        if self._relay is not None:
+            self._mp_requests.put(None)
+            self._relay.join()
+            self._relay = None
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "InferenceBroker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def submit(self, obs: Sequence[int], mask: Sequence[int]) -> Future[int]:
+        '''Queues a decision request and returns a future holding the chosen action'''
+        future: Future[int] = Future()
+        self._requests.put(_Request(obs, mask, future.set_result, future.set_exception))
+        return future
+
+    def request(self, obs: Sequence[int], mask: Sequence[int]) -> int:
+        '''Queues a decision request and blocks until its batch has been evaluated'''
+        return self.submit(obs, mask).result()
+
+    def make_client(self) -> "BrokerClient":
+        '''
+        Creates a client for one worker process, must be called before the worker process is started
+        Each client may only have one request in flight at a time
+        '''
+        if self._mp_requests is None:
+            self._mp_requests = mp.Queue()
+        responses = mp.Queue()
+        self._mp_responses.append(responses)
+        if self._thread is not None and self._relay is None:
+            self._start_relay()
+        return BrokerClient(len(self._mp_responses) - 1, self._mp_requests, responses)
+
+    def stats(self) -> BrokerStatsDict:
+        with self._stats_lock:
+            batches = self._batches
+            requests = self._num_requests
+            mean_batch_size = requests / batches if batches else 0.0
+            return {
+                "requests": requests,
+                "batches": batches,
+                "full_batches": self._full_batches,
+                "timeout_batches": batches - self._full_batches,
+                "mean_batch_size": mean_batch_size,
+                "fill_rate": mean_batch_size / self.max_batch_size,
+                "mean_queue_latency": self._total_latency / requests if requests else 0.0,
+                "max_queue_latency": self._max_latency
+            }
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._num_requests = 0
+        self._batches = 0
+        self._full_batches = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def _start_relay(self) -> None:
+        self._relay = threading.Thread(target=self._run_relay, name="inference-broker-relay", daemon=True)
+        self._relay.start()
+
+    def _run_relay(self) -> None:
+        while True:
+            item = self._mp_requests.get()
+            if item is None:
+                return
+            worker_id, obs, mask = item
+            responses = self._mp_responses[worker_id]
+            self._requests.put(_Request(obs, mask, responses.put, responses.put))
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._requests.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first.submitted + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    # Drain whatever is already queued even if the deadline has passed
+                    item = self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: list[_Request]) -> None:
+        start = time.perf_counter()
+        latencies = [start - req.submitted for req in batch]
+        obs_batch = np.asarray([req.obs for req in batch], dtype=np.float32)
+        mask_batch = np.asarray([req.mask for req in batch], dtype=np.bool_)
+        try:
+            actions = self.policy(obs_batch, mask_batch)
+            if len(actions) != len(batch):
+                raise ValueError(f"The policy returned {len(actions)} actions for a batch of {len(batch)}")
+        except Exception as e:
+            for req in batch:
+                req.fail(e)
+            return
+
+        with self._stats_lock:
+            self._num_requests += len(batch)
+            self._batches += 1
+            self._full_batches += len(batch) == self.max_batch_size
+            self._total_latency += sum(latencies)
+            self._max_latency = max(self._max_latency, max(latencies))
+        for req, action in zip(batch, actions):
+            req.reply(int(action))
+
+
+class BrokerClient:
+    '''Picklable handle used by a worker process to send requests to an InferenceBroker'''
+
+    def __init__(self, worker_id: int, requests: Any, responses: Any) -> None:
+        self.worker_id = worker_id
+        self._requests = requests
+        self._responses = responses
+
+    def request(self, obs: Sequence[int], mask: Sequence[int]) -> int:
+        self._requests.put((self.worker_id, list(obs), list(mask)))
+        action = self._responses.get()
+        if isinstance(action, BaseException):
+            raise action
+        return action
+
+
+class BrokerPlayer(Player):
+    '''Player whose decisions are made by a policy behind an InferenceBroker (or a BrokerClient)'''
+
+    def __init__(self, id: int, broker: InferenceBroker | BrokerClient) -> None:
+        super().__init__(id)
+        self.broker = broker
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        obs = get_observation(state, self.id)
+        action = self.broker.request(obs, get_options_mask(options))
+        return decode_meld_action(action, options)
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        # the returned index refers to the unsorted hand, so sorted_hand does not apply
+        obs = get_observation(state, self.id)
+        action = self.broker.request(obs, get_action_mask(state, self.id, None))
+        return decode_discard_action(action, state["players"][self.id]["hand"])
@@ -1,8 +1,11 @@
 from enum import IntEnum
+from types import MappingProxyType
+from typing import Mapping
 from game.tile import Tile, Suit, Value
 
 # number of unique tiles, excl flowers
 NUM_TILES = 34
+NUM_PLAYERS = 4
 
 
 class Action(IntEnum):
@@ -29,35 +32,74 @@ class Action(IntEnum):
 
 NUM_ACTIONS = Action.PASS + 1
 
-NUMBER_VALUES = list(Value)[:9]
-DRAGON_VALUES = list(Value)[9:12]
-WIND_VALUES = list(Value)[12:]
-
-TILE_TO_ID = {}
-
-cnt = 0
-for suit in Suit:
-    if suit.name in {"DOT", "BAMBOO", "CHARACTER"}:
-        for value in NUMBER_VALUES:
-            tile = Tile(suit, value)
-            TILE_TO_ID[tile] = cnt
-            cnt += 1
-    elif suit.name == "DRAGON":
-        for value in DRAGON_VALUES:
-            tile = Tile(suit, value)
-            TILE_TO_ID[tile] = cnt
-            cnt += 1
-    elif suit.name == "WIND":
-        for value in WIND_VALUES:
-            tile = Tile(suit, value)
-            TILE_TO_ID[tile] = cnt
-            cnt += 1
-
-CHOW_TO_ID = {}
-
-cnt = 0
-for suit in ["DOT", "BAMBOO", "CHARACTER"]:
-    for value in list(Value)[:7]:
-        tile = Tile(Suit[suit], value)
-        CHOW_TO_ID[tile] = cnt
-        cnt += 1
+# Every table below is shared by all games and threads, so all of them are read-only (tuples and mapping proxies)
+NUMBER_VALUES = tuple(Value)[:9]
+DRAGON_VALUES = tuple(Value)[9:12]
+WIND_VALUES = tuple(Value)[12:]
+NUMBER_SUITS = (Suit.DOT, Suit.BAMBOO, Suit.CHARACTER)
+
+# tile ids -- numbers by suit, then dragons and winds
+TILE_TO_ID: Mapping[Tile, int] = MappingProxyType({
+    tile: tile_id for tile_id, tile in enumerate(
+        [Tile(suit, value) for suit in NUMBER_SUITS for value in NUMBER_VALUES]
+        + [Tile(Suit.DRAGON, value) for value in DRAGON_VALUES]
+        + [Tile(Suit.WIND, value) for value in WIND_VALUES]
+    )
+})
+
+# chows by their lowest tile, 7 per suit
+CHOW_TO_ID: Mapping[Tile, int] = MappingProxyType({
+    Tile(suit, value): 7 * i + j for i, suit in enumerate(NUMBER_SUITS) for j, value in enumerate(NUMBER_VALUES[:7])
+})
+
+# tile ids -> tiles, in id order
+ID_TO_TILE = tuple(TILE_TO_ID)
+
+# tile codes -- tile ids for the 34 regular tiles, followed by the 8 flowers
+FLOWER_TILES = tuple(Tile(Suit.FLOWER, value) for value in tuple(Value)[:8])
+CODE_TO_TILE = ID_TO_TILE + FLOWER_TILES
+TILE_TO_CODE: Mapping[Tile, int] = MappingProxyType({tile: code for code, tile in enumerate(CODE_TO_TILE)})
+NUM_CODES = len(CODE_TO_TILE)
+# TILE_TO_CODE lookups fall back to Tile.__eq__ for tiles that are equal but not the same object, which is most of
+# them, keying by the hash skips that (the 42 tiles have distinct hashes)
+HASH_TO_CODE: Mapping[int, int] = MappingProxyType({hash(tile): code for tile, code in TILE_TO_CODE.items()})
+assert len(HASH_TO_CODE) == len(TILE_TO_CODE)
+
+
+class Observation(IntEnum):
+    # Tile counts in own hand
+    HAND = 0
+    HAND_END = NUM_TILES
+
+    # Exposed meld tile counts, one block per seat (relative to the observing player)
+    MELDS = HAND_END
+    MELDS_END = MELDS + 4 * NUM_TILES
+
+    # Discarded tile counts, one block per seat (relative to the observing player)
+    DISCARDS = MELDS_END
+    DISCARDS_END = DISCARDS + 4 * NUM_TILES
+
+    # Number of flowers per seat (relative to the observing player)
+    FLOWERS = DISCARDS_END
+    FLOWERS_END = FLOWERS + 4
+
+    # Other features
+    WALL = FLOWERS_END  # tiles left in the wall
+    PHASE = WALL + 1  # 1 if discard phase, 0 if meld phase
+
+
+NUM_OBSERVATIONS = Observation.PHASE + 1
+
+
+class Delta(IntEnum):
+    '''Kinds of state change in a delta stream, see game.delta'''
+    RESET = 0  # a new deal on the same game
+    DRAW = 1  # seat, tile code
+    FLOWER = 2  # seat, tile code -- a flower drawn and exposed
+    DISCARD = 3  # seat, index in the hand, tile code
+    CLAIM = 4  # seat, claiming seat -- the latest discard of seat goes to the hand of the claiming seat
+    MELD = 5  # seat, number of tiles, tile codes -- from the hand to a new meld
+    UPGRADE = 6  # seat, tile code -- from the hand to an exposed pung
+    ROB = 7  # seat, robbing seat, tile code
+    FLAGS = 8  # flag bits, current player
+    END = 9  # winning seat, round wind, special hand bits, number of win conditions, conditions, hand length, hand
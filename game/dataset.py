@@ -0,0 +1,247 @@
+'''
+Streaming self-play datasets
+
+self_play_samples turns games into (observation, action mask, action, seat, reward) samples one game at a time,
+ShardWriter packs them into preallocated buffers that a background thread writes out as .npz shards, and
+read_shards streams the shards back in shuffled batches. Memory stays bounded by the buffer sizes however many
+games are played.
+'''
+from __future__ import annotations
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Sequence, TypedDict
+import numpy as np
+from game.constants import Action, TILE_TO_ID, NUM_ACTIONS, NUM_OBSERVATIONS
+from game.mahjong import MahjongGame
+from game.player import Player
+from game.tile import Tile
+from game.utils import GameStateDict, get_observation, get_action_mask, get_options_mask, meld_to_action
+
+# (observation, action mask, action, seat, reward)
+Sample = tuple[list[int], list[int], int, int, int]
+
+
+class SampleBatchDict(TypedDict):
+    obs: np.ndarray  # (N, NUM_OBSERVATIONS) int16
+    mask: np.ndarray  # (N, NUM_ACTIONS) bool
+    action: np.ndarray  # (N,) int16
+    seat: np.ndarray  # (N,) int8
+    reward: np.ndarray  # (N,) int16, the seat's zero-sum faan payoff at the end of the game
+
+
+def _take(batch: SampleBatchDict, index: np.ndarray | slice) -> SampleBatchDict:
+    return {
+        "obs": batch["obs"][index],
+        "mask": batch["mask"][index],
+        "action": batch["action"][index],
+        "seat": batch["seat"][index],
+        "reward": batch["reward"][index]
+    }
+
+
+def _concat(first: SampleBatchDict, second: SampleBatchDict) -> SampleBatchDict:
+    return {
+        "obs": np.concatenate([first["obs"], second["obs"]]),
+        "mask": np.concatenate([first["mask"], second["mask"]]),
+        "action": np.concatenate([first["action"], second["action"]]),
+        "seat": np.concatenate([first["seat"], second["seat"]]),
+        "reward": np.concatenate([first["reward"], second["reward"]])
+    }
+
+
+def empty_batch(size: int) -> SampleBatchDict:
+    return {
+        "obs": np.zeros((size, NUM_OBSERVATIONS), dtype=np.int16),
+        "mask": np.zeros((size, NUM_ACTIONS), dtype=np.bool_),
+        "action": np.zeros(size, dtype=np.int16),
+        "seat": np.zeros(size, dtype=np.int8),
+        "reward": np.zeros(size, dtype=np.int16)
+    }
+
+
+class RecordingPlayer(Player):
+    '''Wraps a player and appends every decision it makes to decisions, as (observation, mask, action, seat)'''
+
+    def __init__(self, player: Player, decisions: list[tuple[list[int], list[int], int, int]]) -> None:
+        super().__init__(player.id)
+        self.player = player
+        self.decisions = decisions
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        obs = get_observation(state, self.id)
+        meld_type, melds = self.player.query_meld(state, options)
+        if meld_type == "":
+            action = Action.PASS
+        elif meld_type == "win":
+            action = Action.WIN
+        else:
+            action = meld_to_action(meld_type, melds[0])
+        self.decisions.append((obs, get_options_mask(options), int(action), self.id))
+        return meld_type, melds
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        obs = get_observation(state, self.id)
+        mask = get_action_mask(state, self.id, None)
+        idx = self.player.query_discard(state, sorted_hand)
+        tile = state["players"][self.id]["hand"][idx]
+        self.decisions.append((obs, mask, Action.DISCARD + TILE_TO_ID[tile], self.id))
+        return idx
+
+
+def self_play_samples(make_players: Callable[[int], list[Player]], seeds: Iterable[int]) -> Iterator[Sample]:
+    '''
+    Plays one game per seed between make_players(seed) and yields every decision made in it
+    The reward of a decision is the seat's zero-sum faan payoff at the end of the game (0 on a draw)
+    '''
+    for seed in seeds:
+        decisions: list[tuple[list[int], list[int], int, int]] = []
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([RecordingPlayer(player, decisions) for player in make_players(seed)])
+        while not game.game_state["done"]:
+            game.step()
+        payoffs = game.get_payoffs()
+        for obs, mask, action, seat in decisions:
+            yield obs, mask, action, seat, payoffs[seat]
+
+
+class ShardWriter:
+    '''
+    Packs samples into fixed-size buffers and writes each full buffer to directory as one .npz shard
+    Writing happens on a background thread, add() only blocks when all num_buffers buffers are waiting on disk
+    '''
+
+    def __init__(
+        self,
+        directory: str | Path,
+        shard_size: int = 65536,
+        num_buffers: int = 3,
+        prefix: str = "shard"
+    ) -> None:
+        if shard_size < 1 or num_buffers < 2:
+            raise ValueError("shard_size must be at least 1 and num_buffers at least 2")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.paths: list[Path] = []
+        self.num_samples = 0
+
+        self._free: queue.Queue[SampleBatchDict] = queue.Queue()
+        for _ in range(num_buffers):
+            self._free.put(empty_batch(shard_size))
+        self._full: queue.Queue[tuple[SampleBatchDict, int, Path] | None] = queue.Queue()
+        self._error: BaseException | None = None
+        self._buffer = self._free.get()
+        self._size = 0
+        self._thread: threading.Thread | None = threading.Thread(target=self._run, name="shard-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def add(self, obs: Sequence[int], mask: Sequence[int], action: int, seat: int, reward: int) -> None:
+        if self._thread is None:
+            raise ValueError("ShardWriter is closed")
+        buffer, row = self._buffer, self._size
+        buffer["obs"][row] = obs
+        buffer["mask"][row] = mask
+        buffer["action"][row] = action
+        buffer["seat"][row] = seat
+        buffer["reward"][row] = reward
+        self._size += 1
+        if self._size == self.shard_size:
+            self._flush()
+            self._buffer = self._free.get()
+
+    def write(self, samples: Iterable[Sample]) -> None:
+        for sample in samples:
+            self.add(*sample)
+
+    def close(self) -> list[Path]:
+        '''Writes the last, partial shard, waits for the writer thread and returns the paths of all shards'''
+        if self._thread is not None:
+            if self._size:
+                self._flush()
+            self._full.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check_error()
+        return self.paths
+
+    def _flush(self) -> None:
+        self._check_error()
+        path = self.directory / f"{self.prefix}-{len(self.paths):05d}.npz"
+        self.paths.append(path)
+        self.num_samples += self._size
+        self._full.put((self._buffer, self._size, path))
+        self._size = 0
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Writing a shard failed") from self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            buffer, size, path = item
+            try:
+                if self._error is None:
+                    # written under a temporary name first, so readers never see half-written shards
+                    tmp = path.with_name(f".{path.name}")
+                    with open(tmp, "wb") as f:
+                        np.savez(f, **_take(buffer, slice(size)))
+                    os.replace(tmp, path)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._free.put(buffer)
+
+
+def read_shards(
+    paths: str | Path | Sequence[str | Path],
+    batch_size: int = 256,
+    buffer_size: int = 65536,
+    seed: int | None = None,
+    drop_last: bool = False
+) -> Iterator[SampleBatchDict]:
+    '''
+    Streams the samples of the given shards (or of every shard in a directory) as shuffled batches
+    Shards are read in random order, one at a time, and mixed through a shuffle buffer of buffer_size samples,
+    so at most buffer_size samples plus one shard are held in memory
+    '''
+    if isinstance(paths, (str, Path)):
+        paths = sorted(Path(paths).glob("*.npz")) if Path(paths).is_dir() else [paths]
+    rng = np.random.default_rng(seed)
+    pool: SampleBatchDict | None = None
+    for i in rng.permutation(len(paths)):
+        with np.load(paths[i]) as shard:
+            chunk: SampleBatchDict = {
+                "obs": shard["obs"],
+                "mask": shard["mask"],
+                "action": shard["action"],
+                "seat": shard["seat"],
+                "reward": shard["reward"]
+            }
+        if pool is not None:
+            chunk = _concat(pool, chunk)
+        pool = _take(chunk, rng.permutation(len(chunk["action"])))
+        # everything beyond the buffer goes out now, in whole batches
+        emit = max(len(pool["action"]) - buffer_size, 0) // batch_size * batch_size
+        for start in range(0, emit, batch_size):
+            yield _take(pool, slice(start, start + batch_size))
+        pool = _take(pool, slice(emit, None))
+
+    if pool is None:
+        return
+    size = len(pool["action"])
+    for start in range(0, size, batch_size):
+        if drop_last and start + batch_size > size:
+            return
+        yield _take(pool, slice(start, start + batch_size))
@@ -0,0 +1,363 @@
+'''
+Delta stream of a game's state, for spectators, remote UIs and loggers
+
+A DeltaRecorder attached to a game has the engine record every move of a tile as it happens, and after each step
+flush() returns those moves plus any change of the flags and the end of the game, in order. message() packs them
+into a few bytes per viewer, with the tiles drawn by seats the viewer may not see hidden, and keyframe() packs the
+whole view for viewers joining late or falling out of sync. A DeltaApplier on the other end keeps a ViewDict, the
+state as the viewer may see it, in sync from those messages.
+
+    message     kind (1 byte), sequence number (4 bytes), then the deltas or the keyframe
+    delta       Delta kind, then its fields, one byte each (see game.constants.Delta)
+    keyframe    round wind, current player, flag bits, wall size, revealed seats, winning hand, then per seat:
+                seat wind, hand, melds and discards, each a length and tile codes
+
+A message carries the number of flushes since the recorder was attached; a keyframe the number it is current as of.
+'''
+from __future__ import annotations
+import struct
+from typing import TypedDict
+from game.constants import CODE_TO_TILE, HASH_TO_CODE, Delta
+from game.mahjong import NUM_PLAYERS, WINDS, MahjongGame
+from game.serialize import WIN_CONDITION_CODES, WIN_CONDITIONS
+from game.tile import Tile
+from game.utils import WALL_TILES, GameStateDict, HandStateDict
+
+ALL_SEATS = frozenset(range(NUM_PLAYERS))
+HIDDEN = 255  # tile code of a tile the viewer may not see
+DELTAS, KEYFRAME = range(2)  # kinds of message
+
+# flag bits, as in game.serialize: the lowest six are first, discard, kong, double_kong, draw and done
+_DISCARD_PHASE = 1 << 6
+_HAS_WINNER = 1 << 7
+_THIRTEEN_ORPHANS = 1
+_NINE_GATES = 2
+_NO_WIND = 255
+_HEADER = struct.Struct("<BI")
+_FIXED_LENGTHS: dict[int, int] = {  # kind -> bytes of a delta of fixed length
+    Delta.RESET: 1, Delta.DRAW: 3, Delta.FLOWER: 3, Delta.DISCARD: 4, Delta.CLAIM: 3, Delta.UPGRADE: 3,
+    Delta.ROB: 4, Delta.FLAGS: 3
+}
+
+
+class PlayerViewDict(TypedDict):
+    id: int
+    seat_wind: str
+    hand: list[Tile | None]  # None for each tile the viewer may not see
+    melds: list[list[Tile]]
+    discards: list[Tile]
+
+
+class ViewDict(TypedDict):
+    wall_size: int
+    round_wind: str
+    current_player: int
+    first: bool
+    discard: bool
+    kong: bool
+    double_kong: bool
+    draw: bool
+    done: bool
+    winning_hand_state: HandStateDict | None
+    phase: str
+    players: dict[int, PlayerViewDict]
+
+
+def _flag_bits(state: GameStateDict | ViewDict) -> int:
+    bits = sum(1 << i for i, flag in enumerate((
+        state["first"], state["discard"], state["kong"], state["double_kong"], state["draw"], state["done"]
+    )) if flag)
+    return bits | _DISCARD_PHASE if state["phase"] == "discard" else bits
+
+
+def _set_flags(view: ViewDict, bits: int) -> None:
+    view["first"] = bool(bits & 1)
+    view["discard"] = bool(bits & 2)
+    view["kong"] = bool(bits & 4)
+    view["double_kong"] = bool(bits & 8)
+    view["draw"] = bool(bits & 16)
+    view["done"] = bool(bits & 32)
+    view["phase"] = "discard" if bits & _DISCARD_PHASE else "meld"
+
+
+def _new_view(wall_size: int, round_wind: str, current_player: int, flags: int) -> ViewDict:
+    view: ViewDict = {
+        "wall_size": wall_size,
+        "round_wind": round_wind,
+        "current_player": current_player,
+        "first": False,
+        "discard": False,
+        "kong": False,
+        "double_kong": False,
+        "draw": False,
+        "done": False,
+        "winning_hand_state": None,
+        "phase": "meld",
+        "players": {
+            p_id: {"id": p_id, "seat_wind": WINDS[p_id], "hand": [], "melds": [], "discards": []}
+            for p_id in range(NUM_PLAYERS)
+        }
+    }
+    _set_flags(view, flags)
+    return view
+
+
+def _winner(winning: HandStateDict) -> int:
+    return WINDS.index(winning["seat_wind"])
+
+
+def view_of(game_state: GameStateDict, reveal: frozenset[int] = ALL_SEATS) -> ViewDict:
+    '''
+    The state as seen by a viewer who may see the hands of the seats in reveal: the hands of other seats are None
+    for each tile, but for a winner's hand once the game is won, and the wall is only a size
+    '''
+    winning = game_state["winning_hand_state"]
+    shown = reveal | {_winner(winning)} if winning is not None else reveal
+    view: ViewDict = {
+        "wall_size": len(game_state["wall"]),
+        "round_wind": game_state["round_wind"],
+        "current_player": game_state["current_player"],
+        "first": game_state["first"],
+        "discard": game_state["discard"],
+        "kong": game_state["kong"],
+        "double_kong": game_state["double_kong"],
+        "draw": game_state["draw"],
+        "done": game_state["done"],
+        "winning_hand_state": None,
+        "phase": game_state["phase"],
+        "players": {}
+    }
+    if winning is not None:
+        view["winning_hand_state"] = {**winning, "win_condition": list(winning["win_condition"])}
+    for p_id, player_state in game_state["players"].items():
+        hand = player_state["hand"]
+        view["players"][p_id] = {
+            "id": p_id,
+            "seat_wind": player_state["seat_wind"],
+            "hand": list(hand) if p_id in shown else [None] * len(hand),
+            "melds": [list(meld) for meld in player_state["melds"]],
+            "discards": list(player_state["discards"])
+        }
+    return view
+
+
+def _encode_tiles(tiles: list[Tile] | list[Tile | None]) -> bytes:
+    return bytes([len(tiles), *(HIDDEN if tile is None else HASH_TO_CODE[hash(tile)] for tile in tiles)])
+
+
+def _end(winning: HandStateDict, hand: list[Tile]) -> tuple[int, ...]:
+    round_wind = _NO_WIND if winning["round_wind"] is None else WINDS.index(winning["round_wind"])
+    special = _THIRTEEN_ORPHANS * winning["thirteen_orphans"] + _NINE_GATES * winning["nine_gates"]
+    conditions = [WIN_CONDITION_CODES[condition] for condition in winning["win_condition"]]
+    return (
+        Delta.END, _winner(winning), round_wind, special, len(conditions), *conditions,
+        len(hand), *(HASH_TO_CODE[hash(tile)] for tile in hand)
+    )
+
+
+class DeltaRecorder:
+    '''
+    Records the state changes of a game for viewers. Attaching turns on the engine's events (game.events), detach()
+    turns them off again; call flush() after every step() or reset() of the game, the deltas of a flush are only
+    whole between steps. Keyframes are due every keyframe_interval flushes.
+    '''
+
+    def __init__(self, game: MahjongGame, keyframe_interval: int = 32) -> None:
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0  # flushes so far
+        game.events = []
+        self._flags = (_flag_bits(game.game_state), game.game_state["current_player"])
+        self._winning = game.game_state["winning_hand_state"]
+
+    def detach(self) -> None:
+        self.game.events = None
+
+    @property
+    def keyframe_due(self) -> bool:
+        return self.seq % self.keyframe_interval == 0
+
+    def flush(self) -> list[tuple[int, ...]]:
+        '''Returns the deltas since the last flush, in the order they happened, with every tile shown'''
+        state = self.game.game_state
+        events = self.game.events
+        if events is None:
+            raise RuntimeError("The recorder was detached from its game")
+        deltas = events.copy()
+        events.clear()
+        flags = (_flag_bits(state), state["current_player"])
+        if flags != self._flags:
+            deltas.append((Delta.FLAGS, *flags))
+            self._flags = flags
+        winning = state["winning_hand_state"]
+        if winning is not None and winning is not self._winning:
+            deltas.append(_end(winning, state["players"][_winner(winning)]["hand"]))
+        self._winning = winning
+        self.seq += 1
+        return deltas
+
+    def message(self, deltas: list[tuple[int, ...]], reveal: frozenset[int] = ALL_SEATS) -> bytes:
+        '''Packs the deltas of the latest flush for a viewer who may see the hands of the seats in reveal'''
+        body = bytearray(_HEADER.pack(DELTAS, self.seq))
+        for delta in deltas:
+            if delta[0] == Delta.DRAW and delta[1] not in reveal:
+                body += bytes((Delta.DRAW, delta[1], HIDDEN))
+            else:
+                body += bytes(delta)
+        return bytes(body)
+
+    def keyframe(self, reveal: frozenset[int] = ALL_SEATS) -> bytes:
+        '''Packs the whole view of a viewer who may see the hands of the seats in reveal, as of the latest flush'''
+        return encode_keyframe(view_of(self.game.game_state, reveal), reveal, self.seq)
+
+
+def encode_keyframe(view: ViewDict, reveal: frozenset[int], seq: int = 0) -> bytes:
+    '''Packs a view into a keyframe message with sequence number seq'''
+    flags = _flag_bits(view)
+    winning = view["winning_hand_state"]
+    end = b""
+    if winning is not None:
+        flags |= _HAS_WINNER
+        end = bytes(_end(winning, [])[1:-1])
+    body = bytearray(_HEADER.pack(KEYFRAME, seq))
+    body += bytes((
+        WINDS.index(view["round_wind"]), view["current_player"], flags, view["wall_size"],
+        sum(1 << p_id for p_id in reveal)
+    ))
+    body += end
+    for p_id in range(NUM_PLAYERS):
+        player = view["players"][p_id]
+        body.append(WINDS.index(player["seat_wind"]))
+        body += _encode_tiles(player["hand"])
+        body.append(len(player["melds"]))
+        for meld in player["melds"]:
+            body += _encode_tiles(meld)
+        body += _encode_tiles(player["discards"])
+    return bytes(body)
+
+
+class DeltaApplier:
+    '''
+    Mirror of a game as one viewer sees it, kept in sync from the messages of a DeltaRecorder. Deltas are ignored
+    until the first keyframe, and again after a message was missed, until the next keyframe.
+    '''
+
+    def __init__(self) -> None:
+        self.view: ViewDict | None = None
+        self.seq = 0
+        self.synced = False
+        self.hidden = [False] * NUM_PLAYERS  # seats whose hands the viewer may not see
+
+    def apply(self, message: bytes) -> bool:
+        '''Applies a message, returns whether it was applied'''
+        kind, seq = _HEADER.unpack_from(message)
+        if kind == KEYFRAME:
+            self._load(message)
+        elif not self.synced or seq != self.seq + 1:
+            self.synced = False
+            return False
+        else:
+            self._apply_deltas(message)
+        self.seq = seq
+        self.synced = True
+        return True
+
+    def _read_end(self, message: bytes, pos: int) -> tuple[HandStateDict, int]:
+        seat, round_wind, special, num_conditions = message[pos:pos + 4]
+        pos += 4
+        winning: HandStateDict = {
+            "win_condition": [WIN_CONDITIONS[code] for code in message[pos:pos + num_conditions]],
+            "thirteen_orphans": bool(special & _THIRTEEN_ORPHANS),
+            "nine_gates": bool(special & _NINE_GATES),
+            "seat_wind": WINDS[seat],
+            "round_wind": None if round_wind == _NO_WIND else WINDS[round_wind]
+        }
+        return winning, pos + num_conditions
+
+    def _load(self, message: bytes) -> None:
+        pos = _HEADER.size
+        round_wind, current_player, flags, wall_size, reveal = message[pos:pos + 5]
+        pos += 5
+        view = _new_view(wall_size, WINDS[round_wind], current_player, flags)
+        if flags & _HAS_WINNER:
+            view["winning_hand_state"], pos = self._read_end(message, pos)
+        self.hidden = [not reveal & 1 << p_id for p_id in range(NUM_PLAYERS)]
+        for player in view["players"].values():
+            player["seat_wind"] = WINDS[message[pos]]
+            pos, player["hand"] = _read_tiles(message, pos + 1)
+            num_melds = message[pos]
+            pos += 1
+            for _ in range(num_melds):
+                pos, meld = _read_tiles(message, pos)
+                player["melds"].append([tile for tile in meld if tile is not None])
+            pos, discards = _read_tiles(message, pos)
+            player["discards"] = [tile for tile in discards if tile is not None]
+        self.view = view
+
+    def _apply_deltas(self, message: bytes) -> None:
+        view = self.view
+        if view is None:
+            return
+        players = view["players"]
+        hidden = self.hidden
+        pos = _HEADER.size
+        while pos < len(message):
+            kind = message[pos]
+            if kind == Delta.MELD:
+                p_id, length = message[pos + 1:pos + 3]
+                meld = [CODE_TO_TILE[code] for code in message[pos + 3:pos + 3 + length]]
+                hand = players[p_id]["hand"]
+                for tile in meld:
+                    hand.remove(None if hidden[p_id] else tile)
+                players[p_id]["melds"].append(meld)
+                pos += 3 + length
+                continue
+            if kind == Delta.END:
+                winning, pos = self._read_end(message, pos + 1)
+                pos, players[_winner(winning)]["hand"] = _read_tiles(message, pos)
+                view["winning_hand_state"] = winning
+                continue
+            fields = message[pos + 1:pos + _FIXED_LENGTHS[kind]]
+            pos += _FIXED_LENGTHS[kind]
+            if kind == Delta.DRAW:
+                p_id, code = fields
+                view["wall_size"] -= 1
+                players[p_id]["hand"].append(None if code == HIDDEN or hidden[p_id] else CODE_TO_TILE[code])
+            elif kind == Delta.FLOWER:
+                view["wall_size"] -= 1
+                players[fields[0]]["melds"].append([CODE_TO_TILE[fields[1]]])
+            elif kind == Delta.DISCARD:
+                p_id, index, code = fields
+                tile = CODE_TO_TILE[code]
+                players[p_id]["hand"].pop(index)
+                players[p_id]["discards"].append(tile)
+            elif kind == Delta.CLAIM:
+                p_id, next_p_id = fields
+                tile = players[p_id]["discards"].pop()
+                players[next_p_id]["hand"].append(None if hidden[next_p_id] else tile)
+            elif kind == Delta.UPGRADE:
+                p_id, code = fields
+                tile = CODE_TO_TILE[code]
+                players[p_id]["hand"].remove(None if hidden[p_id] else tile)
+                next(meld for meld in players[p_id]["melds"] if len(meld) == 3 and meld[0] == tile).append(tile)
+            elif kind == Delta.ROB:
+                p_id, next_p_id, code = fields
+                tile = CODE_TO_TILE[code]
+                players[p_id]["hand"].remove(None if hidden[p_id] else tile)
+                players[next_p_id]["hand"].append(None if hidden[next_p_id] else tile)
+            elif kind == Delta.FLAGS:
+                _set_flags(view, fields[0])
+                view["current_player"] = fields[1]
+            elif kind == Delta.RESET:
+                # a new deal, as MahjongGame.reset() leaves it before dealing
+                view = self.view = _new_view(len(WALL_TILES), WINDS[0], 0, 1)
+                players = view["players"]
+
+
+def _read_tiles(message: bytes, pos: int) -> tuple[int, list[Tile | None]]:
+    '''Reads a length and that many tile codes at pos, returns the position after them and the tiles'''
+    length = message[pos]
+    tiles = [None if code == HIDDEN else CODE_TO_TILE[code] for code in message[pos + 1:pos + 1 + length]]
+    return pos + 1 + length, tiles
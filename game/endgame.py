@@ -0,0 +1,203 @@
+'''
+Exact solver for endgames with every hand known
+
+With the hands open and only a few tiles left in the wall, the rest of the game is small enough to search
+completely. The solver plays the engine itself: each step is run with players that answer from a script of actions
+and stop at the first decision not in it, so every draw, discard and claim follows the engine's rules, and finished
+games are scored by get_payoffs.
+
+The order of the wall is treated as unknown: every draw is a chance node over the tiles left, weighted by their
+copies, and states between steps are memoized by their Zobrist hash, which ignores the order of the wall. At
+decision nodes the deciding seat picks the action that maximizes its own expected payoff (max^n). Claims on a
+discard are decided one seat at a time in the order the engine asks, each seat seeing the answers before it.
+'''
+from __future__ import annotations
+import time
+from collections import Counter
+from typing import TypedDict
+from game.constants import HASH_TO_CODE, NUM_PLAYERS
+from game.mahjong import MahjongGame
+from game.player import Player
+from game.tile import Suit, Tile
+from game.utils import GameStateDict, decode_discard_action, decode_meld_action, get_action_mask, get_options_mask
+from game.zobrist import MELD, TableStatsDict, TranspositionTable
+
+Values = tuple[float, ...]
+
+
+class EndgameResultDict(TypedDict):
+    solved: bool  # False if the node or time budget ran out first
+    values: list[float] | None  # expected payoff of each seat
+    best_actions: dict[int, int]  # tile code drawn (-1 for no draw) -> best first action of the current player
+    nodes: int
+    seconds: float
+    nodes_per_second: float
+    table: TableStatsDict
+
+
+NO_DRAW = -1
+
+
+class _Decision(Exception):
+    '''Raised by a scripted player at the first decision past the end of the script'''
+
+    def __init__(self, seat: int, legal: list[int]) -> None:
+        super().__init__(seat, legal)
+        self.seat = seat
+        self.legal = legal
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class _ScriptedPlayer(Player):
+
+    def __init__(self, id: int, solver: "EndgameSolver") -> None:
+        super().__init__(id)
+        self.solver = solver
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        return decode_meld_action(self.solver._next_action(self.id, get_options_mask(options)), options)
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        action = self.solver._next_action(self.id, get_action_mask(state, self.id, None))
+        return decode_discard_action(action, state["players"][self.id]["hand"])
+
+
+class EndgameSolver:
+    '''
+    Expectimax over the rest of a game from a state between steps, within max_nodes nodes and max_time seconds
+    The transposition table is kept across solve() calls, positions from the same game share most of their subtrees
+    '''
+
+    def __init__(self, max_nodes: int = 1_000_000, max_time: float = 10.0, table_size: int = 1 << 18) -> None:
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+        self.table: TranspositionTable[Values] = TranspositionTable(table_size)
+        self._players: list[Player] = [_ScriptedPlayer(i, self) for i in range(NUM_PLAYERS)]
+        self._script: list[int] = []
+        self._cursor = 0
+        self.nodes = 0
+        self._deadline = 0.0
+
+    def solve(self, game_state: GameStateDict) -> EndgameResultDict:
+        '''Expected payoffs of the game from game_state, and the current player's best first action per draw'''
+        self.table.new_search()
+        self.nodes = 0
+        start = time.perf_counter()
+        self._deadline = start + self.max_time
+        best_actions: dict[int, int] = {}
+        values: Values | None
+        try:
+            values = self._turn(MahjongGame.from_state(game_state, self._players, verbose=False), best_actions)
+        except _BudgetExceeded:
+            values = None
+            best_actions = {}
+        seconds = time.perf_counter() - start
+        return {
+            "solved": values is not None,
+            "values": None if values is None else list(values),
+            "best_actions": best_actions,
+            "nodes": self.nodes,
+            "seconds": seconds,
+            "nodes_per_second": self.nodes / seconds if seconds > 0 else 0.0,
+            "table": self.table.stats()
+        }
+
+    def _count(self) -> None:
+        self.nodes += 1
+        if self.nodes > self.max_nodes or (self.nodes & 1023 == 0 and time.perf_counter() > self._deadline):
+            raise _BudgetExceeded
+
+    def _chance(self, game: MahjongGame) -> list[tuple[int, float, MahjongGame, bool]]:
+        '''
+        (tile code, probability, game, flower) for every distinct tile that can be drawn next
+        A flower is moved to the current player's melds right away, as the engine does before drawing its
+        replacement, so the game is again between steps; any other tile is put at the end of the wall
+        '''
+        wall = game.game_state["wall"]
+        counts = Counter(HASH_TO_CODE[hash(tile)] for tile in wall)
+        children = []
+        for code, count in counts.items():
+            child = game.copy()
+            state = child.game_state
+            tile = state["wall"].pop(next(i for i, tile in enumerate(wall) if HASH_TO_CODE[hash(tile)] == code))
+            flower = tile.suit == Suit.FLOWER
+            if flower:
+                # a flower as the last tile leaves an empty wall and the game is drawn at the next step, the engine
+                # would let the player discard first, but nobody can win on that discard any more
+                state["players"][state["current_player"]]["melds"].append([tile])
+                child.zobrist.add(MELD, state["current_player"], tile)
+                state["kong"] = True
+            else:
+                state["wall"].append(tile)
+            children.append((code, count / len(wall), child, flower))
+        return children
+
+    def _turn(self, game: MahjongGame, best_actions: dict[int, int] | None = None) -> Values:
+        '''
+        Value of a game between steps, memoized
+        If best_actions is given, the best first action of the step is recorded in it for every tile drawn
+        '''
+        state = game.game_state
+        if state["done"]:
+            return tuple(float(payoff) for payoff in game.get_payoffs())
+        key = game.hash_key
+        values = self.table.get(key) if best_actions is None else None
+        if values is not None:
+            return values
+        start = self.nodes
+        self._count()
+        if state["wall"] and not state["first"] and not state["discard"]:
+            total = [0.0] * NUM_PLAYERS
+            for code, p, child, flower in self._chance(game):
+                if flower:
+                    values = self._turn(child)
+                else:
+                    values, action = self._decide(child, [])
+                    if best_actions is not None and action is not None:
+                        best_actions[code] = action
+                for i in range(NUM_PLAYERS):
+                    total[i] += p * values[i]
+            values = tuple(total)
+        else:
+            values, action = self._decide(game, [])
+            if best_actions is not None and action is not None:
+                best_actions[NO_DRAW] = action
+        self.table.put(key, values, self.nodes - start)
+        return values
+
+    def _decide(self, game: MahjongGame, script: list[int]) -> tuple[Values, int | None]:
+        '''Value of the step from game once the actions in script are taken, and the best next action'''
+        self._count()
+        outcome = self._run(game, script)
+        if isinstance(outcome, MahjongGame):
+            return self._turn(outcome), None
+        best: Values | None = None
+        best_action = None
+        for action in outcome.legal:
+            values = self._decide(game, script + [action])[0]
+            if best is None or values[outcome.seat] > best[outcome.seat]:
+                best = values
+                best_action = action
+        assert best is not None
+        return best, best_action
+
+    def _run(self, game: MahjongGame, script: list[int]) -> MahjongGame | _Decision:
+        '''Plays one step of a copy of game with the actions in script, until the step ends or needs a new decision'''
+        game = game.copy()
+        self._script = script
+        self._cursor = 0
+        try:
+            game.step()
+        except _Decision as decision:
+            return decision
+        return game
+
+    def _next_action(self, seat: int, mask: list[int]) -> int:
+        if self._cursor < len(self._script):
+            action = self._script[self._cursor]
+            self._cursor += 1
+            return action
+        raise _Decision(seat, [action for action, legal in enumerate(mask) if legal])
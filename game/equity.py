@@ -0,0 +1,218 @@
+from __future__ import annotations
+import random
+from typing import TypedDict
+import numpy as np
+from game.batch import check_win_batch
+from game.constants import ID_TO_TILE, NUM_TILES
+from game.mahjong import MahjongGame, NUM_PLAYERS
+from game.player import Player
+from game.sampler import HiddenStateSampler
+from game.tile import Tile
+from game.utils import GameStateDict, PlayerStateDict, keep_value, tiles_to_counts
+from game.utils import check_win, score_hand
+
+
+OPPONENT_POLICIES = ("random", "heuristic")
+
+
+class EquityDict(TypedDict):
+    win: float  # probability that the seat wins
+    deal_in: float  # probability that the seat discards another player's winning tile
+    expected_faan: float  # faan won per rollout, 0 for the rollouts the seat does not win
+
+
+def _rollout_discards(hands: np.ndarray, policy: str, rng: np.random.Generator) -> np.ndarray:
+    '''Tile id discarded from each row of a (rows, NUM_TILES) count array'''
+    if policy == "random":
+        # every tile in the hand is equally likely
+        cumulative = hands.cumsum(axis=1)
+        pick = rng.integers(0, cumulative[:, -1])
+        return (cumulative > pick[:, None]).argmax(axis=1)
+    # lowest keep_value, ties broken at random
+    value = 4 * (hands - 1)
+    padded = np.zeros((len(hands), 4, 13), dtype=hands.dtype)
+    padded[:, :3, 2:11] = hands[:, :27].reshape(-1, 3, 9)
+    suited = value[:, :27].reshape(-1, 3, 9)
+    for d in (-2, -1, 1, 2):
+        suited += 2 * padded[:, :3, 2 + d:11 + d]
+    suited += np.minimum(np.minimum(np.arange(9), 8 - np.arange(9)), 2)
+    value[:, :27] = suited.reshape(-1, 27)
+    score = np.where(hands > 0, value + rng.random(hands.shape), np.inf)
+    return score.argmin(axis=1)
+
+
+def _score_win(
+    player_state: PlayerStateDict,
+    counts: np.ndarray,
+    tile: int,
+    self_pick: bool,
+    last_draw: bool,
+    round_wind: str
+) -> int:
+    '''Faan of the seat winning on tile with the concealed counts (which include tile on a self pick)'''
+    hand = [ID_TO_TILE[t] for t, count in enumerate(counts.tolist()) for _ in range(count)]
+    melds, hand_state = check_win({**player_state, "hand": hand}, ID_TO_TILE[tile], self_pick)
+    hand_state["round_wind"] = round_wind
+    if last_draw:
+        hand_state["win_condition"].append("last_draw")
+    return score_hand(player_state["melds"] + melds, hand_state)
+
+
+def estimate_equity(
+    game_state: GameStateDict,
+    seat: int,
+    num_samples: int = 128,
+    opponents: str = "random",
+    seed: int | None = None
+) -> dict[int, EquityDict]:
+    '''
+    Estimates, for every tile the seat can discard, its chances of winning and dealing in before the wall runs out
+    seat must be the current player deciding on a discard. Every candidate is played out on the same num_samples
+    deals of the hidden tiles, with the rollouts of all candidates batched as NumPy operations on count arrays.
+    Rollouts are simplified: nobody claims anything but wins, the seat discards by tile efficiency, opponents
+    discard at random or by tile efficiency, and flowers drawn during the rollout are ignored.
+    Returns an EquityDict per candidate tile id.
+    '''
+    if opponents not in OPPONENT_POLICIES:
+        raise ValueError(f"Unknown opponent policy: {opponents}")
+    player_state = game_state["players"][seat]
+    hand = np.array(tiles_to_counts(player_state["hand"]))
+    if game_state["current_player"] != seat or hand.sum() % 3 != 2:
+        raise ValueError("seat is not deciding on a discard")
+
+    rng = np.random.default_rng(seed)
+    sampler = HiddenStateSampler(game_state, seat, int(rng.integers(2 ** 63)))
+    hand_counts, walls = sampler.sample_arrays(num_samples)
+    walls = walls[walls < NUM_TILES].reshape(num_samples, -1)  # flowers are skipped
+
+    # one row per (candidate, sample)
+    candidates = np.flatnonzero(hand)
+    rows = len(candidates) * num_samples
+    hands = np.tile(hand_counts, (len(candidates), 1, 1))
+    discards = np.repeat(candidates, num_samples)
+    walls = np.tile(walls, (len(candidates), 1))
+    row_ids = np.arange(rows)
+    hands[row_ids, seat, discards] -= 1
+    alive = np.ones(rows, dtype=np.bool_)
+    won = np.zeros(rows, dtype=np.bool_)
+    dealt_in = np.zeros(rows, dtype=np.bool_)
+    faan = np.zeros(rows, dtype=np.int64)
+    scores: dict[tuple[bytes, int, bool, bool], int] = {}
+
+    def score(wins: np.ndarray, tiles: np.ndarray, self_pick: bool, last_draw: bool) -> None:
+        '''Records the faan of the seat's wins, which are cached by hand as many rollouts end the same way'''
+        for r, tile in zip(wins.tolist(), tiles[wins].tolist()):
+            key = (hands[r, seat].tobytes(), tile, self_pick, last_draw)
+            if key not in scores:
+                scores[key] = _score_win(
+                    player_state, hands[r, seat], tile, self_pick, last_draw, game_state["round_wind"]
+                )
+            faan[r] = scores[key]
+
+    def resolve_discard(discarder: int, tiles: np.ndarray, last_draw: bool) -> None:
+        '''Wins on the tiles just discarded, in turn order from the discarder'''
+        claimed = ~alive
+        for i in range(1, NUM_PLAYERS):
+            p_id = (discarder + i) % NUM_PLAYERS
+            wins = ~claimed & check_win_batch(hands[:, p_id], tiles=tiles)
+            if p_id == seat:
+                score(np.flatnonzero(wins), tiles, False, last_draw)
+                won[wins] = True
+            elif discarder == seat:
+                dealt_in[wins] = True
+            claimed |= wins
+        alive[:] = ~claimed
+
+    resolve_discard(seat, discards, False)
+    p_id = seat
+    num_draws = walls.shape[1]
+    for draw in range(num_draws):
+        if not alive.any():
+            break
+        p_id = (p_id + 1) % NUM_PLAYERS
+        tiles = walls[:, -1 - draw]
+        last_draw = draw == num_draws - 1
+        hands[row_ids, p_id, tiles] += 1
+        wins = alive & check_win_batch(hands[:, p_id])
+        if p_id == seat:
+            score(np.flatnonzero(wins), tiles, True, last_draw)
+            won |= wins
+        alive &= ~wins
+        discards = _rollout_discards(hands[:, p_id], "heuristic" if p_id == seat else opponents, rng)
+        hands[row_ids, p_id, discards] -= 1
+        resolve_discard(p_id, discards, last_draw)
+
+    won = won.reshape(len(candidates), num_samples)
+    dealt_in = dealt_in.reshape(len(candidates), num_samples)
+    faan = faan.reshape(len(candidates), num_samples)
+    return {
+        int(t): {
+            "win": float(won[i].mean()),
+            "deal_in": float(dealt_in[i].mean()),
+            "expected_faan": float(faan[i].mean())
+        } for i, t in enumerate(candidates)
+    }
+
+
+class _RolloutPlayer(Player):
+    '''Plays the rollout policies of estimate_equity in the full engine, only ever claiming wins'''
+
+    def __init__(self, id: int, policy: str, rng: random.Random, first_discard: int | None = None) -> None:
+        super().__init__(id)
+        self.policy = policy
+        self.rng = rng
+        self.first_discard = first_discard
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        if options.get("win"):
+            return "win", options["win"]
+        return "", []
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        hand = state["players"][self.id]["hand"]
+        if self.first_discard is not None:
+            tile_id, self.first_discard = self.first_discard, None
+        elif self.policy == "random":
+            return self.rng.randrange(len(hand))
+        else:
+            counts = tiles_to_counts(hand)
+            values = {t: keep_value(counts, t) for t in range(NUM_TILES) if counts[t]}
+            best = min(values.values())
+            tile_id = self.rng.choice([t for t, value in values.items() if value == best])
+        return hand.index(ID_TO_TILE[tile_id])
+
+
+def simulate_equity(
+    game_state: GameStateDict,
+    seat: int,
+    discard: int,
+    num_games: int = 200,
+    opponents: str = "random",
+    seed: int | None = None
+) -> EquityDict:
+    '''
+    Reference for estimate_equity: plays the same rollout policies out in full MahjongGame runs after the seat
+    discards tile id discard. Much slower, meant for checking the estimator.
+    '''
+    if opponents not in OPPONENT_POLICIES:
+        raise ValueError(f"Unknown opponent policy: {opponents}")
+    rng = random.Random(seed)
+    sampler = HiddenStateSampler(game_state, seat, rng.getrandbits(63))
+    wins = deal_ins = total_faan = 0
+    for state in sampler.sample_states(num_games):
+        players: list[Player] = [_RolloutPlayer(i, opponents, rng) for i in range(NUM_PLAYERS)]
+        players[seat] = _RolloutPlayer(seat, "heuristic", rng, discard)
+        game = MahjongGame.from_state(state, players, verbose=False)
+        game.play_discard(seat)
+        while not game.game_state["done"]:
+            game.step()
+        winner = game.get_winner()
+        if winner is None:
+            continue
+        hand_state = game.game_state["winning_hand_state"]
+        if winner == seat:
+            wins += 1
+            total_faan += score_hand(game.game_state["players"][seat]["melds"], hand_state)
+        elif game.game_state["current_player"] == seat and "self_pick" not in hand_state["win_condition"]:
+            deal_ins += 1
+    return {"win": wins / num_games, "deal_in": deal_ins / num_games, "expected_faan": total_faan / num_games}
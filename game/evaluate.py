@@ -0,0 +1,139 @@
+'''
+Duplicate-format evaluation of agents
+
+Every wall (one seed of init_wall) is played once for each seat rotation of a lineup of agents, so every agent
+plays every seat of every wall and the luck of the deal largely cancels out of the comparison. Results are paired
+by wall: an agent's score on a wall is its mean payoff over all the seats it played there, and differences between
+agents are taken wall by wall before averaging.
+'''
+from __future__ import annotations
+import statistics
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Sequence, TypedDict
+from game.mahjong import GamePool, NUM_PLAYERS
+from game.player import Player
+
+# (seat, seed) -> player for that seat, must be picklable (e.g. a class or functools.partial) to use worker processes
+AgentFactory = Callable[[int, int], Player]
+
+
+class EstimateDict(TypedDict):
+    mean: float  # payoff in faan per seat per game
+    ci: float  # half-width of the confidence interval of the mean
+    n: int  # number of paired samples (walls)
+
+
+class DuplicateResultDict(TypedDict):
+    walls: int
+    games: int
+    agents: dict[str, EstimateDict]
+    differences: dict[str, EstimateDict]  # "a - b" -> per-wall score difference of a over b, for every pair
+
+
+def seat_rotations(lineup: Sequence[str]) -> list[tuple[str, ...]]:
+    '''The distinct cyclic rotations of a lineup of agent names, one per seat'''
+    if len(lineup) != NUM_PLAYERS:
+        raise ValueError(f"A lineup needs {NUM_PLAYERS} agents")
+    rotations = [
+        tuple(lineup[(seat - shift) % NUM_PLAYERS] for seat in range(NUM_PLAYERS))
+        for shift in range(NUM_PLAYERS)
+    ]
+    return list(dict.fromkeys(rotations))
+
+
+def play_game(
+    agents: dict[str, AgentFactory], seating: Sequence[str], seed: int, pool: GamePool | None = None
+) -> list[int]:
+    '''
+    Plays the wall of seed with the given agent in each seat and returns the payoffs, in a game from pool if given
+    so that a loop over many walls resets the same game instead of allocating a new one
+    '''
+    if pool is None:
+        pool = GamePool()
+    with pool.game(seed, [agents[name](seat, seed) for seat, name in enumerate(seating)]) as game:
+        while not game.game_state["done"]:
+            game.step()
+        return game.get_payoffs()
+
+
+def play_games(
+    agents: dict[str, AgentFactory], seating: Sequence[str], seeds: Iterable[int], threads: int = 0
+) -> list[list[int]]:
+    '''
+    Plays the wall of every seed with the same seating and returns the payoffs in the order of seeds, on a pool of
+    threads if threads > 0. Each game and its players live in one thread, and the engine keeps no shared mutable
+    state, so the games run in parallel on a free-threaded interpreter and give the same payoffs as played serially.
+    '''
+    # the threads share one pool, checking out and returning are thread-safe and a game is only ever in one thread
+    play = partial(play_game, agents, seating, pool=GamePool())
+    if threads > 0:
+        with ThreadPoolExecutor(threads) as pool:
+            return list(pool.map(play, seeds))
+    return [play(seed) for seed in seeds]
+
+
+def play_wall(agents: dict[str, AgentFactory], lineup: Sequence[str], seed: int) -> dict[str, float]:
+    '''Plays one wall in every seat rotation of lineup, returns each agent's mean payoff per seat played'''
+    totals = dict.fromkeys(lineup, 0.0)
+    seats = dict.fromkeys(lineup, 0)
+    pool = GamePool()
+    for seating in seat_rotations(lineup):
+        for name, payoff in zip(seating, play_game(agents, seating, seed, pool)):
+            totals[name] += payoff
+            seats[name] += 1
+    return {name: totals[name] / seats[name] for name in totals}
+
+
+def _estimate(samples: list[float], z: float) -> EstimateDict:
+    n = len(samples)
+    sd = statistics.stdev(samples) if n > 1 else 0.0
+    return {"mean": statistics.fmean(samples), "ci": z * sd / n ** 0.5, "n": n}
+
+
+def summarize(wall_scores: list[dict[str, float]], num_games: int, confidence: float = 0.95) -> DuplicateResultDict:
+    '''Turns the per-wall scores of play_wall into per-agent means and paired differences with confidence intervals'''
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    names = list(wall_scores[0])
+    return {
+        "walls": len(wall_scores),
+        "games": num_games,
+        "agents": {name: _estimate([scores[name] for scores in wall_scores], z) for name in names},
+        "differences": {
+            f"{a} - {b}": _estimate([scores[a] - scores[b] for scores in wall_scores], z)
+            for i, a in enumerate(names) for b in names[i + 1:]
+        }
+    }
+
+
+def evaluate_duplicate(
+    agents: dict[str, AgentFactory],
+    lineup: Sequence[str],
+    seeds: Iterable[int],
+    workers: int = 0,
+    confidence: float = 0.95
+) -> DuplicateResultDict:
+    '''
+    Plays every wall in seeds in every seat rotation of lineup (a list of agent names, one per seat) and returns
+    each agent's mean payoff and the paired differences between agents. Walls are spread over a pool of worker
+    processes if workers > 0.
+    '''
+    if not set(lineup) <= agents.keys():
+        raise ValueError(f"Unknown agents in lineup {lineup}")
+    if len(set(lineup)) < 2:
+        raise ValueError("A lineup needs at least two different agents")
+    seeds = list(seeds)
+    if workers > 0:
+        with ProcessPoolExecutor(workers) as pool:
+            chunksize = max(1, len(seeds) // (4 * workers))
+            wall_scores = list(pool.map(partial(play_wall, agents, lineup), seeds, chunksize=chunksize))
+    else:
+        wall_scores = [play_wall(agents, lineup, seed) for seed in seeds]
+    return summarize(wall_scores, len(seeds) * len(seat_rotations(lineup)), confidence)
+
+
+def format_result(result: DuplicateResultDict) -> str:
+    lines = [f"walls: {result['walls']}, games: {result['games']}"]
+    for name, estimate in {**result["agents"], **result["differences"]}.items():
+        lines.append(f"{name}: {estimate['mean']:+.3f} +- {estimate['ci']:.3f} faan per game")
+    return "\n".join(lines)
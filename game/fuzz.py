@@ -0,0 +1,517 @@
+'''
+Differential fuzzing of fast paths of the rules against their reference implementations
+
+A case is one player's tiles -- a concealed hand, exposed melds (flowers, and now and then a pung whose last copy
+is drawn for a kong upgrade) and discards -- plus a tile drawn or discarded. Cases are built at random and around
+complete hands, flushes, thirteen orphans, nine gates and kongs, with one tile swapped now and then for near
+misses, which is where the rules are hard. Every registered candidate runs on the same cases as the reference
+function it replaces, and each case on which the results differ (or only one of them raises) is shrunk to a case
+that still shows the difference but no longer does once any meld, discard or hand tile is dropped.
+
+fuzz also plays games and checks the invariants of the engine after every step: all 144 tiles accounted for,
+hand sizes, the visible counts and the Zobrist hash.
+
+Cases and games are split into chunks with their own seeds, run on a pool of worker processes if workers > 0, so
+a run gives the same results whatever the number of workers.
+
+    python -m game.fuzz --cases 1000000 --games 1000 --workers 4
+'''
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, TypedDict
+import numpy as np
+from game.batch import check_win_batch
+from game.constants import ID_TO_TILE, NUM_TILES, TILE_TO_CODE, TILE_TO_ID
+from game.mahjong import MahjongGame, NUM_PLAYERS, WINDS
+from game.player import HeuristicAIPlayer, Player, RandomAIPlayer
+from game.scenario import format_tiles, validate_state, validate_tiles
+from game.tile import Suit, Tile
+from game.utils import FLOWER_VALUES, GameStateDict, PlayerStateDict
+from game.utils import check_chow, check_kong, check_pung, check_win, get_action_mask, get_visible_counts, score_hand
+from game.zobrist import hash_state
+
+
+class CaseDict(TypedDict):
+    player: PlayerStateDict  # concealed hand without the tile
+    tile: Tile
+    self_pick: bool  # the player drew the tile, rather than another player discarding it
+    round_wind: str
+
+
+class MismatchDict(TypedDict):
+    candidate: str
+    reference: str
+    case: CaseDict  # shrunk
+    expected: str  # what the reference gives for the shrunk case
+    actual: str
+
+
+class ViolationDict(TypedDict):
+    seed: int
+    step: int
+    message: str
+
+
+class FuzzResultDict(TypedDict):
+    cases: int
+    games: int
+    steps: int
+    mismatches: dict[str, int]  # candidate -> cases on which it differed from its reference
+    reproducers: list[MismatchDict]  # up to max_reports shrunk cases per candidate
+    violations: list[ViolationDict]
+    seconds: float
+
+
+# a reference takes one case, a candidate a batch of them so that vectorized paths can be fuzzed as they are used,
+# results are compared with ==
+ReferenceFunction = Callable[[CaseDict], object]
+CandidateFunction = Callable[[list[CaseDict]], list[object]]
+
+_ORPHAN_IDS = (0, 8, 9, 17, 18, 26) + tuple(range(27, NUM_TILES))
+STYLES = ("random", "complete", "flush", "honors", "orphans", "gates", "kong")
+
+
+def random_case(rng: random.Random) -> CaseDict:
+    '''A case of a random style, every tile at most as often as the game has it'''
+    left = [4] * NUM_TILES
+    style = rng.choice(STYLES)
+    suit = rng.randrange(3)
+    if style == "flush":
+        allowed = [t for t in range(NUM_TILES) if t >= 27 or t // 9 == suit]
+    elif style == "honors":
+        allowed = list(range(27, NUM_TILES))
+    elif style == "orphans":
+        allowed = list(_ORPHAN_IDS)
+    elif style == "gates":
+        allowed = list(range(9 * suit, 9 * suit + 9))
+    else:
+        allowed = list(range(NUM_TILES))
+
+    def take(tiles: list[int]) -> bool:
+        for t in tiles:
+            left[t] -= 1
+        if min(left[t] for t in tiles) < 0:
+            for t in tiles:
+                left[t] += 1
+            return False
+        return True
+
+    def random_set() -> list[int] | None:
+        for _ in range(20):
+            start = rng.choice(allowed)
+            if start < 27 and start % 9 <= 6 and style in ("random", "complete", "flush") and rng.random() < 0.5:
+                tiles = [start, start + 1, start + 2]
+            else:
+                tiles = [start] * 3
+            if take(tiles):
+                return tiles
+        return None
+
+    def random_tile() -> int:
+        # the style's tiles while there are any left, then any tile
+        choices = [t for t in allowed if left[t]] or [t for t in range(NUM_TILES) if left[t]]
+        t = rng.choice(choices)
+        left[t] -= 1
+        return t
+
+    melds: list[list[int]] = []
+    for _ in range(rng.choice((0, 0, 1, 1, 2, 3, 4))):
+        tiles = random_set()
+        if tiles is None:
+            break
+        if tiles[0] == tiles[1] and rng.random() < 0.25 and take(tiles[:1]):
+            tiles.append(tiles[0])
+        melds.append(tiles)
+    upgrade = None
+    if style == "kong" and rng.random() < 0.5:
+        # an exposed pung whose last copy is drawn
+        pungs = [meld[0] for meld in melds if len(meld) == 3 and meld[0] == meld[1] and left[meld[0]]]
+        if not pungs and len(melds) < 4:
+            pung = rng.choice([t for t in range(NUM_TILES) if left[t] == 4])
+            take([pung] * 3)
+            melds.append([pung] * 3)
+            pungs = [pung]
+        if pungs:
+            upgrade = rng.choice(pungs)
+            take([upgrade])
+
+    size = 14 - 3 * len(melds)  # hand and tile
+    hand: list[int] = []
+    if style == "orphans" and not melds and rng.random() < 0.5 and take(list(_ORPHAN_IDS)):
+        hand = list(_ORPHAN_IDS)
+    elif style == "gates" and not melds and take([9 * suit + i for i in (0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 8, 8)]):
+        hand = [9 * suit + i for i in (0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 8, 8)]
+    elif style != "random":
+        for _ in range(4 - len(melds)):
+            tiles = random_set()
+            if tiles is not None:
+                hand += tiles
+        pair = rng.choice(allowed)
+        if take([pair, pair]):
+            hand += [pair, pair]
+    if rng.random() < 0.3 and hand:
+        # most of these are near misses
+        left[hand.pop(rng.randrange(len(hand)))] += 1
+    while len(hand) > size - (upgrade is not None):
+        left[hand.pop(rng.randrange(len(hand)))] += 1
+    while len(hand) < size - (upgrade is not None):
+        hand.append(random_tile())
+    rng.shuffle(hand)
+
+    if upgrade is not None:
+        tile, self_pick = upgrade, True
+    elif style == "kong" and (triples := [t for t, n in Counter(hand).items() if n == 3 and left[t]]):
+        # a kong by discard of the last copy of a triple in the hand
+        tile = rng.choice(triples)
+        take([tile])
+        left[hand.pop(next(i for i, t in enumerate(hand) if t != tile))] += 1
+        self_pick = False
+    else:
+        tile, self_pick = hand.pop(), rng.random() < 0.5
+
+    discards = [random_tile() for _ in range(rng.randrange(6))]
+    flowers = rng.choice([[], [], [], rng.sample(range(8), rng.randrange(1, 4)), [0, 1, 2, 3], [4, 5, 6, 7]])
+    exposed = [[ID_TO_TILE[t] for t in meld] for meld in melds]
+    exposed += [[Tile(Suit.FLOWER, FLOWER_VALUES[i])] for i in flowers]
+    rng.shuffle(exposed)
+    return {
+        "player": {
+            "id": 0,
+            "seat_wind": rng.choice(WINDS),
+            "hand": [ID_TO_TILE[t] for t in hand],
+            "melds": exposed,
+            "discards": [ID_TO_TILE[t] for t in discards]
+        },
+        "tile": ID_TO_TILE[tile],
+        "self_pick": self_pick,
+        "round_wind": rng.choice(WINDS)
+    }
+
+
+def format_case(case: CaseDict) -> str:
+    player = case["player"]
+    return (
+        f"hand {format_tiles(player['hand'])}, melds [{', '.join(format_tiles(meld) for meld in player['melds'])}], "
+        f"discards {format_tiles(player['discards']) or '-'}, {'draws' if case['self_pick'] else 'discard'} "
+        f"{format_tiles([case['tile']])}, seat {player['seat_wind']}, round {case['round_wind']}"
+    )
+
+
+def _player(case: CaseDict) -> PlayerStateDict:
+    '''The player state the rule functions expect, a drawn tile is in the hand'''
+    if not case["self_pick"]:
+        return case["player"]
+    return {**case["player"], "hand": case["player"]["hand"] + [case["tile"]]}
+
+
+def _codes(melds: list[list[Tile]]) -> tuple[tuple[int, ...], ...]:
+    return tuple(tuple(TILE_TO_CODE[tile] for tile in meld) for meld in melds)
+
+
+def _win(case: CaseDict) -> tuple[bool, int]:
+    '''Whether the case is a win, and its faan (0 if not)'''
+    player = _player(case)
+    melds, state = check_win(player, case["tile"], case["self_pick"])
+    if not melds:
+        return False, 0
+    state["round_wind"] = case["round_wind"]
+    return True, score_hand(player["melds"] + melds, state)
+
+
+def _action_mask(case: CaseDict) -> tuple[int, ...]:
+    '''get_action_mask for the meld phase, after the player's draw or another player's discard'''
+    empty: list[PlayerStateDict] = [
+        {"id": p_id, "seat_wind": WINDS[p_id], "hand": [], "melds": [], "discards": []} for p_id in range(NUM_PLAYERS)
+    ]
+    game_state: GameStateDict = {
+        "wall": [],
+        "round_wind": case["round_wind"],
+        "current_player": 0 if case["self_pick"] else 1,
+        "first": False,
+        "discard": False,
+        "kong": False,
+        "double_kong": False,
+        "draw": False,
+        "done": False,
+        "winning_hand_state": None,
+        "phase": "meld",
+        "visible": [0] * NUM_TILES,
+        "players": {0: _player(case), 1: empty[1], 2: empty[2], 3: empty[3]}
+    }
+    return tuple(get_action_mask(game_state, 0, None if case["self_pick"] else case["tile"]))
+
+
+REFERENCES: dict[str, ReferenceFunction] = {
+    "check_win": _win,
+    "check_kong": lambda case: _codes(check_kong(_player(case), case["tile"], case["self_pick"])),
+    "check_pung": lambda case: _codes(check_pung(_player(case), case["tile"], case["self_pick"])),
+    "check_chow": lambda case: _codes(check_chow(_player(case), case["tile"], case["self_pick"])),
+    "get_action_mask": _action_mask
+}
+CANDIDATES: dict[str, tuple[str, CandidateFunction]] = {}
+
+
+def register_candidate(name: str, reference: str) -> Callable[[CandidateFunction], CandidateFunction]:
+    '''Registers a fast path, a function from a batch of cases to a result per case, to be fuzzed against reference'''
+    if reference not in REFERENCES:
+        raise ValueError(f"Unknown reference {reference}, one of {list(REFERENCES)}")
+
+    def register(candidate: CandidateFunction) -> CandidateFunction:
+        CANDIDATES[name] = (reference, candidate)
+        return candidate
+    return register
+
+
+@register_candidate("check_win_batch", "check_win")
+def _check_win_batch(cases: list[CaseDict]) -> list[object]:
+    results: list[object] = [None] * len(cases)
+    for wind in WINDS:
+        rows = [i for i, case in enumerate(cases) if case["round_wind"] == wind]
+        if not rows:
+            continue
+        counts = np.zeros((len(rows), NUM_TILES), dtype=np.int8)
+        for row, i in enumerate(rows):
+            for tile in cases[i]["player"]["hand"]:
+                counts[row, TILE_TO_ID[tile]] += 1
+        tiles = np.array([TILE_TO_ID[cases[i]["tile"]] for i in rows])
+        self_pick = np.array([cases[i]["self_pick"] for i in rows])
+        states = [cases[i]["player"] for i in rows]
+        wins, faan = check_win_batch(counts, states, tiles, self_pick, wind, faan=True)
+        for row, i in enumerate(rows):
+            results[i] = (bool(wins[row]), int(faan[row]))
+    return results
+
+
+class _Raised:
+    '''The outcome of a call that raised, equal to any other call that raised the same type'''
+
+    def __init__(self, error: Exception) -> None:
+        self.name = type(error).__name__
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Raised) and other.name == self.name
+
+    def __repr__(self) -> str:
+        return f"raises {self.name}"
+
+
+def _reference_outcomes(reference: ReferenceFunction, cases: list[CaseDict]) -> list[object]:
+    outcomes: list[object] = []
+    for case in cases:
+        try:
+            outcomes.append(reference(case))
+        except Exception as error:
+            outcomes.append(_Raised(error))
+    return outcomes
+
+
+def _candidate_outcomes(candidate: CandidateFunction, cases: list[CaseDict]) -> list[object]:
+    try:
+        return candidate(cases)
+    except Exception:
+        # one at a time, to tell which cases raise
+        outcomes: list[object] = []
+        for case in cases:
+            try:
+                outcomes.append(candidate([case])[0])
+            except Exception as error:
+                outcomes.append(_Raised(error))
+        return outcomes
+
+
+def _simplifications(case: CaseDict) -> Iterable[CaseDict]:
+    '''Cases with one thing less than case, the biggest steps first'''
+    player = case["player"]
+    if player["discards"]:
+        yield {**case, "player": {**player, "discards": []}}
+    for i in range(len(player["melds"])):
+        yield {**case, "player": {**player, "melds": player["melds"][:i] + player["melds"][i + 1:]}}
+    if len(player["hand"]) > 1:
+        for i in range(len(player["hand"])):
+            yield {**case, "player": {**player, "hand": player["hand"][:i] + player["hand"][i + 1:]}}
+    if case["self_pick"]:
+        yield {**case, "self_pick": False}
+    if player["seat_wind"] != WINDS[0]:
+        yield {**case, "player": {**player, "seat_wind": WINDS[0]}}
+    if case["round_wind"] != WINDS[0]:
+        yield {**case, "round_wind": WINDS[0]}
+
+
+def shrink(case: CaseDict, candidate: str) -> CaseDict:
+    '''
+    Simplifies a case on which a registered candidate differs from its reference, one step at a time for as long as
+    some step keeps them apart. A reference that raises only counts if it raised on the original case too.
+    '''
+    reference_name, function = CANDIDATES[candidate]
+    reference = REFERENCES[reference_name]
+    raised = isinstance(_reference_outcomes(reference, [case])[0], _Raised)
+
+    def differs(case: CaseDict) -> bool:
+        expected = _reference_outcomes(reference, [case])[0]
+        return isinstance(expected, _Raised) == raised and _candidate_outcomes(function, [case])[0] != expected
+
+    simplified = True
+    while simplified:
+        simplified = False
+        for simpler in _simplifications(case):
+            if differs(simpler):
+                case = simpler
+                simplified = True
+                break
+    return case
+
+
+def check_invariants(game: MahjongGame) -> list[str]:
+    '''The invariants of the engine the state of game breaks, checked between steps'''
+    game_state = game.game_state
+    problems = []
+    try:
+        if game_state["done"]:
+            validate_tiles(game_state)
+        else:
+            validate_state(game_state)
+    except ValueError as error:
+        problems.append(str(error))
+    if game_state["visible"] != get_visible_counts(game_state):
+        problems.append("Visible counts are out of date")
+    if game.hash_key != hash_state(game_state):
+        problems.append("Zobrist hash is out of date")
+    if game_state["done"] and game_state["winning_hand_state"] is None and not game_state["draw"]:
+        problems.append("Game is done without a winner or a draw")
+    return problems
+
+
+def _fuzz_cases(candidates: list[str], seed: int, num_cases: int) -> list[tuple[str, CaseDict]]:
+    '''(candidate, case) for every generated case on which a candidate differs from its reference'''
+    rng = random.Random(seed)
+    cases = [random_case(rng) for _ in range(num_cases)]
+    expected: dict[str, list[object]] = {}
+    mismatches = []
+    for name in candidates:
+        reference, candidate = CANDIDATES[name]
+        if reference not in expected:
+            expected[reference] = _reference_outcomes(REFERENCES[reference], cases)
+        actual = _candidate_outcomes(candidate, cases)
+        mismatches += [(name, case) for case, a, b in zip(cases, expected[reference], actual) if a != b]
+    return mismatches
+
+
+def _fuzz_games(seeds: list[int]) -> tuple[int, list[ViolationDict]]:
+    '''Plays a game per seed, random players against heuristic ones, checking the invariants after every step'''
+    steps = 0
+    violations: list[ViolationDict] = []
+    for seed in seeds:
+        game = MahjongGame(seed, verbose=False)
+        players: list[Player] = [
+            RandomAIPlayer(i, seed) if (i + seed) % 2 else HeuristicAIPlayer(i, budget=float("inf"))
+            for i in range(NUM_PLAYERS)
+        ]
+        game.set_players(players)
+        step = 0
+        while not game.game_state["done"]:
+            game.step()
+            step += 1
+            problems = check_invariants(game)
+            violations += [{"seed": seed, "step": step, "message": message} for message in problems]
+            if problems:
+                break
+        steps += step
+    return steps, violations
+
+
+def fuzz(
+    num_cases: int = 100_000,
+    num_games: int = 0,
+    candidates: Iterable[str] | None = None,
+    workers: int = 0,
+    seed: int = 0,
+    chunk_size: int = 2000,
+    max_reports: int = 5
+) -> FuzzResultDict:
+    '''Fuzzes the registered candidates (all by default) on num_cases cases and checks num_games games'''
+    names = list(CANDIDATES) if candidates is None else list(candidates)
+    unknown = set(names) - CANDIDATES.keys()
+    if unknown:
+        raise ValueError(f"Unknown candidates {sorted(unknown)}")
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    chunks = [min(chunk_size, num_cases - i) for i in range(0, num_cases, chunk_size)]
+    chunk_seeds = [rng.getrandbits(64) for _ in chunks]
+    game_seeds = list(range(seed * num_games, (seed + 1) * num_games))
+    game_chunks = [game_seeds[i:i + 10] for i in range(0, num_games, 10)]
+    if workers > 0:
+        with ProcessPoolExecutor(workers) as pool:
+            case_results = list(pool.map(partial(_fuzz_cases, names), chunk_seeds, chunks))
+            game_results = list(pool.map(_fuzz_games, game_chunks))
+    else:
+        case_results = [_fuzz_cases(names, chunk_seed, size) for chunk_seed, size in zip(chunk_seeds, chunks)]
+        game_results = [_fuzz_games(chunk) for chunk in game_chunks]
+
+    mismatches = dict.fromkeys(names, 0)
+    reproducers: list[MismatchDict] = []
+    seen = set()
+    for name, case in (mismatch for result in case_results for mismatch in result):
+        mismatches[name] += 1
+        if mismatches[name] > max_reports:
+            continue
+        case = shrink(case, name)
+        if (name, format_case(case)) in seen:
+            continue
+        seen.add((name, format_case(case)))
+        reference, candidate = CANDIDATES[name]
+        reproducers.append({
+            "candidate": name,
+            "reference": reference,
+            "case": case,
+            "expected": repr(_reference_outcomes(REFERENCES[reference], [case])[0]),
+            "actual": repr(_candidate_outcomes(candidate, [case])[0])
+        })
+    return {
+        "cases": num_cases,
+        "games": num_games,
+        "steps": sum(steps for steps, _ in game_results),
+        "mismatches": mismatches,
+        "reproducers": reproducers,
+        "violations": [violation for _, violations in game_results for violation in violations],
+        "seconds": time.perf_counter() - start
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("candidates", nargs="*", help=f"all by default: {', '.join(CANDIDATES)}")
+    parser.add_argument("--cases", type=int, default=100_000)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    unknown = [name for name in args.candidates if name not in CANDIDATES]
+    if unknown:
+        parser.error(f"unknown candidates {', '.join(unknown)}, choose from {', '.join(CANDIDATES)}")
+
+    result = fuzz(args.cases, args.games, args.candidates or None, args.workers, args.seed)
+    print(
+        f"{result['cases']:,} cases and {result['games']} games ({result['steps']:,} steps) "
+        f"in {result['seconds']:.1f} s, {result['cases'] / result['seconds']:,.0f} cases/s"
+    )
+    for name, count in result["mismatches"].items():
+        print(f"{name}: {count} mismatches")
+    for mismatch in result["reproducers"]:
+        print(
+            f"{mismatch['candidate']} vs {mismatch['reference']}: {format_case(mismatch['case'])}\n"
+            f"    expected {mismatch['expected']}, got {mismatch['actual']}"
+        )
+    for violation in result["violations"]:
+        print(f"game {violation['seed']}, step {violation['step']}: {violation['message']}")
+    if result["violations"] or any(result["mismatches"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+from __future__ import annotations
+import math
+import random
+import time
+from concurrent.futures import Executor
+from game.constants import Action
+from game.mahjong import MahjongGame, NUM_PLAYERS
+from game.player import Player, HeuristicAIPlayer
+from game.sampler import HiddenStateSampler
+from game.tile import Tile
+from game.utils import GameStateDict, get_action_mask, get_options_mask, decode_meld_action, decode_discard_action
+
+
+# number of determinizations drawn from the sampler at a time
+SAMPLE_BATCH = 16
+
+
+class _Node:
+    __slots__ = ("visits", "total", "avail", "children")
+
+    def __init__(self) -> None:
+        self.visits = 0
+        self.total = 0.0  # sum of payoffs of the playouts through this node
+        self.avail = 0  # number of times this node's action was legal when its parent was visited
+        self.children: dict[int, _Node] = {}
+
+
+class _TreePlayer(Player):
+    '''
+    Plays the searching seat inside a playout: follows the tree while it can, adds one node, then hands over
+    to the rollout player for the rest of the game
+    '''
+
+    def __init__(self, id: int, root: _Node, rollout: Player, rng: random.Random, exploration: float) -> None:
+        super().__init__(id)
+        self.node: _Node | None = root
+        self.path = [root]
+        self.rollout = rollout
+        self.rng = rng
+        self.exploration = exploration
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        if self.node is None:
+            return self.rollout.query_meld(state, options)
+        return decode_meld_action(self._select(get_options_mask(options)), options)
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        if self.node is None:
+            return self.rollout.query_discard(state, sorted_hand)
+        action = self._select(get_action_mask(state, self.id, None))
+        return decode_discard_action(action, state["players"][self.id]["hand"])
+
+    def _select(self, mask: list[int]) -> int:
+        node = self.node
+        assert node is not None
+        legal = [i for i, allowed in enumerate(mask) if allowed]
+        untried = []
+        for action in legal:
+            child = node.children.get(action)
+            if child is None:
+                untried.append(action)
+            else:
+                child.avail += 1
+        if untried:
+            action = self.rng.choice(untried)
+            child = _Node()
+            child.avail = 1
+            node.children[action] = child
+            self.path.append(child)
+            self.node = None  # expanded, the rest of the game is a rollout
+            return action
+
+        def ucb(action: int) -> float:
+            child = node.children[action]
+            return child.total / child.visits + self.exploration * math.sqrt(math.log(child.avail) / child.visits)
+
+        action = max(legal, key=ucb)
+        self.node = node.children[action]
+        self.path.append(self.node)
+        return action
+
+
+def run_search(
+    game_state: GameStateDict,
+    seat: int,
+    budget: float,
+    seed: int | None = None,
+    exploration: float = 5.0,
+    rollout_budget: float = 20e-6
+) -> tuple[dict[int, tuple[int, float]], int]:
+    '''
+    Runs single-observer ISMCTS from the pending decision of seat for budget seconds
+    The decision must be either the discard of the current player or a claim on the latest discard
+    Returns the (visits, total payoff) of every root action and the number of iterations
+    '''
+    deadline = time.perf_counter() + budget
+    rng = random.Random(seed)
+    root = _Node()
+    discarder = game_state["current_player"]
+    claim = seat != discarder
+    sampler = HiddenStateSampler(game_state, seat, seed)
+    states: list[GameStateDict] = []
+    iterations = 0
+    while True:
+        if not states:
+            states = sampler.sample_states(SAMPLE_BATCH)
+        state = states.pop()
+        players: list[Player] = [HeuristicAIPlayer(i, budget=rollout_budget) for i in range(NUM_PLAYERS)]
+        tree_player = _TreePlayer(seat, root, players[seat], rng, exploration)
+        players[seat] = tree_player
+        game = MahjongGame.from_state(state, players, verbose=False)
+
+        # finish the interrupted turn, then play the game out
+        if claim:
+            game.play_claims(discarder, state["players"][discarder]["discards"][-1])
+        else:
+            game.play_discard(seat)
+        while not game.game_state["done"]:
+            game.step()
+
+        payoff = game.get_payoffs()[seat]
+        for node in tree_player.path:
+            node.visits += 1
+            node.total += payoff
+        iterations += 1
+        if time.perf_counter() >= deadline:
+            break
+    return {action: (child.visits, child.total) for action, child in root.children.items()}, iterations
+
+
+class ISMCTSPlayer(Player):
+    '''
+    Search-based reference player using determinized (single-observer information set) Monte Carlo tree search
+    Every iteration deals the hidden tiles at random, consistent with what this seat can see, and plays the game
+    out with cheap heuristic players. Discards and claims on discards are searched for budget seconds, and the
+    action with the best average faan payoff is chosen. With an executor, independent searches run in parallel
+    (one per worker) and their root statistics are merged.
+    '''
+
+    def __init__(
+        self,
+        id: int,
+        budget: float = 1.0,
+        executor: Executor | None = None,
+        num_workers: int = 1,
+        exploration: float = 5.0,
+        rollout_budget: float = 20e-6,
+        seed: int | None = None
+    ) -> None:
+        super().__init__(id)
+        self.budget = budget
+        self.executor = executor
+        self.num_workers = num_workers
+        self.exploration = exploration
+        self.rollout_budget = rollout_budget
+        self.rng = random.Random(seed)
+        # used for the decisions that are not searched (kongs on own draws)
+        self.fallback = HeuristicAIPlayer(id, budget=rollout_budget)
+        # search stats
+        self.searches = 0
+        self.iterations = 0
+        self.search_time = 0.0
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.search_time if self.search_time else 0.0
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        if options.get("win"):
+            return "win", options["win"]
+        if state["current_player"] == self.id or not state["players"][state["current_player"]]["discards"]:
+            self.fallback.id = self.id
+            return self.fallback.query_meld(state, options)
+        mask = get_options_mask(options)
+        return decode_meld_action(self._search(state, mask), options)
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        # the returned index refers to the unsorted hand, so sorted_hand does not apply
+        mask = get_action_mask(state, self.id, None)
+        return decode_discard_action(self._search(state, mask), state["players"][self.id]["hand"])
+
+    def _search(self, state: GameStateDict, mask: list[int]) -> int:
+        legal = [i for i, allowed in enumerate(mask) if allowed]
+        if len(legal) == 1:
+            return legal[0]
+
+        start = time.perf_counter()
+        seeds = [self.rng.getrandbits(64) for _ in range(max(self.num_workers, 1))]
+        args = (self.exploration, self.rollout_budget)
+        if self.executor is None:
+            results = [run_search(state, self.id, self.budget, seeds[0], *args)]
+        else:
+            futures = [
+                self.executor.submit(run_search, state, self.id, self.budget, seed, *args)
+                for seed in seeds
+            ]
+            results = [future.result() for future in futures]
+
+        stats: dict[int, list[float]] = {}
+        for root_stats, iterations in results:
+            self.iterations += iterations
+            for action, (visits, total) in root_stats.items():
+                entry = stats.setdefault(action, [0, 0.0])
+                entry[0] += visits
+                entry[1] += total
+        self.searches += 1
+        self.search_time += time.perf_counter() - start
+
+        if not stats:
+            return Action.PASS if mask[Action.PASS] else legal[0]
+        # best average payoff among the actions sampled often enough for their average to mean something
+        most_visits = max(visits for visits, _ in stats.values())
+        candidates = [action for action, (visits, _) in stats.items() if 4 * visits >= most_visits]
+        return max(candidates, key=lambda action: (stats[action][1] / stats[action][0], stats[action][0]))
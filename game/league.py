@@ -0,0 +1,248 @@
+'''
+League of agents with sequential early stopping
+
+Every pair of agents plays duplicate walls (see game.evaluate) until a sequential probability ratio test decides
+which one scores more faan, or until max_walls is reached. Walls are scheduled one at a time across worker
+processes, always for the undecided pairing that has played the fewest, so compute goes where the result is
+still open.
+
+    python -m game.league --workers 4 --out standings.txt
+'''
+from __future__ import annotations
+import argparse
+import math
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Literal, TypedDict
+from game.evaluate import AgentFactory, play_wall
+from game.player import HeuristicAIPlayer, Player, RandomAIPlayer
+
+
+# agents available to the command line, by name
+AGENTS: dict[str, AgentFactory] = {}
+
+
+def register_agent(name: str) -> Callable[[AgentFactory], AgentFactory]:
+    '''Registers a (seat, seed) -> Player factory under a name, it has to be picklable to run in worker processes'''
+    def register(factory: AgentFactory) -> AgentFactory:
+        AGENTS[name] = factory
+        return factory
+    return register
+
+
+@register_agent("random")
+def _random(seat: int, seed: int) -> Player:
+    return RandomAIPlayer(seat, seed)
+
+
+@register_agent("heuristic")
+def _heuristic(seat: int, seed: int) -> Player:
+    # an unlimited budget makes the player deterministic, so results do not depend on the machine's load
+    return HeuristicAIPlayer(seat, budget=float("inf"))
+
+
+@register_agent("heuristic-min3")
+def _heuristic_min3(seat: int, seed: int) -> Player:
+    return HeuristicAIPlayer(seat, budget=float("inf"), min_faan=3)
+
+
+@register_agent("heuristic-fast")
+def _heuristic_fast(seat: int, seed: int) -> Player:
+    # no time budget, only the cheapest stage runs
+    return HeuristicAIPlayer(seat, budget=0.0)
+
+
+class PairingDict(TypedDict):
+    a: str
+    b: str
+    walls: int
+    mean: float  # mean per-wall score difference of a over b, in faan per game
+    llr: float  # log likelihood ratio of "a is better by delta" over "b is better by delta"
+    result: Literal["a", "b", "undecided"] | None  # None while still running
+
+
+class StandingDict(TypedDict):
+    agent: str
+    wins: int  # pairings decided in favour of the agent
+    losses: int
+    undecided: int
+    walls: int
+    mean: float  # mean faan per game over all the agent's walls
+
+
+class _Pairing:
+    __slots__ = ("a", "b", "n", "total", "total_sq", "issued", "result", "scores")
+
+    def __init__(self, a: str, b: str) -> None:
+        self.a = a
+        self.b = b
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.issued = 0  # walls handed out, the next wall is seed + issued
+        self.result: Literal["a", "b", "undecided"] | None = None
+        self.scores: dict[str, float] = {a: 0.0, b: 0.0}  # summed per-wall scores of each agent
+
+    def add(self, scores: dict[str, float]) -> None:
+        d = scores[self.a] - scores[self.b]
+        self.n += 1
+        self.total += d
+        self.total_sq += d * d
+        for name in self.scores:
+            self.scores[name] += scores[name]
+
+    def llr(self, delta: float) -> float:
+        '''
+        Log likelihood ratio of mean +delta over mean -delta for normally distributed differences, with the
+        variance estimated from the walls so far
+        '''
+        if self.n < 2:
+            return 0.0
+        mean = self.total / self.n
+        var = (self.total_sq - self.n * mean * mean) / (self.n - 1)
+        if var <= 0:
+            return 0.0
+        return 2 * delta * self.total / var
+
+
+class League:
+    '''
+    Plays every pair of agents on duplicate walls until an SPRT with error rates alpha and beta decides which one
+    is better by at least delta faan per game, or max_walls have been played
+    '''
+
+    def __init__(
+        self,
+        agents: dict[str, AgentFactory],
+        delta: float = 0.5,
+        alpha: float = 0.05,
+        beta: float = 0.05,
+        min_walls: int = 10,
+        max_walls: int = 1000,
+        seed: int = 0
+    ) -> None:
+        if len(agents) < 2:
+            raise ValueError("A league needs at least two agents")
+        self.agents = agents
+        self.delta = delta
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.min_walls = min_walls
+        self.max_walls = max_walls
+        self.seed = seed
+        names = list(agents)
+        self._pairings = [_Pairing(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+
+    def run(self, workers: int = 0, out: str | Path | None = None) -> list[PairingDict]:
+        '''Plays until every pairing is decided, writing the standings to out after every decision if given'''
+        if workers > 0:
+            with ProcessPoolExecutor(workers) as pool:
+                running: dict[Future[dict[str, float]], _Pairing] = {}
+                while True:
+                    # two walls per worker keep the pool busy while results are processed
+                    while len(running) < 2 * workers and (pairing := self._next_pairing()) is not None:
+                        running[pool.submit(play_wall, *self._issue(pairing))] = pairing
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._record(running.pop(future), future.result(), out)
+        else:
+            while (pairing := self._next_pairing()) is not None:
+                self._record(pairing, play_wall(*self._issue(pairing)), out)
+        return self.pairings()
+
+    def pairings(self) -> list[PairingDict]:
+        return [{
+            "a": p.a,
+            "b": p.b,
+            "walls": p.n,
+            "mean": p.total / p.n if p.n else 0.0,
+            "llr": p.llr(self.delta),
+            "result": p.result
+        } for p in self._pairings]
+
+    def standings(self) -> list[StandingDict]:
+        table: dict[str, StandingDict] = {
+            name: {"agent": name, "wins": 0, "losses": 0, "undecided": 0, "walls": 0, "mean": 0.0}
+            for name in self.agents
+        }
+        for p in self._pairings:
+            for name, lost in ((p.a, "b"), (p.b, "a")):
+                row = table[name]
+                if p.result == "undecided":
+                    row["undecided"] += 1
+                elif p.result is not None:
+                    row["losses" if p.result == lost else "wins"] += 1
+                row["walls"] += p.n
+                row["mean"] += p.scores[name]
+        for row in table.values():
+            row["mean"] = row["mean"] / row["walls"] if row["walls"] else 0.0
+        return sorted(table.values(), key=lambda row: (row["wins"] - row["losses"], row["mean"]), reverse=True)
+
+    def format_standings(self) -> str:
+        lines = [f"{'agent':<20} {'W':>3} {'L':>3} {'U':>3} {'walls':>6} {'faan/game':>10}"]
+        for row in self.standings():
+            lines.append(
+                f"{row['agent']:<20} {row['wins']:>3} {row['losses']:>3} {row['undecided']:>3} "
+                f"{row['walls']:>6} {row['mean']:>+10.3f}"
+            )
+        lines.append("")
+        for p in self.pairings():
+            result = {None: "running", "a": f"{p['a']} better", "b": f"{p['b']} better"}.get(p["result"], "undecided")
+            lines.append(f"{p['a']} vs {p['b']}: {p['mean']:+.3f} faan/game over {p['walls']} walls, {result}")
+        return "\n".join(lines)
+
+    def _issue(self, pairing: _Pairing) -> tuple[dict[str, AgentFactory], list[str], int]:
+        '''Arguments of play_wall for the next wall of the pairing'''
+        seed = self.seed + pairing.issued
+        pairing.issued += 1
+        agents = {pairing.a: self.agents[pairing.a], pairing.b: self.agents[pairing.b]}
+        return agents, [pairing.a, pairing.b, pairing.a, pairing.b], seed
+
+    def _next_pairing(self) -> _Pairing | None:
+        '''The undecided pairing with the fewest walls handed out'''
+        open_pairings = [p for p in self._pairings if p.result is None and p.issued < self.max_walls]
+        return min(open_pairings, key=lambda p: p.issued, default=None)
+
+    def _record(self, pairing: _Pairing, scores: dict[str, float], out: str | Path | None) -> None:
+        if pairing.result is not None:
+            return  # decided while this wall was being played
+        pairing.add(scores)
+        llr = pairing.llr(self.delta)
+        if pairing.n >= self.min_walls and llr >= self.upper:
+            pairing.result = "a"
+        elif pairing.n >= self.min_walls and llr <= self.lower:
+            pairing.result = "b"
+        elif pairing.n >= self.max_walls:
+            pairing.result = "undecided"
+        if pairing.result is not None and out is not None:
+            Path(out).write_text(self.format_standings() + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("agents", nargs="*", help=f"registered agents, all by default: {', '.join(AGENTS)}")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--delta", type=float, default=0.5, help="smallest difference worth detecting, in faan/game")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--max-walls", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="file the standings are written to after every decision")
+    args = parser.parse_args()
+    unknown = [name for name in args.agents if name not in AGENTS]
+    if unknown:
+        parser.error(f"unknown agents {', '.join(unknown)}, choose from {', '.join(AGENTS)}")
+
+    names = args.agents or list(AGENTS)
+    league = League(
+        {name: AGENTS[name] for name in names}, args.delta, args.alpha, args.beta,
+        max_walls=args.max_walls, seed=args.seed
+    )
+    league.run(args.workers, args.out)
+    print(league.format_standings())
+
+
+if __name__ == "__main__":
+    main()
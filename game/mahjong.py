@@ -1,23 +1,92 @@
 from __future__ import annotations
-from game.utils import init_wall, check_win, check_kong, check_chow, check_pung, score_hand
-from game.utils import GameStateDict, PlayerActionDict
+import random
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+from game.utils import WALL_TILES, check_win, check_kong, check_chow, check_pung, score_hand
+from game.utils import GameStateDict, HandStateDict, PlayerActionDict, copy_game_state, get_visible_counts
+from game.constants import TILE_TO_ID, NUM_TILES, NUM_PLAYERS, HASH_TO_CODE, Delta
 from game.player import Player, HumanPlayer
 from game.tile import Tile, Suit
+from game.zobrist import HAND, MELD, DISCARD, ZobristHash, meld_zone
+
+if TYPE_CHECKING:
+    from game.risk import RiskTable
 
 
-NUM_PLAYERS = 4
 WINDS = ["east", "south", "west", "north"]
+# claims on a discard in priority order
+CLAIM_TYPES = ("win", "kong", "pung", "chow")
+CLAIM_CHECKS = {"kong": check_kong, "pung": check_pung, "chow": check_chow}
+_NO_VISIBLE = (0,) * NUM_TILES
 
 
 class MahjongGame:
     table: list[Tile]
     players: list[Player]
-
-    def __init__(self, seed: int | None = None) -> None:
+    zobrist: ZobristHash  # hash of where the tiles are, kept up to date by every move of a tile
+    claim_checks_skipped: dict[str, int]  # claim type -> rule checks on discards skipped as a higher claim was taken
+    claims: dict[str, int]  # claim type -> claims taken on discards this game
+    turns: int  # steps played this game
+    _rng: random.Random | None = None  # shuffles the wall, kept for reset()
+    events: list[tuple[int, ...]] | None = None  # state changes, recorded while a game.delta.DeltaRecorder is attached
+    risk: RiskTable | None = None  # deal-in risk table kept up to date by the game, see game.risk
+
+    def __init__(self, seed: int | None = None, verbose: bool = True) -> None:
         self.seed = seed
+        self.verbose = verbose  # print game progress
         self.players = [HumanPlayer(i) for i in range(NUM_PLAYERS)]
         self.init_game()
 
+    @classmethod
+    def from_state(
+        cls,
+        game_state: GameStateDict,
+        players: list[Player] | None = None,
+        verbose: bool = True
+    ) -> "MahjongGame":
+        '''Creates a game that continues from a copy of the given state instead of dealing a new one'''
+        game = cls.__new__(cls)
+        game.seed = None
+        game.verbose = verbose
+        game.players = players if players is not None else [HumanPlayer(i) for i in range(NUM_PLAYERS)]
+        if "visible" not in game_state:
+            game_state = {**game_state, "visible": get_visible_counts(game_state)}
+        game.game_state = copy_game_state(game_state)
+        game.zobrist = ZobristHash.from_state(game.game_state)
+        game.claim_checks_skipped = dict.fromkeys(CLAIM_TYPES, 0)
+        game.claims = dict.fromkeys(CLAIM_TYPES, 0)
+        game.turns = 0
+        return game
+
+    def copy(self, players: list[Player] | None = None, verbose: bool | None = None) -> "MahjongGame":
+        '''
+        Returns an independent copy of the game, optionally with other players. Nothing is attached to the copy
+        (game.events, game.risk), and players reading a RiskTable keep reading the one of this game
+        '''
+        game = MahjongGame.__new__(MahjongGame)
+        game.seed = self.seed
+        game.verbose = self.verbose if verbose is None else verbose
+        game.players = players if players is not None else list(self.players)
+        game.game_state = copy_game_state(self.game_state)
+        game.zobrist = self.zobrist.copy()  # cheaper than hashing the copy from scratch
+        game.claim_checks_skipped = self.claim_checks_skipped.copy()
+        game.claims = self.claims.copy()
+        game.turns = self.turns
+        return game
+
+    @property
+    def hash_key(self) -> int:
+        '''64-bit Zobrist hash of the game state, see game.zobrist'''
+        return self.zobrist.key(self.game_state)
+
+    def rehash(self) -> None:
+        '''Recomputes the hash from scratch, needed after changing the tiles of game_state directly'''
+        self.zobrist = ZobristHash.from_state(self.game_state)
+
+    def log(self, *args: object) -> None:
+        if self.verbose:
+            print(*args)
+
     def set_players(self, players: list[Player]) -> None:
         '''Set the players of the game'''
         if len(players) != NUM_PLAYERS:
@@ -38,6 +107,7 @@ class MahjongGame:
             "done": False,
             "winning_hand_state": None,
             "phase": "meld",  # game phase -- "meld", "discard", informs action mask generation
+            "visible": [0] * NUM_TILES,  # copies of each tile in discards and exposed melds
             "players": {
                 i: {
                     "id": i,
@@ -48,7 +118,56 @@ class MahjongGame:
                 } for i in range(NUM_PLAYERS)
             }
         }
-        self.game_state["wall"] = init_wall(self.seed)
+        self.zobrist = ZobristHash()
+        self.claim_checks_skipped = dict.fromkeys(CLAIM_TYPES, 0)
+        self.claims = dict.fromkeys(CLAIM_TYPES, 0)
+        self.reset(self.seed)
+
+    def reset(self, seed: int | None = None, players: list[Player] | None = None) -> None:
+        '''
+        Deals a new game with the given seed (and players) on the objects of this one: the dicts and lists of the
+        state are cleared and refilled in place and the wall is reshuffled in its own list, so a loop over many games
+        allocates next to nothing per game. The deal is the same as MahjongGame(seed)'s. Anything still holding on to
+        parts of the old state sees them change.
+        '''
+        if players is not None:
+            if len(players) != NUM_PLAYERS:
+                raise ValueError(f"Number of players must be {NUM_PLAYERS}")
+            self.players = players
+        self.seed = seed
+        state = self.game_state
+        state["round_wind"] = WINDS[0]
+        state["current_player"] = 0
+        state["first"] = True
+        state["discard"] = False
+        state["kong"] = False
+        state["double_kong"] = False
+        state["draw"] = False
+        state["done"] = False
+        state["winning_hand_state"] = None
+        state["phase"] = "meld"
+        state["visible"][:] = _NO_VISIBLE
+        for p_id, player_state in state["players"].items():
+            player_state["seat_wind"] = WINDS[p_id]
+            player_state["hand"].clear()
+            player_state["melds"].clear()
+            player_state["discards"].clear()
+        wall = state["wall"]
+        wall[:] = WALL_TILES
+        if self._rng is None:
+            self._rng = random.Random()
+        # the same shuffle as init_wall(seed)
+        self._rng.seed(seed)
+        self._rng.shuffle(wall)
+        self.zobrist.clear()
+        for claim in CLAIM_TYPES:
+            self.claim_checks_skipped[claim] = 0
+            self.claims[claim] = 0
+        self.turns = 0
+        if self.events is not None:
+            self.events.append((Delta.RESET,))
+        if self.risk is not None:
+            self.risk.reset()
 
         # deal 14 tiles to dealer, 13 tiles to others
         for i in range(NUM_PLAYERS):
@@ -63,10 +182,18 @@ class MahjongGame:
             tile = self.game_state["wall"].pop()
             if tile.suit == Suit.FLOWER:
                 player_state["melds"].append([tile])
-                print(f"Player {p_id} drew {tile}, drawing replacement tile")
+                self.zobrist.add(MELD, p_id, tile)
+                if self.events is not None:
+                    self.events.append((Delta.FLOWER, p_id, HASH_TO_CODE[hash(tile)]))
+                self.log(f"Player {p_id} drew {tile}, drawing replacement tile")
                 self.game_state["kong"] = True
             else:
                 player_state["hand"].append(tile)
+                self.zobrist.add(HAND, p_id, tile)
+                if self.risk is not None:
+                    self.risk.draw(p_id)
+                if self.events is not None:
+                    self.events.append((Delta.DRAW, p_id, HASH_TO_CODE[hash(tile)]))
                 return tile
         return None
 
@@ -86,6 +213,7 @@ class MahjongGame:
         if self.check_game_draw():
             return
 
+        self.turns += 1
         p_id = self.game_state["current_player"]
 
         if self.game_state["first"] and self.check_heavenly_hand(p_id):
@@ -96,8 +224,15 @@ class MahjongGame:
         if self.check_current_player_options(p_id, tile):
             return
 
+        self.play_discard(p_id)
+
+    def play_discard(self, p_id: int) -> None:
+        '''Plays the rest of the turn from the discard decision of player p_id (steps 5-7)'''
         discarded_tile = self.discard_tile_step(p_id)
+        self.play_claims(p_id, discarded_tile)
 
+    def play_claims(self, p_id: int, discarded_tile: Tile) -> None:
+        '''Plays the rest of the turn from the claims on the tile just discarded by player p_id (steps 6-7)'''
         if self.resolve_other_actions(discarded_tile, p_id):  # don't want to change current player if action taken
             return
 
@@ -105,7 +240,7 @@ class MahjongGame:
 
     def check_game_draw(self) -> bool:
         if not self.game_state["wall"]:
-            print("Draw")
+            self.log("Draw")
             self.game_state["done"] = True
             self.game_state["draw"] = True
             return True
@@ -123,7 +258,7 @@ class MahjongGame:
         }
         _, meld = player.query_meld(self.game_state, options)
         if meld:
-            print(f"Player {p_id} wins with a heavenly hand")
+            self.log(f"Player {p_id} wins with a heavenly hand")
             state["round_wind"] = self.game_state["round_wind"]
             state["win_condition"].append("heavenly_hand")
             self.game_state["done"] = True
@@ -136,12 +271,11 @@ class MahjongGame:
         # Do not deal a tile if this is the first turn or if this is a discarding step
         if not self.game_state["first"] and not self.game_state["discard"]:
             tile = self.deal_tile(p_id)
-            print(f"Player {p_id} draws {tile}")
+            self.log(f"Player {p_id} draws {tile}")
         return tile
 
     def resolve_kong(self, p_id: int, next_p_id: int, meld: list[list[Tile]]) -> None:
         player_state = self.game_state["players"][p_id]
-        next_player_state = self.game_state["players"][next_p_id]
 
         tile = meld[0][0]
         # Check if other players can rob the kong
@@ -151,7 +285,7 @@ class MahjongGame:
                 return
         elif tile is not None:
             # add discarded tile to hand
-            next_player_state["hand"].append(player_state["discards"].pop())
+            self.take_discard(p_id, next_p_id)
         self.perform_single_meld(next_p_id, meld[0])
         self.set_draw_replacement_after_kong(next_p_id)
 
@@ -171,7 +305,7 @@ class MahjongGame:
 
         if action == "win":
             self.perform_win(p_id, meld)
-            print(f"Player {p_id} wins")
+            self.log(f"Player {p_id} wins")
             state["round_wind"] = self.game_state["round_wind"]
             if not self.game_state["wall"]:
                 state["win_condition"].append("last_draw")
@@ -182,9 +316,9 @@ class MahjongGame:
                     state["win_condition"].append("win_by_kong")
             self.game_state["done"] = True
             self.game_state["winning_hand_state"] = state
-            print("Winning hand: ", player_state["melds"])
-            print("Winning hand state: ", state)
-            print("Winning hand score: ", score_hand(player_state["melds"], state))
+            self.log("Winning hand: ", player_state["melds"])
+            self.log("Winning hand state: ", state)
+            self.log("Winning hand score: ", score_hand(player_state["melds"], state))
             return True
 
         # Check current player for kong (from exposed pung)
@@ -209,8 +343,11 @@ class MahjongGame:
                 # Drawn tile goes to the person who robbed the current player
                 player_state["hand"].remove(drawn_tile)
                 next_player_state["hand"].append(drawn_tile)
+                self.zobrist.move(HAND, p_id, HAND, next_player_idx, drawn_tile)
+                if self.events is not None:
+                    self.events.append((Delta.ROB, p_id, next_player_idx, HASH_TO_CODE[hash(drawn_tile)]))
                 self.perform_win(next_player_idx, meld)
-                print(f"Player {next_player_idx} wins")
+                self.log(f"Player {next_player_idx} wins")
                 state["round_wind"] = self.game_state["round_wind"]
                 state["win_condition"].append("rob_kong")
                 if not self.game_state["wall"]:
@@ -225,7 +362,7 @@ class MahjongGame:
         self.game_state["current_player"] = p_id
         if self.game_state["kong"]:  # already had a kong this turn
             self.game_state["double_kong"] = True
-        print(f"Drawing replacement tile for player {p_id}")
+        self.log(f"Drawing replacement tile for player {p_id}")
         self.game_state["discard"] = False
         self.game_state["kong"] = True
 
@@ -234,75 +371,82 @@ class MahjongGame:
         player_state = self.game_state["players"][p_id]
         self.game_state["phase"] = "discard"
 
-        self.print_player_info(p_id)
+        if self.verbose:
+            self.print_player_info(p_id)
         discard_idx = player.query_discard(self.game_state, False)  # decision point: what to discard?
         discarded_tile = player_state["hand"].pop(discard_idx)
         player_state["discards"].append(discarded_tile)
-        print(f"Player {p_id} discarded {discarded_tile}")
+        self.game_state["visible"][TILE_TO_ID[discarded_tile]] += 1
+        if self.risk is not None:
+            self.risk.discard(p_id, TILE_TO_ID[discarded_tile])
+        self.zobrist.move(HAND, p_id, DISCARD, p_id, discarded_tile)
+        if self.events is not None:
+            self.events.append((Delta.DISCARD, p_id, discard_idx, HASH_TO_CODE[hash(discarded_tile)]))
+        self.log(f"Player {p_id} discarded {discarded_tile}")
         self.game_state["discard"] = False
         self.game_state["phase"] = "meld"
         return discarded_tile
 
     def resolve_other_actions(self, discarded_tile: Tile, p_id: int) -> bool:
-        player_state = self.game_state["players"][p_id]
-        # Get potential actions for other players
+        # Claims are resolved tier by tier in priority order, and by seat order within a tier. A seat's rule checks
+        # are only run once a claim of that tier could still be chosen, and a seat is queried once, with all of its
+        # options, when it first has one in the current tier, so it answers as if every seat had been asked up front
+        # and the claim chosen is the same. Only the next seat may chow.
+        seats = [(p_id + i) % NUM_PLAYERS for i in range(1, NUM_PLAYERS)]
+        players = self.game_state["players"]
+        options: dict[int, dict[str, list[list[Tile]]]] = {seat: {} for seat in seats}
         player_actions: dict[int, PlayerActionDict] = {}
-        for i in range(1, NUM_PLAYERS):
-            next_player_idx = (p_id + i) % NUM_PLAYERS
-            next_player = self.players[next_player_idx]
-            next_player_state = self.game_state["players"][next_player_idx]
-
-            win_melds, state = check_win(next_player_state, discarded_tile, False)
-            kong_meld = check_kong(next_player_state, discarded_tile, False)
-            pung_meld = check_pung(next_player_state, discarded_tile, False)
-            chow_meld = check_chow(next_player_state, discarded_tile, False) if i == 1 else []
-
-            options = {
-                "win": win_melds,
-                "kong": kong_meld,
-                "pung": pung_meld,
-                "chow": chow_meld
-            }
-            if any(options.values()):
-                meld_type, meld = next_player.query_meld(self.game_state, options)
-            else:
-                meld_type, meld = "", []
-
-            player_actions[next_player_idx] = {
-                "meld_type": meld_type,
-                "meld": meld,
-                "state": None
-            }
-            if meld_type == "win":
-                player_actions[next_player_idx]["state"] = state
-        if not player_actions:
-            return False  # everyone skips
-
-        # Choose action to resolve based on priority and seat position
         player_to_act = -1
-        for meld_type in ["win", "kong", "pung", "chow"]:
-            for i in range(1, NUM_PLAYERS):
-                next_player_idx = (p_id + i) % NUM_PLAYERS
-                if player_actions[next_player_idx]["meld_type"] == meld_type:
-                    player_to_act = next_player_idx
+        for meld_type in CLAIM_TYPES:
+            for seat in seats if meld_type != "chow" else seats[:1]:
+                action = player_actions.get(seat)
+                if action is None:
+                    state: HandStateDict | None = None
+                    if meld_type == "win":
+                        melds, state = check_win(players[seat], discarded_tile, False)
+                    else:
+                        melds = CLAIM_CHECKS[meld_type](players[seat], discarded_tile, False)
+                    seat_options = options[seat]
+                    seat_options[meld_type] = melds
+                    if not melds:
+                        continue
+                    # the rest of the seat's options, for its one query
+                    for other_type in CLAIM_TYPES[1:] if seat == seats[0] else CLAIM_TYPES[1:-1]:
+                        if other_type not in seat_options:
+                            seat_options[other_type] = CLAIM_CHECKS[other_type](players[seat], discarded_tile, False)
+                    meld_type_taken, meld = self.players[seat].query_meld(
+                        self.game_state, {claim: seat_options.get(claim, []) for claim in CLAIM_TYPES}
+                    )
+                    action = player_actions[seat] = {"meld_type": meld_type_taken, "meld": meld, "state": state}
+                if action["meld_type"] == meld_type:
+                    player_to_act = seat
                     break
             if player_to_act != -1:
                 break
+        if player_to_act != -1:
+            skipped = self.claim_checks_skipped
+            for seat in seats:
+                checked = options[seat]
+                for meld_type in CLAIM_TYPES if seat == seats[0] else CLAIM_TYPES[:-1]:
+                    if meld_type not in checked:
+                        skipped[meld_type] += 1
         else:
-            return False  # everyone skips
+            return False  # everyone skips, after every check was run
 
         # Resolve chosen action
         meld_type = player_actions[player_to_act]["meld_type"]
+        self.claims[meld_type] += 1
         meld = player_actions[player_to_act]["meld"]
+        state = player_actions[player_to_act]["state"]
 
         next_player_state = self.game_state["players"][player_to_act]
         if meld_type == "kong":
             self.resolve_kong(p_id, player_to_act, meld)
             return True
-        next_player_state["hand"].append(player_state["discards"].pop())
+        self.take_discard(p_id, player_to_act)
         if meld_type == "win":
             self.perform_win(player_to_act, meld)
-            print(f"Player {player_to_act} wins")
+            self.log(f"Player {player_to_act} wins")
             state["round_wind"] = self.game_state["round_wind"]
             if not self.game_state["wall"]:
                 state["win_condition"].append("last_draw")
@@ -310,15 +454,15 @@ class MahjongGame:
                 state["win_condition"].append("earthly_hand")
             self.game_state["done"] = True
             self.game_state["winning_hand_state"] = state
-            print("Winning hand: ", next_player_state["melds"])
-            print("Winning hand state: ", state)
-            print("Winning hand score: ", score_hand(next_player_state["melds"], state))
+            self.log("Winning hand: ", next_player_state["melds"])
+            self.log("Winning hand state: ", state)
+            self.log("Winning hand score: ", score_hand(next_player_state["melds"], state))
             return True
 
         self.perform_single_meld(player_to_act, meld[0])
 
         if meld_type in ["pung", "chow"]:
-            print(f"Player {player_to_act} has performed a {meld_type}")
+            self.log(f"Player {player_to_act} has performed a {meld_type}")
             self.game_state["discard"] = True
             self.game_state["current_player"] = player_to_act
             self.game_state["kong"] = False
@@ -334,10 +478,22 @@ class MahjongGame:
         if self.game_state["first"]:
             self.game_state["first"] = False
         self.game_state["current_player"] = (p_id + 1) % NUM_PLAYERS
-        print()
+        self.log()
+
+    def take_discard(self, p_id: int, next_p_id: int) -> None:
+        '''Moves the latest discard of player p_id into the hand of player next_p_id'''
+        tile = self.game_state["players"][p_id]["discards"].pop()
+        self.game_state["players"][next_p_id]["hand"].append(tile)
+        self.game_state["visible"][TILE_TO_ID[tile]] -= 1
+        if self.risk is not None:
+            self.risk.claim(p_id, next_p_id, TILE_TO_ID[tile])
+        self.zobrist.move(DISCARD, p_id, HAND, next_p_id, tile)
+        if self.events is not None:
+            self.events.append((Delta.CLAIM, p_id, next_p_id))
 
     def perform_single_meld(self, p_id: int, to_meld: list[Tile]) -> None:
         player_state = self.game_state["players"][p_id]
+        visible = self.game_state["visible"]
         # handle exposed pung --> kong
         if len(to_meld) == 4:
             tile = to_meld[0]
@@ -345,19 +501,67 @@ class MahjongGame:
                 if len(meld) == 3 and meld[0] == tile:
                     player_state["hand"].remove(tile)
                     meld.append(tile)
+                    visible[TILE_TO_ID[tile]] += 1
+                    self.zobrist.move(HAND, p_id, MELD, p_id, tile)
+                    if self.events is not None:
+                        self.events.append((Delta.UPGRADE, p_id, HASH_TO_CODE[hash(tile)]))
+                    if self.risk is not None:
+                        self.risk.meld(p_id, [TILE_TO_ID[tile]], new_set=False)
                     return
         # all other melds
+        zone = meld_zone(to_meld)
         for tile in to_meld:
             player_state["hand"].remove(tile)
+            visible[TILE_TO_ID[tile]] += 1
+            self.zobrist.move(HAND, p_id, zone, p_id, tile)
         player_state["melds"].append(to_meld)
+        if self.events is not None:
+            self.events.append((Delta.MELD, p_id, len(to_meld), *(HASH_TO_CODE[hash(tile)] for tile in to_meld)))
+        if self.risk is not None:
+            self.risk.meld(p_id, [TILE_TO_ID[tile] for tile in to_meld])
 
     def perform_win(self, p_id: int, to_meld: list[list[Tile]]) -> None:
         player_state = self.game_state["players"][p_id]
         # handle win -- multiple melds, list of list of tiles
+        visible = self.game_state["visible"]
         for meld in to_meld:
+            zone = meld_zone(meld)
             for tile in meld:
                 player_state["hand"].remove(tile)
+                visible[TILE_TO_ID[tile]] += 1
+                self.zobrist.move(HAND, p_id, zone, p_id, tile)
             player_state["melds"].append(meld)
+            if self.events is not None:
+                self.events.append((Delta.MELD, p_id, len(meld), *(HASH_TO_CODE[hash(tile)] for tile in meld)))
+            if self.risk is not None:
+                self.risk.meld(p_id, [TILE_TO_ID[tile] for tile in meld])
+
+    def get_winner(self) -> int | None:
+        '''Returns the id of the winning player, or None if the game is not won (yet)'''
+        state = self.game_state["winning_hand_state"]
+        if state is None:
+            return None
+        return WINDS.index(state["seat_wind"])
+
+    def get_payoffs(self) -> list[int]:
+        '''
+        Returns the zero-sum faan payoff of every player for a finished game
+        A self-drawn win is paid by all three other players, any other win only by the player who gave up the tile
+        '''
+        payoffs = [0] * NUM_PLAYERS
+        winner = self.get_winner()
+        if winner is None:
+            return payoffs
+        state = self.game_state["winning_hand_state"]
+        faan = score_hand(self.game_state["players"][winner]["melds"], state)
+        if "self_pick" in state["win_condition"]:
+            for i in range(NUM_PLAYERS):
+                payoffs[i] = 3 * faan if i == winner else -faan
+        else:
+            # on a win by discard or robbing a kong, the current player is the one who gave up the tile
+            payoffs[winner] = faan
+            payoffs[self.game_state["current_player"]] = -faan
+        return payoffs
 
     def print_player_info(self, p_id: int, sort_hand: bool = False) -> None:
         p_state = self.game_state["players"][p_id]
@@ -367,3 +571,39 @@ class MahjongGame:
             print(", ".join(str(tile) for tile in p_state["hand"]))
 
         print(f"Melds: {p_state['melds']}")
+
+
+class GamePool:
+    '''
+    Games for runners to check out for a new deal and return once played, so that a loop over many games reuses the
+    same objects through MahjongGame.reset instead of allocating new ones. Checking out and returning are thread-safe.
+    '''
+
+    def __init__(self, size: int = 0) -> None:
+        self._free = [MahjongGame(verbose=False) for _ in range(size)]
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def acquire(self, seed: int | None, players: list[Player]) -> MahjongGame:
+        '''A game dealt from seed with players, a returned one if there is any'''
+        try:
+            game = self._free.pop()
+        except IndexError:
+            game = MahjongGame(verbose=False)
+        game.reset(seed, players)
+        return game
+
+    def release(self, game: MahjongGame) -> None:
+        '''Returns a game to the pool, it must not be used any more'''
+        game.players = []  # the players are not kept alive until the game is dealt again
+        self._free.append(game)
+
+    @contextmanager
+    def game(self, seed: int | None, players: list[Player]) -> Iterator[MahjongGame]:
+        '''A game from acquire() that goes back to the pool when the block ends'''
+        game = self.acquire(seed, players)
+        try:
+            yield game
+        finally:
+            self.release(game)
@@ -2,11 +2,16 @@ from __future__ import annotations
 import typing
 from abc import ABC, abstractmethod
 import random
+import time
 from typing import Optional
-from game.utils import GameStateDict
+from game.constants import TILE_TO_ID, ID_TO_TILE, NUM_TILES
+from game.tile import Suit
+from game.utils import GameStateDict, HandStateDict, PlayerStateDict
+from game.utils import tiles_to_counts, keep_value, calc_shanten, calc_discard_shanten, calc_ukeire, score_hand
 
 
 if typing.TYPE_CHECKING:
+    from game.risk import RiskTable
     from game.tile import Tile
 
 
@@ -71,6 +76,10 @@ class HumanPlayer(Player):
 
 
 class RandomAIPlayer(Player):
+    '''
+    Picks uniformly among the legal actions. Not thread-safe: each thread needs its own player, as the agent
+    factories of game.evaluate give it
+    '''
 
     def __init__(self, id: int, seed: int | None = None) -> None:
         super().__init__(id)
@@ -106,3 +115,192 @@ class RandomAIPlayer(Player):
         if sorted_hand:
             idx = curr_hand.index(sorted(curr_hand)[idx])
         return idx
+
+
+# factor applied to a stage's cost estimate every time the stage is skipped
+SKIP_DECAY = 0.98
+# with a risk table, fold (discard the safest tile) when this far from ready and another seat is this threatening
+FOLD_SHANTEN = 2
+FOLD_THREAT = 0.5
+
+
+class HeuristicAIPlayer(Player):
+    '''
+    Discards by tile efficiency -- lowest shanten first, then the most live tiles that lower it -- and claims melds
+    with a few faan-aware rules. Each decision is refined in stages, and a stage is only started if its expected
+    cost still fits in the per-decision time budget (in seconds), so the cheapest stage is the fallback. Given the
+    RiskTable of its game, it folds against threatening seats when its own hand is far from ready.
+    '''
+
+    def __init__(self, id: int, budget: float = 50e-6, min_faan: int = 0, risk: RiskTable | None = None) -> None:
+        super().__init__(id)
+        self.budget = budget
+        self.min_faan = min_faan  # smallest win worth declaring
+        # must be attached to the game played, see game.risk; a copy of the game has none, so players of a copy
+        # need their own table attached to it
+        self.risk = risk
+        # running estimates of the cost of each refinement stage
+        self.shanten_cost = 0.0
+        self.ukeire_cost = 0.0
+        self.claim_cost = 0.0
+        # latency stats
+        self.num_decisions = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        start = time.perf_counter()
+        choice = self._choose_meld(state, options, start + self.budget)
+        self._record(start)
+        return choice
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        # the returned index refers to the unsorted hand, so sorted_hand does not apply
+        start = time.perf_counter()
+        player_state = state["players"][self.id]
+        counts = tiles_to_counts(player_state["hand"])
+        tile_id = self._choose_discard(state, counts, _num_melds(player_state), start + self.budget)
+        self._record(start)
+        return player_state["hand"].index(ID_TO_TILE[tile_id])
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.num_decisions if self.num_decisions else 0.0
+
+    def _record(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        self.num_decisions += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def _choose_discard(self, state: GameStateDict, counts: list[int], num_melds: int, deadline: float) -> int:
+        # Stage 0 -- the least connected tile
+        in_hand = [i for i in range(NUM_TILES) if counts[i]]
+        choice = min(in_hand, key=lambda i: keep_value(counts, i))
+        if time.perf_counter() + self.shanten_cost > deadline:
+            # decay the estimate so that a few slow (e.g. cold cache) runs do not disable the stage for good
+            self.shanten_cost *= SKIP_DECAY
+            return choice
+
+        # Stage 1 -- discards that leave the lowest shanten
+        stage_start = time.perf_counter()
+        shantens = calc_discard_shanten(counts, num_melds)
+        self.shanten_cost = _update_cost(self.shanten_cost, time.perf_counter() - stage_start)
+        best_shanten = min(shantens.values())
+        if self.risk is not None and best_shanten >= FOLD_SHANTEN:
+            if not (self.risk.visible == state["visible"]).all():
+                raise RuntimeError(f"The risk table of player {self.id} does not follow the game it plays")
+            threat = self.risk.threat
+            if max(threat[seat] for seat in range(len(threat)) if seat != self.id) >= FOLD_THREAT:
+                return self.risk.safest(self.id, in_hand)
+        candidates = sorted((i for i in in_hand if shantens[i] == best_shanten), key=lambda i: keep_value(counts, i))
+        if len(candidates) == 1 or best_shanten < 0:
+            return candidates[0]
+
+        # Stage 2 -- the most live tiles that lower the shanten, if time allows
+        if time.perf_counter() + self.ukeire_cost > deadline:
+            self.ukeire_cost *= SKIP_DECAY
+            return candidates[0]
+        stage_start = time.perf_counter()
+        ukeire = calc_ukeire(counts, state["visible"], num_melds)
+        self.ukeire_cost = _update_cost(self.ukeire_cost, time.perf_counter() - stage_start)
+        return max(candidates, key=lambda i: ukeire[i]["live"])
+
+    def _choose_meld(
+        self,
+        state: GameStateDict,
+        options: dict[str, list[list[Tile]]],
+        deadline: float
+    ) -> tuple[str, list[list[Tile]]]:
+        player_state = state["players"][self.id]
+        if options.get("win"):
+            if self.min_faan <= 0 or self._score_win(state, options["win"]) >= self.min_faan:
+                return "win", options["win"]
+        # Kongs never cost tile efficiency and give an extra draw
+        if options.get("kong"):
+            return "kong", [options["kong"][0]]
+        if not options.get("pung") and not options.get("chow"):
+            return "", []
+        if time.perf_counter() + 2 * self.claim_cost > deadline:
+            self.claim_cost *= SKIP_DECAY
+            return "", []
+
+        discards = state["players"][state["current_player"]]["discards"]
+        if not discards:
+            return "", []
+        tile = discards[-1]
+        counts = tiles_to_counts(player_state["hand"])
+        num_melds = _num_melds(player_state)
+        stage_start = time.perf_counter()
+        shanten = calc_shanten(counts, num_melds)
+        self.claim_cost = _update_cost(self.claim_cost, time.perf_counter() - stage_start)
+        flush_suit = _flush_suit(player_state)
+
+        best: tuple[str, list[list[Tile]]] = ("", [])
+        best_shanten = shanten
+        for meld_type in ("pung", "chow"):
+            for meld in options.get(meld_type, []):
+                if flush_suit is not None and tile.suit not in (flush_suit, Suit.DRAGON, Suit.WIND):
+                    continue
+                # a chow gives up the concealed hand, so only take it when already open or close to ready
+                if meld_type == "chow" and num_melds == 0 and shanten > 2:
+                    continue
+                if time.perf_counter() + self.claim_cost > deadline:
+                    self.claim_cost *= SKIP_DECAY
+                    return best
+                claimed = meld.copy()
+                claimed.remove(tile)
+                for t in claimed:
+                    counts[TILE_TO_ID[t]] -= 1
+                # the hand is left with a tile too many, so this is the shanten after the best discard
+                stage_start = time.perf_counter()
+                after = max(calc_shanten(counts, num_melds + 1), 0)
+                self.claim_cost = _update_cost(self.claim_cost, time.perf_counter() - stage_start)
+                for t in claimed:
+                    counts[TILE_TO_ID[t]] += 1
+                # scoring honor pungs are worth a faan even if they do not speed up the hand
+                if after < best_shanten or (meld_type == "pung" and after <= shanten and
+                                            _is_scoring_honor(tile, state, player_state)):
+                    best, best_shanten = (meld_type, [meld]), after
+        return best
+
+    def _score_win(self, state: GameStateDict, win_melds: list[list[Tile]]) -> int:
+        player_state = state["players"][self.id]
+        hand_state: HandStateDict = {
+            "win_condition": [],
+            "thirteen_orphans": False,
+            "nine_gates": False,
+            "seat_wind": player_state["seat_wind"],
+            "round_wind": state["round_wind"]
+        }
+        return score_hand(player_state["melds"] + win_melds, hand_state)
+
+
+def _update_cost(estimate: float, sample: float) -> float:
+    '''Exponential moving average of a stage's cost'''
+    return sample if estimate == 0.0 else 0.9 * estimate + 0.1 * sample
+
+
+def _num_melds(player_state: PlayerStateDict) -> int:
+    return sum(1 for meld in player_state["melds"] if meld[0].suit != Suit.FLOWER)
+
+
+def _flush_suit(player_state: PlayerStateDict) -> Suit | None:
+    '''Returns the number suit of the hand if it is going for a flush (at most 3 tiles from other number suits)'''
+    suits: dict[Suit, int] = {Suit.DOT: 0, Suit.BAMBOO: 0, Suit.CHARACTER: 0}
+    for tile in player_state["hand"]:
+        if tile.suit in suits:
+            suits[tile.suit] += 1
+    for meld in player_state["melds"]:
+        if meld[0].suit in suits:
+            suits[meld[0].suit] += len(meld)
+    suit = max(suits, key=lambda s: suits[s])
+    if sum(suits.values()) - suits[suit] <= 3 and suits[suit] >= 8:
+        return suit
+    return None
+
+
+def _is_scoring_honor(tile: Tile, state: GameStateDict, player_state: PlayerStateDict) -> bool:
+    if tile.suit == Suit.DRAGON:
+        return True
+    return tile.suit == Suit.WIND and tile.value in (state["round_wind"], player_state["seat_wind"])
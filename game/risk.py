@@ -0,0 +1,131 @@
+'''
+Deal-in risk of every tile against every seat, kept up to date by the game
+
+A RiskTable attached to a game is told of every draw, discard, claim and meld as it happens, so reading it never
+scans the discards or melds of the seats. It keeps, per seat, the tiles it discarded this game, the tiles others
+discarded that it let go since its last draw (it did not win on them), its exposed sets and its number of discards,
+and the visible copies of each tile. danger[seat] is a 34-vector estimate of how likely each tile is to deal into
+that seat, derived from those:
+
+    danger = threat(seat) * shape(tile) * live(tile) * (0.25 if discarded by seat) * (0.1 if let go by seat)
+
+threat grows with the exposed sets and discards of the seat, shape favours middle number tiles over terminals and
+honors, and live falls with the visible copies of the tile. The numbers rank tiles, they are not probabilities.
+'''
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+from game.constants import NUM_PLAYERS, NUM_TILES, TILE_TO_ID
+from game.tile import Suit
+from game.utils import GameStateDict
+
+if TYPE_CHECKING:
+    from game.mahjong import MahjongGame
+
+NUM_HONORS = 7
+DISCARDED_FACTOR = 0.25
+PASSED_FACTOR = 0.1
+
+# danger of each tile's shape: terminals 0.6, 2s and 8s 0.8, other numbers 1, honors 0.5
+_SHAPE = np.array([0.6, 0.8, 1.0, 1.0, 1.0, 1.0, 1.0, 0.8, 0.6] * 3 + [0.5] * NUM_HONORS)
+_HONORS = np.arange(NUM_TILES) >= NUM_TILES - NUM_HONORS
+
+
+class RiskTable:
+    '''Deal-in risk of every tile against every seat, see the module docstring'''
+
+    def __init__(self, game: MahjongGame | None = None) -> None:
+        self.discarded = np.zeros((NUM_PLAYERS, NUM_TILES), dtype=bool)  # tiles each seat discarded this game
+        self.passed = np.zeros((NUM_PLAYERS, NUM_TILES), dtype=bool)  # tiles each seat let go since its last draw
+        self.visible = np.zeros(NUM_TILES, dtype=np.int8)  # copies in discards and exposed melds
+        self.sets = np.zeros(NUM_PLAYERS, dtype=np.int8)  # exposed sets (not flowers) of each seat
+        self.num_discards = np.zeros(NUM_PLAYERS, dtype=np.int16)
+        self._danger = np.zeros((NUM_PLAYERS, NUM_TILES))
+        self._dirty = True
+        if game is not None:
+            self.attach(game)
+
+    def attach(self, game: MahjongGame) -> None:
+        '''Has the game keep this table up to date, starting from its current state'''
+        game.risk = self
+        self.rebuild(game.game_state)
+
+    def rebuild(self, game_state: GameStateDict) -> None:
+        '''
+        Recomputes the table from a state. Claimed discards are gone from the state, so they do not count as
+        discarded, and what the seats let go is not in the state at all.
+        '''
+        self.reset()
+        self.visible[:] = game_state["visible"]
+        for p_id, player_state in game_state["players"].items():
+            for tile in player_state["discards"]:
+                self.discarded[p_id, TILE_TO_ID[tile]] = True
+            self.num_discards[p_id] = len(player_state["discards"])
+            self.sets[p_id] = sum(1 for meld in player_state["melds"] if meld[0].suit != Suit.FLOWER)
+
+    def reset(self) -> None:
+        self.discarded[:] = False
+        self.passed[:] = False
+        self.visible[:] = 0
+        self.sets[:] = 0
+        self.num_discards[:] = 0
+        self._dirty = True
+
+    # called by the game
+
+    def draw(self, p_id: int) -> None:
+        self.passed[p_id] = False
+        self._dirty = True
+
+    def discard(self, p_id: int, tile_id: int) -> None:
+        self.discarded[p_id, tile_id] = True
+        self.num_discards[p_id] += 1
+        self.visible[tile_id] += 1
+        # every other seat lets the tile go unless it claims it, see claim()
+        self.passed[:, tile_id] = True
+        self.passed[p_id, tile_id] = False
+        self._dirty = True
+
+    def claim(self, p_id: int, next_p_id: int, tile_id: int) -> None:
+        '''The latest discard of p_id, tile_id, went to the hand of next_p_id'''
+        self.visible[tile_id] -= 1
+        self.passed[next_p_id] = False
+        self._dirty = True
+
+    def meld(self, p_id: int, tile_ids: list[int], new_set: bool = True) -> None:
+        '''Tiles from the hand of p_id were exposed, as a new set or added to an exposed pung'''
+        for tile_id in tile_ids:
+            self.visible[tile_id] += 1
+        self.sets[p_id] += new_set
+        self._dirty = True
+
+    # read by players and encoders
+
+    @property
+    def threat(self) -> np.ndarray:
+        '''How close each seat looks to a win, from 0.1 to 1'''
+        return np.minimum(0.1 + 0.2 * self.sets + 0.015 * self.num_discards, 1.0)
+
+    @property
+    def danger(self) -> np.ndarray:
+        '''(NUM_PLAYERS, NUM_TILES) danger of each tile against each seat, recomputed only after a change'''
+        if self._dirty:
+            visible = self.visible.astype(float)
+            live = np.where(_HONORS, np.clip(3 - visible, 0, 3) / 3, 0.5 + 0.5 * np.clip(4 - visible, 0, 4) / 4)
+            danger = self._danger
+            np.multiply(self.threat[:, None], _SHAPE * live, out=danger)
+            danger[self.discarded] *= DISCARDED_FACTOR
+            danger[self.passed] *= PASSED_FACTOR
+            self._dirty = False
+        return self._danger
+
+    def observation(self, p_id: int) -> np.ndarray:
+        '''(NUM_PLAYERS - 1, NUM_TILES) danger against the other seats, in turn order after p_id, as float32'''
+        seats = [(p_id + i) % NUM_PLAYERS for i in range(1, NUM_PLAYERS)]
+        return self.danger[seats].astype(np.float32)
+
+    def safest(self, p_id: int, tile_ids: list[int]) -> int:
+        '''The tile of tile_ids with the least danger summed over the other seats'''
+        danger = self.danger
+        total = danger.sum(axis=0) - danger[p_id]
+        return min(tile_ids, key=lambda tile_id: total[tile_id])
@@ -0,0 +1,222 @@
+'''
+Shared-memory rollout buffers between self-play worker processes and a learner
+
+Every worker owns a ring of fixed-size chunks in one shared memory block and fills it row by row. A chunk is
+published by bumping the worker's write counter and handed back by the learner bumping the read counter, so the
+learner reads finished chunks as zero-copy NumPy views and nothing is pickled. Each ring has exactly one writer
+and one reader, which is all the counters need to coordinate them.
+'''
+from __future__ import annotations
+import time
+from multiprocessing import shared_memory
+from typing import Sequence
+import numpy as np
+from game.constants import NUM_ACTIONS, NUM_OBSERVATIONS
+from game.dataset import SampleBatchDict
+
+# each counter gets a 64 byte line of its own, so workers do not invalidate each other's cache lines
+_COUNTER_STRIDE = 8
+# seconds between checks of the counters while waiting, doubling from the first to the last
+MIN_POLL_INTERVAL = 10e-6
+MAX_POLL_INTERVAL = 1e-3
+
+
+_Layout = dict[str, tuple[int, tuple[int, ...], np.dtype]]
+
+
+def _layout(num_workers: int, num_chunks: int, chunk_size: int) -> tuple[_Layout, int]:
+    '''Offset, shape and dtype of every array in the shared block, and the size of the block'''
+    rows = (num_workers, num_chunks, chunk_size)
+    arrays = [
+        ("written", (num_workers, _COUNTER_STRIDE), np.dtype(np.int64)),
+        ("read", (num_workers, _COUNTER_STRIDE), np.dtype(np.int64)),
+        ("size", (num_workers, num_chunks), np.dtype(np.int64)),  # rows in each published chunk
+        ("obs", rows + (NUM_OBSERVATIONS,), np.dtype(np.int16)),
+        ("mask", rows + (NUM_ACTIONS,), np.dtype(np.bool_)),
+        ("action", rows, np.dtype(np.int16)),
+        ("seat", rows, np.dtype(np.int8)),
+        ("reward", rows, np.dtype(np.int16))
+    ]
+    layout = {}
+    offset = 0
+    for key, shape, dtype in arrays:
+        layout[key] = (offset, shape, dtype)
+        offset += -(-int(np.prod(shape)) * dtype.itemsize // 64) * 64
+    return layout, offset
+
+
+class _SharedArrays:
+    '''NumPy views of the arrays in a shared block, created or attached by name'''
+
+    def __init__(self, num_workers: int, num_chunks: int, chunk_size: int, name: str | None = None) -> None:
+        self.num_workers = num_workers
+        self.num_chunks = num_chunks
+        self.chunk_size = chunk_size
+        layout, size = _layout(num_workers, num_chunks, chunk_size)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.arrays = {
+            key: np.ndarray(shape, dtype, self.shm.buf, offset) for key, (offset, shape, dtype) in layout.items()
+        }
+        if name is None:
+            self.arrays["written"][:] = 0
+            self.arrays["read"][:] = 0
+
+    def close(self) -> None:
+        # the views have to go before the mapping can be closed
+        self.arrays = {}
+        self.shm.close()
+
+
+class RolloutWriter:
+    '''
+    Picklable handle used by one worker process to write into its ring of a SharedRolloutBuffer
+    add() only blocks when every chunk of the ring is still waiting for the learner, flush() and close() never do
+    '''
+
+    def __init__(self, name: str, worker_id: int, num_workers: int, num_chunks: int, chunk_size: int) -> None:
+        self.name = name
+        self.worker_id = worker_id
+        self.num_workers = num_workers
+        self.num_chunks = num_chunks
+        self.chunk_size = chunk_size
+        self._shared: _SharedArrays | None = None
+        self._arrays: dict[str, np.ndarray] = {}
+        self._rows: dict[str, np.ndarray] = {}  # this worker's ring of every per-row array
+        self._chunk = 0
+        self._size = 0
+
+    def __reduce__(self) -> tuple[type, tuple[str, int, int, int, int]]:
+        # only the name travels, the worker attaches on its first add()
+        return RolloutWriter, (self.name, self.worker_id, self.num_workers, self.num_chunks, self.chunk_size)
+
+    def add(self, obs: Sequence[int], mask: Sequence[int], action: int, seat: int, reward: int) -> None:
+        if self._shared is None:
+            self._attach()
+        if self._size == 0:
+            # the first row of a chunk, only now does it need a slot the learner is done with
+            self._wait_for_chunk()
+        rows = self._rows
+        chunk, row = self._chunk, self._size
+        rows["obs"][chunk, row] = obs
+        rows["mask"][chunk, row] = mask
+        rows["action"][chunk, row] = action
+        rows["seat"][chunk, row] = seat
+        rows["reward"][chunk, row] = reward
+        self._size += 1
+        if self._size == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        '''Publishes the current chunk to the learner, even if it is not full'''
+        if self._shared is None or self._size == 0:
+            return
+        w = self.worker_id
+        self._arrays["size"][w, self._chunk] = self._size
+        # the rows are in place before the counter moves, readers never look past the counter
+        self._arrays["written"][w, 0] += 1
+        self._size = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._shared is not None:
+            self._arrays = {}
+            self._rows = {}
+            self._shared.close()
+            self._shared = None
+
+    def _attach(self) -> None:
+        self._shared = _SharedArrays(self.num_workers, self.num_chunks, self.chunk_size, self.name)
+        self._arrays = self._shared.arrays
+        self._rows = {key: self._arrays[key][self.worker_id] for key in ("obs", "mask", "action", "seat", "reward")}
+
+    def _wait_for_chunk(self) -> None:
+        w = self.worker_id
+        written = self._arrays["written"][w, 0]
+        interval = MIN_POLL_INTERVAL
+        while written - self._arrays["read"][w, 0] >= self.num_chunks:
+            time.sleep(interval)
+            interval = min(2 * interval, MAX_POLL_INTERVAL)
+        self._chunk = int(written % self.num_chunks)
+
+
+class SharedRolloutBuffer:
+    '''
+    Rollout buffer in shared memory, with one ring of num_chunks chunks of chunk_size rows per worker
+    The learner calls get() for the next published chunk and release() once it is done with it.
+    '''
+
+    def __init__(self, num_workers: int, chunk_size: int = 256, num_chunks: int = 8) -> None:
+        if num_workers < 1 or chunk_size < 1 or num_chunks < 2:
+            raise ValueError("num_workers and chunk_size must be at least 1 and num_chunks at least 2")
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.num_chunks = num_chunks
+        self._shared = _SharedArrays(num_workers, num_chunks, chunk_size)
+        self._next = 0  # worker checked first by the next get(), so no worker is starved
+        self._held: set[int] = set()
+
+    @property
+    def name(self) -> str:
+        return self._shared.shm.name
+
+    def __enter__(self) -> "SharedRolloutBuffer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def make_writer(self, worker_id: int) -> RolloutWriter:
+        if not 0 <= worker_id < self.num_workers:
+            raise ValueError(f"worker_id must be in [0, {self.num_workers})")
+        return RolloutWriter(self.name, worker_id, self.num_workers, self.num_chunks, self.chunk_size)
+
+    def get(self, timeout: float | None = None) -> tuple[int, SampleBatchDict] | None:
+        '''
+        Returns (worker_id, chunk) for the next published chunk, or None if there was none within timeout seconds
+        The chunk is a set of views into shared memory, only valid until release(worker_id)
+        A worker's next chunk is only returned once its previous one has been released
+        '''
+        arrays = self._shared.arrays
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        interval = MIN_POLL_INTERVAL
+        while True:
+            for i in range(self.num_workers):
+                w = (self._next + i) % self.num_workers
+                if w in self._held:
+                    continue
+                read = arrays["read"][w, 0]
+                if read < arrays["written"][w, 0]:
+                    self._next = (w + 1) % self.num_workers
+                    self._held.add(w)
+                    chunk = int(read % self.num_chunks)
+                    size = int(arrays["size"][w, chunk])
+                    return w, {
+                        "obs": arrays["obs"][w, chunk, :size],
+                        "mask": arrays["mask"][w, chunk, :size],
+                        "action": arrays["action"][w, chunk, :size],
+                        "seat": arrays["seat"][w, chunk, :size],
+                        "reward": arrays["reward"][w, chunk, :size]
+                    }
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(interval)
+            interval = min(2 * interval, MAX_POLL_INTERVAL)
+
+    def release(self, worker_id: int) -> None:
+        '''Hands the chunk last returned for worker_id back to its writer'''
+        self._held.remove(worker_id)
+        self._shared.arrays["read"][worker_id, 0] += 1
+
+    def pending(self) -> int:
+        '''Number of published chunks not yet released'''
+        counters = self._shared.arrays
+        return int((counters["written"][:, 0] - counters["read"][:, 0]).sum())
+
+    def close(self) -> None:
+        '''Frees the shared memory, any views returned by get() must be gone by now'''
+        if self._shared.arrays:
+            self._shared.close()
+            self._shared.shm.unlink()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import numpy as np
+from game.constants import TILE_TO_ID, NUM_TILES, FLOWER_TILES, CODE_TO_TILE, TILE_TO_CODE, NUM_CODES
+from game.mahjong import MahjongGame, NUM_PLAYERS
+from game.player import Player
+from game.utils import GameStateDict, copy_game_state
+
+
+def get_unseen_counts(game_state: GameStateDict, seat: int) -> list[int]:
+    '''
+    Returns how many copies of each tile code seat cannot see
+    Everything except seat's hand, the exposed melds (incl. flowers) and the discards is unseen
+    '''
+    unseen = [4] * NUM_TILES + [1] * len(FLOWER_TILES)
+    for p_id, player_state in game_state["players"].items():
+        for meld in player_state["melds"]:
+            for tile in meld:
+                unseen[TILE_TO_CODE[tile]] -= 1
+        for tile in player_state["discards"]:
+            unseen[TILE_TO_ID[tile]] -= 1
+        if p_id == seat:
+            for tile in player_state["hand"]:
+                unseen[TILE_TO_ID[tile]] -= 1
+    return unseen
+
+
+class HiddenStateSampler:
+    '''
+    Deals the tiles one seat cannot see -- the other players' hands and the wall -- at random, consistent with
+    the seat's hand, all exposed melds and flowers, and all discards. Hand sizes and the wall length match the
+    real game, and flowers only ever end up in the wall. Samples are reproducible from the seed.
+    '''
+
+    def __init__(self, game_state: GameStateDict, seat: int, seed: int | None = None) -> None:
+        self.game_state = game_state
+        self.seat = seat
+        self.rng = np.random.default_rng(seed)
+
+        unseen = get_unseen_counts(game_state, seat)
+        if min(unseen) < 0:
+            raise ValueError("Game state has more copies of a tile than exist")
+        codes = np.repeat(np.arange(NUM_CODES, dtype=np.int16), unseen)
+        self._tiles = codes[codes < NUM_TILES]
+        self._flowers = codes[codes >= NUM_TILES]
+
+        self.others = [p_id for p_id in sorted(game_state["players"]) if p_id != seat]
+        self.hand_sizes = [len(game_state["players"][p_id]["hand"]) for p_id in self.others]
+        self.wall_size = len(game_state["wall"])
+        if sum(self.hand_sizes) + self.wall_size != len(codes):
+            raise ValueError("Hidden hands and wall do not match the number of unseen tiles")
+
+    def sample_codes(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns k samples as (hands, walls) of tile codes
+        hands is (k, hidden hand tiles) with the other players' hands in seat order, walls is (k, wall size)
+        with the next tile to be drawn last, like the game's wall
+        '''
+        num_hidden = sum(self.hand_sizes)
+        tiles = self.rng.permuted(np.broadcast_to(self._tiles, (k, len(self._tiles))), axis=1)
+        hands = tiles[:, :num_hidden]
+        walls = np.concatenate([tiles[:, num_hidden:], np.broadcast_to(self._flowers, (k, len(self._flowers)))], axis=1)
+        if len(self._flowers):
+            walls = self.rng.permuted(walls, axis=1)
+        return hands, walls
+
+    def sample_arrays(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns k samples as (hand_counts, walls)
+        hand_counts is (k, NUM_PLAYERS, NUM_TILES) with every player's concealed tile counts (seat's own hand is
+        the same in every sample), walls is (k, wall size) of tile codes with the next tile to be drawn last
+        '''
+        hands, walls = self.sample_codes(k)
+        counts = np.zeros((k, NUM_PLAYERS, NUM_TILES), dtype=np.int8)
+        for tile in self.game_state["players"][self.seat]["hand"]:
+            counts[:, self.seat, TILE_TO_ID[tile]] += 1
+        rows = np.arange(k)[:, None]
+        start = 0
+        for p_id, size in zip(self.others, self.hand_sizes):
+            # bincount over (sample, tile id) pairs
+            flat = (rows * NUM_TILES + hands[:, start:start + size]).ravel()
+            counts[:, p_id] = np.bincount(flat, minlength=k * NUM_TILES).reshape(k, NUM_TILES)
+            start += size
+        return counts, walls
+
+    def sample_states(self, k: int) -> list[GameStateDict]:
+        '''Returns k full game states, each an independent copy of the real one with the hidden tiles re-dealt'''
+        hands, walls = self.sample_codes(k)
+        states = []
+        for hand_codes, wall_codes in zip(hands.tolist(), walls.tolist()):
+            state = copy_game_state(self.game_state)
+            start = 0
+            for p_id, size in zip(self.others, self.hand_sizes):
+                state["players"][p_id]["hand"] = [CODE_TO_TILE[code] for code in hand_codes[start:start + size]]
+                start += size
+            state["wall"] = [CODE_TO_TILE[code] for code in wall_codes]
+            states.append(state)
+        return states
+
+    def sample_games(self, k: int, players: list[Player] | None = None, verbose: bool = False) -> list[MahjongGame]:
+        '''Returns k games continuing from sampled states'''
+        return [MahjongGame.from_state(state, players, verbose) for state in self.sample_states(k)]
@@ -0,0 +1,331 @@
+'''
+Scenarios: games that start from a given mid-game state instead of a fresh deal
+
+A scenario is a compact spec of the parts of a state that matter for a test or a training target. Tiles are
+written in a short notation, numbers followed by their suit (d dots, b bamboo, c characters, f flowers) and honors
+as letters (E S W N winds, R G P red, green and white dragons), e.g. "123b 55d EEE P 2f". Whatever the spec leaves
+out is dealt at random from the remaining tiles, so the built state always holds all 144 tiles.
+
+    spec = {"hands": ["123b 456b 789b RRR EE", None, None, None], "wall": "E", "current_player": 0}
+    game = build_game(spec, players)
+'''
+from __future__ import annotations
+import random
+from collections import Counter
+from typing import Callable, TypedDict
+from game.constants import CODE_TO_TILE, NUM_CODES, NUM_TILES, TILE_TO_CODE
+from game.mahjong import MahjongGame, NUM_PLAYERS, WINDS
+from game.player import Player, RandomAIPlayer
+from game.tile import Suit, Tile, Value
+from game.utils import GameStateDict, PlayerStateDict, HONOR_SUITS, copy_game_state, get_visible_counts
+
+NUMBER_SUITS = {"d": Suit.DOT, "b": Suit.BAMBOO, "c": Suit.CHARACTER, "f": Suit.FLOWER}
+HONORS = {
+    "E": Tile(Suit.WIND, Value.EAST),
+    "S": Tile(Suit.WIND, Value.SOUTH),
+    "W": Tile(Suit.WIND, Value.WEST),
+    "N": Tile(Suit.WIND, Value.NORTH),
+    "R": Tile(Suit.DRAGON, Value.RED),
+    "G": Tile(Suit.DRAGON, Value.GREEN),
+    "P": Tile(Suit.DRAGON, Value.WHITE)
+}
+_SUIT_LETTERS = {suit: letter for letter, suit in NUMBER_SUITS.items()}
+_HONOR_LETTERS = {tile: letter for letter, tile in HONORS.items()}
+_COPIES = [4] * NUM_TILES + [1] * (NUM_CODES - NUM_TILES)  # copies of each tile code in a full set
+
+StatePredicate = Callable[[GameStateDict], bool]
+
+
+class ScenarioDict(TypedDict, total=False):
+    hands: list[str | None]  # concealed tiles of each seat, None to deal them at random
+    melds: list[list[str]]  # exposed melds of each seat, flowers as melds of one tile
+    discards: list[str]  # discards of each seat, oldest first
+    wall: str  # the next tiles to be drawn, in draw order
+    wall_size: int  # tiles left in the wall, every tile not placed elsewhere if not given
+    current_player: int
+    round_wind: str
+    first: bool
+    discard: bool
+    kong: bool
+    double_kong: bool
+
+
+def parse_tiles(text: str) -> list[Tile]:
+    '''Tiles written in scenario notation, in order'''
+    tiles = []
+    digits = ""
+    for char in text:
+        if char.isdigit():
+            digits += char
+        elif char in NUMBER_SUITS:
+            if not digits:
+                raise ValueError(f"Suit {char!r} without numbers in {text!r}")
+            suit = NUMBER_SUITS[char]
+            for digit in digits:
+                if not ("1" <= digit <= ("8" if suit == Suit.FLOWER else "9")):
+                    raise ValueError(f"No tile {digit}{char} in {text!r}")
+                tiles.append(Tile(suit, Value(digit)))
+            digits = ""
+        elif digits:
+            raise ValueError(f"Numbers without a suit in {text!r}")
+        elif char in HONORS:
+            tiles.append(HONORS[char])
+        elif not char.isspace():
+            raise ValueError(f"Unknown tile {char!r} in {text!r}")
+    if digits:
+        raise ValueError(f"Numbers without a suit in {text!r}")
+    return tiles
+
+
+def format_tiles(tiles: list[Tile]) -> str:
+    '''Inverse of parse_tiles, runs of number tiles of one suit share the suit letter'''
+    groups: list[str] = []
+    last = None
+    for tile in tiles:
+        if tile.suit in _SUIT_LETTERS:
+            if last == tile.suit:
+                groups[-1] = groups[-1][:-1] + tile.value.value + groups[-1][-1]
+            else:
+                groups.append(tile.value.value + _SUIT_LETTERS[tile.suit])
+        elif last in HONOR_SUITS:
+            groups[-1] += _HONOR_LETTERS[tile]
+        else:
+            groups.append(_HONOR_LETTERS[tile])
+        last = tile.suit
+    return " ".join(groups)
+
+
+def hand_size(player_state: PlayerStateDict) -> int:
+    '''Concealed tiles plus three for every exposed set, 13 between turns and 14 when the player has to discard'''
+    return len(player_state["hand"]) + 3 * sum(meld[0].suit != Suit.FLOWER for meld in player_state["melds"])
+
+
+def _check_meld(meld: list[Tile]) -> bool:
+    if len(meld) == 1:
+        return meld[0].suit == Suit.FLOWER
+    if any(tile.suit == Suit.FLOWER for tile in meld) or len(meld) not in (3, 4):
+        return False
+    if all(tile == meld[0] for tile in meld):
+        return True
+    ids = sorted(TILE_TO_CODE[tile] for tile in meld)
+    return (
+        len(meld) == 3 and meld[0].suit not in HONOR_SUITS and all(tile.suit == meld[0].suit for tile in meld)
+        and ids[1] == ids[0] + 1 and ids[2] == ids[0] + 2
+    )
+
+
+def validate_tiles(game_state: GameStateDict) -> None:
+    '''
+    Checks that all 144 tiles are there exactly once, flowers only in the melds, and that the melds (but for a
+    winner's) are chows, pungs, kongs or flowers, which holds at any point of a game. Raises ValueError naming the
+    first problem found
+    '''
+    # a winning hand is laid out in the melds of the winner, pair and all
+    winning_hand_state = game_state["winning_hand_state"]
+    winner = WINDS.index(winning_hand_state["seat_wind"]) if winning_hand_state is not None else -1
+    counts = Counter(TILE_TO_CODE[tile] for tile in game_state["wall"])
+    for p_id in range(NUM_PLAYERS):
+        player_state = game_state["players"][p_id]
+        counts.update(TILE_TO_CODE[tile] for tile in player_state["hand"])
+        counts.update(TILE_TO_CODE[tile] for tile in player_state["discards"])
+        for meld in player_state["melds"]:
+            if p_id != winner and not _check_meld(meld):
+                raise ValueError(f"Player {p_id} has an invalid meld {meld}")
+            counts.update(TILE_TO_CODE[tile] for tile in meld)
+        if any(tile.suit == Suit.FLOWER for tile in player_state["hand"] + player_state["discards"]):
+            raise ValueError(f"Player {p_id} has a flower outside the melds")
+    for code, copies in enumerate(_COPIES):
+        if counts[code] != copies:
+            raise ValueError(f"{counts[code]} copies of {CODE_TO_TILE[code]} instead of {copies}")
+
+
+def validate_state(game_state: GameStateDict) -> None:
+    '''
+    Checks that a state between two steps could occur in a game: validate_tiles, hands have the right size for the
+    turn and the flags agree with each other. Raises ValueError naming the first problem found
+    '''
+    validate_tiles(game_state)
+    current = game_state["current_player"]
+    if not 0 <= current < NUM_PLAYERS:
+        raise ValueError(f"Current player {current} is not a seat")
+    for p_id in range(NUM_PLAYERS):
+        expected = 14 if p_id == current and (game_state["first"] or game_state["discard"]) else 13
+        size = hand_size(game_state["players"][p_id])
+        # a player whose draw ran into the end of the wall (through flowers) still discards, the game is drawn next
+        short = not game_state["wall"] and p_id == (current - 1) % NUM_PLAYERS and size == expected - 1
+        if size != expected and not short:
+            raise ValueError(f"Player {p_id} holds {size} tiles, not {expected}")
+    if game_state["double_kong"] and not game_state["kong"]:
+        raise ValueError("double_kong is set without kong")
+    if game_state["first"]:
+        if current != 0:
+            raise ValueError("Only the dealer can be the current player on the first turn")
+        if any(state["discards"] or hand_size(state) != len(state["hand"]) for state in game_state["players"].values()):
+            raise ValueError("There are no discards or exposed sets on the first turn")
+
+
+def build_state(spec: ScenarioDict, seed: int | None = None) -> GameStateDict:
+    '''
+    Builds and validates the game state described by spec, dealing everything it leaves out at random
+    Tiles left over once the wall has wall_size tiles become discards, or flowers of the players, oldest first
+    '''
+    current = spec.get("current_player", 0)
+    first = spec.get("first", False)
+    discard = spec.get("discard", False)
+    hands = spec.get("hands", [None] * NUM_PLAYERS)
+    melds = [[parse_tiles(meld) for meld in seat] for seat in spec.get("melds", [[]] * NUM_PLAYERS)]
+    discards = [parse_tiles(seat) for seat in spec.get("discards", [""] * NUM_PLAYERS)]
+    wall = parse_tiles(spec.get("wall", ""))
+    if not len(hands) == len(melds) == len(discards) == NUM_PLAYERS:
+        raise ValueError(f"Hands, melds and discards are given for {NUM_PLAYERS} seats")
+
+    players: dict[int, PlayerStateDict] = {
+        p_id: {
+            "id": p_id,
+            "seat_wind": WINDS[p_id],
+            "hand": [] if hand is None else parse_tiles(hand),
+            "melds": melds[p_id],
+            "discards": discards[p_id]
+        } for p_id, hand in enumerate(hands)
+    }
+    placed = Counter(TILE_TO_CODE[tile] for tile in wall)
+    for player_state in players.values():
+        placed.update(TILE_TO_CODE[tile] for tile in player_state["hand"] + player_state["discards"])
+        placed.update(TILE_TO_CODE[tile] for meld in player_state["melds"] for tile in meld)
+    for code, copies in enumerate(_COPIES):
+        if placed[code] > copies:
+            raise ValueError(f"{placed[code]} copies of {CODE_TO_TILE[code]}, only {copies} exist")
+
+    rng = random.Random(seed)
+    rest = [CODE_TO_TILE[code] for code, copies in enumerate(_COPIES) for _ in range(copies - placed[code])]
+    rng.shuffle(rest)
+    # random hands only get regular tiles, taken from the end of rest
+    tiles = [tile for tile in rest if tile.suit != Suit.FLOWER]
+    flowers = [tile for tile in rest if tile.suit == Suit.FLOWER]
+    for p_id, hand in enumerate(hands):
+        if hand is None:
+            player_state = players[p_id]
+            size = 14 if p_id == current and (first or discard) else 13
+            num_tiles = size - hand_size(player_state)
+            if num_tiles < 0 or num_tiles > len(tiles):
+                raise ValueError(f"Cannot deal a hand of {size} tiles to player {p_id}")
+            player_state["hand"] = tiles[len(tiles) - num_tiles:]
+            del tiles[len(tiles) - num_tiles:]
+    rest = tiles + flowers
+    rng.shuffle(rest)
+
+    wall_size = spec.get("wall_size", len(wall) + len(rest))
+    if not len(wall) <= wall_size <= len(wall) + len(rest):
+        raise ValueError(f"A wall of {wall_size} tiles does not fit the {len(wall)} given and {len(rest)} left")
+    # the wall is drawn from the end
+    num_left = len(rest) - (wall_size - len(wall))
+    left, rest = rest[:num_left], rest[num_left:]
+    wall = rest + wall[::-1]
+    for i, tile in enumerate(left):
+        player_state = players[i % NUM_PLAYERS]
+        if tile.suit == Suit.FLOWER:
+            player_state["melds"].insert(0, [tile])
+        else:
+            player_state["discards"].insert(0, tile)
+
+    game_state: GameStateDict = {
+        "wall": wall,
+        "round_wind": spec.get("round_wind", WINDS[0]),
+        "current_player": current,
+        "first": first,
+        "discard": discard,
+        "kong": spec.get("kong", False),
+        "double_kong": spec.get("double_kong", False),
+        "draw": False,
+        "done": False,
+        "winning_hand_state": None,
+        "phase": "meld",
+        "visible": [],
+        "players": players
+    }
+    game_state["visible"] = get_visible_counts(game_state)
+    validate_state(game_state)
+    return game_state
+
+
+def build_game(
+    spec: ScenarioDict,
+    players: list[Player] | None = None,
+    seed: int | None = None,
+    verbose: bool = False
+) -> MahjongGame:
+    '''A game ready to step from the scenario'''
+    return MahjongGame.from_state(build_state(spec, seed), players, verbose)
+
+
+def to_scenario(game_state: GameStateDict) -> ScenarioDict:
+    '''The spec of a state between steps, build_state turns it back into the same state'''
+    players = [game_state["players"][p_id] for p_id in range(NUM_PLAYERS)]
+    return {
+        "hands": [format_tiles(state["hand"]) for state in players],
+        "melds": [[format_tiles(meld) for meld in state["melds"]] for state in players],
+        "discards": [format_tiles(state["discards"]) for state in players],
+        "wall": format_tiles(game_state["wall"][::-1]),
+        "current_player": game_state["current_player"],
+        "round_wind": game_state["round_wind"],
+        "first": game_state["first"],
+        "discard": game_state["discard"],
+        "kong": game_state["kong"],
+        "double_kong": game_state["double_kong"]
+    }
+
+
+def sample_states(
+    n: int,
+    spec: ScenarioDict | None = None,
+    predicate: StatePredicate | None = None,
+    seed: int | None = None,
+    max_attempts: int | None = None
+) -> list[GameStateDict]:
+    '''
+    n random completions of spec that satisfy predicate, by rejection
+    Raises RuntimeError if max_attempts (1000 per state by default) completions are not enough
+    '''
+    rng = random.Random(seed)
+    max_attempts = 1000 * n if max_attempts is None else max_attempts
+    states: list[GameStateDict] = []
+    for _ in range(max_attempts):
+        if len(states) == n:
+            break
+        state = build_state(spec or {}, rng.getrandbits(64))
+        if predicate is None or predicate(state):
+            states.append(state)
+    if len(states) < n:
+        raise RuntimeError(f"Only {len(states)} of {n} states matched in {max_attempts} attempts")
+    return states
+
+
+def snapshot_states(
+    n: int,
+    predicate: StatePredicate | None = None,
+    seed: int = 0,
+    make_players: Callable[[int], list[Player]] | None = None,
+    max_games: int | None = None
+) -> list[GameStateDict]:
+    '''
+    n states that satisfy predicate, taken between the steps of games played from seed on
+    Players come from make_players(seed), random players by default
+    Raises RuntimeError if max_games (100 per state by default) games are not enough
+    '''
+    max_games = 100 * n if max_games is None else max_games
+    states: list[GameStateDict] = []
+    for game_seed in range(seed, seed + max_games):
+        if len(states) == n:
+            break
+        game = MahjongGame(game_seed, verbose=False)
+        if make_players is None:
+            game.set_players([RandomAIPlayer(i, game_seed * NUM_PLAYERS + i) for i in range(NUM_PLAYERS)])
+        else:
+            game.set_players(make_players(game_seed))
+        while not game.game_state["done"] and len(states) < n:
+            if predicate is None or predicate(game.game_state):
+                states.append(copy_game_state(game.game_state))
+            game.step()
+    if len(states) < n:
+        raise RuntimeError(f"Only {len(states)} of {n} states matched in {max_games} games")
+    return states
@@ -0,0 +1,170 @@
+'''
+Fixed-layout binary encoding of GameStateDict, for moving games between processes and checkpointing them
+
+Every state takes exactly STATE_SIZE bytes, so a pool of games fits in one buffer and state i sits at offset
+i * STATE_SIZE. Tiles are stored as one byte tile codes (tile ids, then flowers) in a single area holding the wall,
+then every player's hand, meld tiles and discards. Decoding reads straight from any bytes-like object, e.g. a
+memoryview of shared memory, without copying it first.
+
+    header      35 bytes  flags, winds, current player, section lengths, winning hand state
+    meld table  64 bytes  length of up to 16 melds per player, their kinds follow from their tiles
+    tiles      144 bytes  tile codes
+'''
+from __future__ import annotations
+import struct
+from game.constants import CODE_TO_TILE, HASH_TO_CODE
+from game.mahjong import NUM_PLAYERS, WINDS
+from game.utils import GameStateDict, HandStateDict, PlayerStateDict, get_visible_counts
+
+FORMAT_VERSION = 2
+MAX_MELDS = 16  # per player, enough for 8 flowers and a won hand
+MAX_WIN_CONDITIONS = 8
+NUM_TILE_SLOTS = 144
+
+WIN_CONDITIONS = [
+    "self_pick", "concealed_hand", "rob_kong", "last_draw", "win_by_kong", "win_by_double_kong",
+    "heavenly_hand", "earthly_hand"
+]
+WIN_CONDITION_CODES = {condition: code for code, condition in enumerate(WIN_CONDITIONS)}
+
+# flag bits, the lowest six are first, discard, kong, double_kong, draw and done
+_DISCARD_PHASE = 1 << 6
+_HAS_WINNER = 1 << 7
+_THIRTEEN_ORPHANS = 1
+_NINE_GATES = 2
+_NO_WIND = 255
+
+# magic, version, flags, round wind, current player, wall length,
+# winning hand: seat wind, round wind, flags, number of conditions, conditions,
+# per player: seat wind, hand length, number of melds, number of discards
+_HEADER = struct.Struct(f"<2sBBBBB BBBB{MAX_WIN_CONDITIONS}s {4 * NUM_PLAYERS}s")
+_MAGIC = b"HK"
+_MELDS_OFFSET = _HEADER.size
+_TILES_OFFSET = _MELDS_OFFSET + MAX_MELDS * NUM_PLAYERS
+STATE_SIZE = _TILES_OFFSET + NUM_TILE_SLOTS
+
+
+def serialize_state(
+    game_state: GameStateDict,
+    out: bytearray | memoryview | None = None,
+    offset: int = 0
+) -> bytearray | memoryview:
+    '''
+    Encodes the game state into STATE_SIZE bytes, written to out at offset if given, and returns the buffer
+    Raises ValueError for states that do not fit the layout
+    '''
+    buf = bytearray(STATE_SIZE) if out is None else out
+    if offset + STATE_SIZE > len(buf):
+        raise ValueError("Buffer too small for the game state")
+
+    flags = sum(1 << i for i, flag in enumerate((
+        game_state["first"], game_state["discard"], game_state["kong"],
+        game_state["double_kong"], game_state["draw"], game_state["done"]
+    )) if flag)
+    if game_state["phase"] == "discard":
+        flags |= _DISCARD_PHASE
+    win_seat = win_round = win_flags = 0
+    conditions = b""
+    winning = game_state["winning_hand_state"]
+    if winning is not None:
+        flags |= _HAS_WINNER
+        win_seat = WINDS.index(winning["seat_wind"])
+        win_round = _NO_WIND if winning["round_wind"] is None else WINDS.index(winning["round_wind"])
+        win_flags = _THIRTEEN_ORPHANS * winning["thirteen_orphans"] + _NINE_GATES * winning["nine_gates"]
+        if len(winning["win_condition"]) > MAX_WIN_CONDITIONS:
+            raise ValueError("Too many win conditions")
+        if not WIN_CONDITION_CODES.keys() >= set(winning["win_condition"]):
+            raise ValueError(f"Unknown win condition in {winning['win_condition']}")
+        conditions = bytes(WIN_CONDITION_CODES[condition] for condition in winning["win_condition"])
+
+    codes = HASH_TO_CODE
+    tiles = [codes[hash(tile)] for tile in game_state["wall"]]
+    counts = bytearray()
+    melds = bytearray(MAX_MELDS * NUM_PLAYERS)
+    for p_id in range(NUM_PLAYERS):
+        player_state = game_state["players"][p_id]
+        if len(player_state["melds"]) > MAX_MELDS:
+            raise ValueError(f"Player {p_id} has more than {MAX_MELDS} melds")
+        counts += bytes([
+            WINDS.index(player_state["seat_wind"]),
+            len(player_state["hand"]),
+            len(player_state["melds"]),
+            len(player_state["discards"])
+        ])
+        tiles += [codes[hash(tile)] for tile in player_state["hand"]]
+        for i, meld in enumerate(player_state["melds"]):
+            melds[p_id * MAX_MELDS + i] = len(meld)
+            tiles += [codes[hash(tile)] for tile in meld]
+        tiles += [codes[hash(tile)] for tile in player_state["discards"]]
+    if len(tiles) > NUM_TILE_SLOTS:
+        raise ValueError(f"Game state holds more than {NUM_TILE_SLOTS} tiles")
+
+    _HEADER.pack_into(
+        buf, offset, _MAGIC, FORMAT_VERSION, flags, WINDS.index(game_state["round_wind"]),
+        game_state["current_player"], len(game_state["wall"]),
+        win_seat, win_round, win_flags, len(conditions), conditions, bytes(counts)
+    )
+    buf[offset + _MELDS_OFFSET:offset + _TILES_OFFSET] = melds
+    buf[offset + _TILES_OFFSET:offset + _TILES_OFFSET + len(tiles)] = bytes(tiles)
+    buf[offset + _TILES_OFFSET + len(tiles):offset + STATE_SIZE] = bytes(NUM_TILE_SLOTS - len(tiles))
+    return buf
+
+
+def deserialize_state(buf: bytes | bytearray | memoryview, offset: int = 0) -> GameStateDict:
+    '''Decodes a game state encoded by serialize_state from buf at offset'''
+    view = memoryview(buf).cast("B") if isinstance(buf, memoryview) else memoryview(buf)
+    (
+        magic, version, flags, round_wind, current_player, wall_len,
+        win_seat, win_round, win_flags, num_conditions, conditions, counts
+    ) = _HEADER.unpack_from(view, offset)
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a serialized game state, or one of another format version")
+
+    tiles = view[offset + _TILES_OFFSET:offset + STATE_SIZE]
+    melds = view[offset + _MELDS_OFFSET:offset + _TILES_OFFSET]
+    pos = wall_len
+    players: dict[int, PlayerStateDict] = {}
+    for p_id in range(NUM_PLAYERS):
+        seat_wind, hand_len, num_melds, discard_len = counts[4 * p_id:4 * p_id + 4]
+        hand = [CODE_TO_TILE[code] for code in tiles[pos:pos + hand_len]]
+        pos += hand_len
+        player_melds = []
+        for i in range(num_melds):
+            length = melds[p_id * MAX_MELDS + i]
+            player_melds.append([CODE_TO_TILE[code] for code in tiles[pos:pos + length]])
+            pos += length
+        players[p_id] = {
+            "id": p_id,
+            "seat_wind": WINDS[seat_wind],
+            "hand": hand,
+            "melds": player_melds,
+            "discards": [CODE_TO_TILE[code] for code in tiles[pos:pos + discard_len]]
+        }
+        pos += discard_len
+
+    winning: HandStateDict | None = None
+    if flags & _HAS_WINNER:
+        winning = {
+            "win_condition": [WIN_CONDITIONS[code] for code in conditions[:num_conditions]],
+            "thirteen_orphans": bool(win_flags & _THIRTEEN_ORPHANS),
+            "nine_gates": bool(win_flags & _NINE_GATES),
+            "seat_wind": WINDS[win_seat],
+            "round_wind": None if win_round == _NO_WIND else WINDS[win_round]
+        }
+    game_state: GameStateDict = {
+        "wall": [CODE_TO_TILE[code] for code in tiles[:wall_len]],
+        "round_wind": WINDS[round_wind],
+        "current_player": current_player,
+        "first": bool(flags & 1),
+        "discard": bool(flags & 2),
+        "kong": bool(flags & 4),
+        "double_kong": bool(flags & 8),
+        "draw": bool(flags & 16),
+        "done": bool(flags & 32),
+        "winning_hand_state": winning,
+        "phase": "discard" if flags & _DISCARD_PHASE else "meld",
+        "visible": [],
+        "players": players
+    }
+    game_state["visible"] = get_visible_counts(game_state)
+    return game_state
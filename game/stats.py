@@ -0,0 +1,276 @@
+'''
+Mergeable streaming statistics of self-play games
+
+GameStats keeps counters and fixed histograms of finished games in constant memory: draws, wins and payoffs by
+seat (seat 0 deals), win conditions, faan, claims by meld type and game length, the last in a QuantileSketch.
+Workers each add their own games and the results are merged; merging is associative and commutative, so any
+grouping of the same games gives the same statistics. to_dict() and from_dict() move the state through JSON.
+
+    python -m game.stats --games 10000 --workers 4 --out stats.json
+'''
+from __future__ import annotations
+import argparse
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, TypedDict
+from game.mahjong import CLAIM_TYPES, GamePool, MahjongGame, NUM_PLAYERS
+from game.player import RandomAIPlayer
+from game.serialize import WIN_CONDITIONS
+from game.utils import score_hand
+
+MAX_FAAN = 13
+SPECIAL_HANDS = ("thirteen_orphans", "nine_gates")
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    '''
+    Quantiles of a stream of non-negative numbers in constant memory, within a relative error of alpha: values go
+    to logarithmic buckets (as in DDSketch), so merging two sketches just adds their bucket counts
+    '''
+
+    def __init__(self, alpha: float = 0.01) -> None:
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zeros = 0
+        self.buckets: dict[int, int] = {}  # i -> count of values in (gamma^(i-1), gamma^i]
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("QuantileSketch only takes non-negative values")
+        if value == 0:
+            self.zeros += count
+        else:
+            i = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[i] = self.buckets.get(i, 0) + count
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: QuantileSketch) -> None:
+        if other.alpha != self.alpha:
+            raise ValueError("Only sketches with the same alpha can be merged")
+        for i, count in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + count
+        self.count += other.count
+        self.zeros += other.zeros
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        '''The q-quantile (0 <= q <= 1) of the values added, nan if there are none'''
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if rank < seen:
+                # the middle of the bucket in relative terms, kept within the values seen
+                return min(max(2 * self.gamma ** i / (self.gamma + 1), self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "alpha": self.alpha, "count": self.count, "zeros": self.zeros,
+            "buckets": {str(i): count for i, count in sorted(self.buckets.items())},
+            "min": self.min if self.count else None, "max": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> QuantileSketch:
+        sketch = cls(data["alpha"])
+        sketch.count = data["count"]
+        sketch.zeros = data["zeros"]
+        sketch.buckets = {int(i): count for i, count in data["buckets"].items()}
+        sketch.min = math.inf if data["min"] is None else data["min"]
+        sketch.max = -math.inf if data["max"] is None else data["max"]
+        return sketch
+
+
+class SummaryDict(TypedDict):
+    games: int
+    draw_rate: float
+    win_rate_by_seat: list[float]  # share of all games won by each seat
+    self_pick_rate: float  # share of the wins that were self-picked
+    dealer_advantage: float  # win rate of the dealer (seat 0) over the mean win rate of the other seats
+    payoff_by_seat: list[float]  # mean payoff in faan per game
+    win_conditions: dict[str, float]  # share of the wins with each condition (and special hand)
+    faan: list[float]  # share of the wins scoring each faan, 0 to MAX_FAAN
+    mean_faan: float
+    claims_per_game: dict[str, float]  # claims taken on discards per game, by meld type
+    turns: dict[str, float]  # mean, min, max and quantiles ("p50", ...) of the steps per game
+
+
+class GameStats:
+    '''Statistics of finished games in constant memory, see the module docstring'''
+
+    def __init__(self, alpha: float = 0.01) -> None:
+        self.games = 0
+        self.draws = 0
+        self.wins = [0] * NUM_PLAYERS
+        self.self_picks = 0
+        self.payoffs = [0] * NUM_PLAYERS
+        self.win_conditions = dict.fromkeys(WIN_CONDITIONS + list(SPECIAL_HANDS), 0)
+        self.faan = [0] * (MAX_FAAN + 1)
+        self.claims = dict.fromkeys(CLAIM_TYPES, 0)
+        self.turns = 0
+        self.turn_sketch = QuantileSketch(alpha)
+
+    def add_game(self, game: MahjongGame) -> None:
+        '''Adds a finished game'''
+        state = game.game_state
+        if not state["done"]:
+            raise ValueError("The game is not finished")
+        self.games += 1
+        winner = game.get_winner()
+        winning = state["winning_hand_state"]
+        if winner is None or winning is None:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+            self.self_picks += "self_pick" in winning["win_condition"]
+            for condition in winning["win_condition"]:
+                self.win_conditions[condition] += 1
+            self.win_conditions["thirteen_orphans"] += winning["thirteen_orphans"]
+            self.win_conditions["nine_gates"] += winning["nine_gates"]
+            self.faan[score_hand(state["players"][winner]["melds"], winning)] += 1
+        for seat, payoff in enumerate(game.get_payoffs()):
+            self.payoffs[seat] += payoff
+        for claim, count in game.claims.items():
+            self.claims[claim] += count
+        self.turns += game.turns
+        self.turn_sketch.add(game.turns)
+
+    def merge(self, other: GameStats) -> GameStats:
+        '''Adds the games of other to these statistics, returns self'''
+        self.games += other.games
+        self.draws += other.draws
+        self.self_picks += other.self_picks
+        self.turns += other.turns
+        for seat in range(NUM_PLAYERS):
+            self.wins[seat] += other.wins[seat]
+            self.payoffs[seat] += other.payoffs[seat]
+        for condition, count in other.win_conditions.items():
+            self.win_conditions[condition] += count
+        for faan, count in enumerate(other.faan):
+            self.faan[faan] += count
+        for claim, count in other.claims.items():
+            self.claims[claim] += count
+        self.turn_sketch.merge(other.turn_sketch)
+        return self
+
+    def summary(self) -> SummaryDict:
+        games = max(self.games, 1)
+        wins = max(sum(self.wins), 1)
+        sketch = self.turn_sketch
+        turns: dict[str, float] = {}
+        if self.games:
+            turns = {"mean": self.turns / games, "min": sketch.min, "max": sketch.max}
+            turns.update({f"p{round(q * 100)}": sketch.quantile(q) for q in QUANTILES})
+        return {
+            "games": self.games,
+            "draw_rate": self.draws / games,
+            "win_rate_by_seat": [w / games for w in self.wins],
+            "self_pick_rate": self.self_picks / wins,
+            "dealer_advantage": (self.wins[0] - sum(self.wins[1:]) / (NUM_PLAYERS - 1)) / games,
+            "payoff_by_seat": [p / games for p in self.payoffs],
+            "win_conditions": {condition: count / wins for condition, count in self.win_conditions.items()},
+            "faan": [count / wins for count in self.faan],
+            "mean_faan": sum(faan * count for faan, count in enumerate(self.faan)) / wins,
+            "claims_per_game": {claim: count / games for claim, count in self.claims.items()},
+            "turns": turns
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        '''The whole state, JSON-serializable, for from_dict()'''
+        return {
+            "games": self.games, "draws": self.draws, "wins": self.wins, "self_picks": self.self_picks,
+            "payoffs": self.payoffs, "win_conditions": self.win_conditions, "faan": self.faan,
+            "claims": self.claims, "turns": self.turns, "turn_sketch": self.turn_sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> GameStats:
+        stats = cls()
+        stats.games = data["games"]
+        stats.draws = data["draws"]
+        stats.wins = list(data["wins"])
+        stats.self_picks = data["self_picks"]
+        stats.payoffs = list(data["payoffs"])
+        stats.win_conditions = dict(data["win_conditions"])
+        stats.faan = list(data["faan"])
+        stats.claims = dict(data["claims"])
+        stats.turns = data["turns"]
+        stats.turn_sketch = QuantileSketch.from_dict(data["turn_sketch"])
+        return stats
+
+    def write_json(self, path: str | Path) -> None:
+        '''Writes the summary and the state to path, replacing it in one step so readers never see half a file'''
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"summary": self.summary(), "state": self.to_dict()}, indent=1) + "\n")
+        tmp.replace(path)
+
+
+def play_stats(seeds: Iterable[int]) -> GameStats:
+    '''Statistics of the games of the given seeds between RandomAIPlayers, dealt again and again in one game'''
+    stats = GameStats()
+    pool = GamePool()
+    for seed in seeds:
+        with pool.game(seed, [RandomAIPlayer(i, seed) for i in range(NUM_PLAYERS)]) as game:
+            while not game.game_state["done"]:
+                game.step()
+            stats.add_game(game)
+    return stats
+
+
+def run(
+    num_games: int, workers: int = 0, chunk_size: int = 1000, out: str | Path | None = None, seed: int = 0
+) -> GameStats:
+    '''
+    Plays num_games games in chunks of seeds, across worker processes if workers > 0, and merges the statistics of
+    the chunks in order, writing them to out after every chunk if given
+    '''
+    end = seed + num_games
+    chunks = [range(start, min(start + chunk_size, end)) for start in range(seed, end, chunk_size)]
+    stats = GameStats()
+    if workers > 0:
+        with ProcessPoolExecutor(workers) as pool:
+            results = pool.map(play_stats, chunks)
+            for chunk_stats in results:
+                stats.merge(chunk_stats)
+                if out is not None:
+                    stats.write_json(out)
+    else:
+        for chunk in chunks:
+            stats.merge(play_stats(chunk))
+            if out is not None:
+                stats.write_json(out)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="games per chunk, stats are written after each")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON file the statistics are written to after every chunk")
+    args = parser.parse_args()
+    stats = run(args.games, args.workers, args.chunk_size, args.out, args.seed)
+    print(json.dumps(stats.summary(), indent=1))
+
+
+if __name__ == "__main__":
+    main()
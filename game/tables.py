@@ -0,0 +1,186 @@
+'''
+Precomputed rule tables, cached on disk
+
+Each set of tables is built once by its registered builder and written as .npy files to a directory named
+after a hash of the builder's source and of the module-level functions and constants it uses, so tables built by
+other code are never picked up and edits elsewhere do not rebuild them. The builders live here, with the "win"
+tables of game.batch, so every set is registered by importing this module. Tables are loaded lazily with mmap on
+first use, which keeps imports fast and lets forked workers share the pages. The cache directory is
+$HKMAHJONG_TABLES, or hkmahjong/ in the user's cache directory.
+
+    python -m game.tables  # builds every registered set of tables and removes stale ones
+'''
+from __future__ import annotations
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from types import CodeType
+from typing import Callable, Iterator
+import numpy as np
+
+# bump to invalidate every table built so far, e.g. when the file layout changes
+TABLE_VERSION = 1
+
+TableBuilder = Callable[[], dict[str, np.ndarray]]
+_BUILDERS: dict[str, TableBuilder] = {}
+_LOADED: dict[str, dict[str, np.ndarray]] = {}
+# held while loading, so threads that first need the same tables build and map them once
+_LOAD_LOCK = threading.Lock()
+
+
+def register_tables(name: str) -> Callable[[TableBuilder], TableBuilder]:
+    '''Registers a function that builds a named set of tables, as a dict of arrays'''
+    def register(builder: TableBuilder) -> TableBuilder:
+        _BUILDERS[name] = builder
+        return builder
+    return register
+
+
+def table_dir() -> Path:
+    if "HKMAHJONG_TABLES" in os.environ:
+        return Path(os.environ["HKMAHJONG_TABLES"])
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "hkmahjong"
+
+
+def _global_names(code: CodeType) -> Iterator[str]:
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, CodeType):  # comprehensions and nested functions
+            yield from _global_names(const)
+
+
+def _dependencies(builder: TableBuilder) -> Iterator[bytes]:
+    '''The source of the builder, then of the module-level functions and the values of the constants it uses'''
+    yield inspect.getsource(builder).encode()
+    for name in sorted(set(_global_names(builder.__code__))):
+        value = builder.__globals__.get(name)
+        if inspect.isfunction(value):
+            yield inspect.getsource(value).encode()
+        elif isinstance(value, np.ndarray):
+            yield value.tobytes()
+        elif isinstance(value, (bool, int, float, str, tuple)):
+            yield repr(value).encode()
+
+
+def table_key(name: str) -> str:
+    '''Hash of everything a set of tables depends on, see the module docstring'''
+    digest = hashlib.sha256(f"{TABLE_VERSION}:{name}".encode())
+    for dependency in _dependencies(_BUILDERS[name]):
+        digest.update(dependency)
+    return digest.hexdigest()[:16]
+
+
+def load_tables(name: str) -> dict[str, np.ndarray]:
+    '''Returns the named set of tables, memory mapped from the cache and built first if missing or stale'''
+    tables = _LOADED.get(name)
+    if tables is not None:
+        return tables
+    with _LOAD_LOCK:
+        tables = _LOADED.get(name)
+        if tables is None:
+            path = table_dir() / f"{name}-{table_key(name)}"
+            if not (path / "meta.json").exists():
+                _write_tables(name, path)
+            meta = json.loads((path / "meta.json").read_text())
+            # np.asarray drops the memmap subclass, whose indexing is slower, but keeps the mapping
+            tables = {key: np.asarray(np.load(path / f"{key}.npy", mmap_mode="r")) for key in meta["tables"]}
+            _LOADED[name] = tables
+    return tables
+
+
+def _write_tables(name: str, path: Path) -> None:
+    tables = _BUILDERS[name]()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # written to a temporary directory first, so other processes never see half-written tables
+    tmp = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=path.parent))
+    try:
+        for key, table in tables.items():
+            np.save(tmp / f"{key}.npy", table)
+        meta = {"name": name, "version": TABLE_VERSION, "tables": list(tables)}
+        # meta.json goes last, its presence marks the tables as complete
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # fine if another process got there first
+            if not (path / "meta.json").exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def build_all() -> list[Path]:
+    '''Builds every registered set of tables that is missing, removes stale ones, and returns their paths'''
+    paths = []
+    for name in _BUILDERS:
+        path = table_dir() / f"{name}-{table_key(name)}"
+        if not (path / "meta.json").exists():
+            _write_tables(name, path)
+        for stale in table_dir().glob(f"{name}-*"):
+            if stale != path:
+                shutil.rmtree(stale, ignore_errors=True)
+        paths.append(path)
+    return paths
+
+
+# powers of 5 that encode the counts of a block of tiles (a number suit or the honors) as one index
+SUIT_WEIGHTS = 5 ** np.arange(9)
+# kinds of a block of tiles in the "win" tables
+SETS = 0
+SETS_AND_PAIR = 1
+INCOMPLETE = 2
+
+
+@register_tables("win")
+def _build_win_tables() -> dict[str, np.ndarray]:
+    '''
+    Lookup tables for check_win_batch
+    The kind of each number suit indexed by the base-5 encoding of its counts, the same with chows as the only
+    sets, the kind of the honors (base-5 encoded too), which honor encodings hold every honor, and whether a
+    combination of the four kinds (base 3) is a complete hand
+    '''
+    eye = np.eye(9, dtype=np.int64)
+    pungs = [eye[i] * 3 for i in range(9)]
+    chows = [eye[i:i + 3].sum(axis=0) for i in range(7)]
+    suit_tables = []
+    for shapes in (pungs + chows, chows):
+        suit_kinds = np.full(5 ** 9, INCOMPLETE, dtype=np.int8)
+        for k in range(5):
+            for combo in itertools.combinations_with_replacement(range(len(shapes)), k):
+                counts = sum((shapes[i] for i in combo), np.zeros(9, dtype=np.int64))
+                if counts.max() > 4:
+                    continue
+                suit_kinds[counts @ SUIT_WEIGHTS] = SETS
+                for i in range(9):
+                    if counts[i] <= 2:
+                        suit_kinds[(counts + 2 * eye[i]) @ SUIT_WEIGHTS] = SETS_AND_PAIR
+        suit_tables.append(suit_kinds)
+
+    honors = np.array(list(itertools.product(range(5), repeat=7)))[:, ::-1]  # row i is the encoding of i
+    pairs = (honors == 2).sum(axis=1)
+    sets_only = ((honors == 0) | (honors == 2) | (honors == 3)).all(axis=1)
+    honor_kinds = np.full(len(honors), INCOMPLETE, dtype=np.int8)
+    honor_kinds[sets_only & (pairs == 0)] = SETS
+    honor_kinds[sets_only & (pairs == 1)] = SETS_AND_PAIR
+    all_honors = (honors >= 1).all(axis=1)
+
+    kinds = np.array(list(itertools.product(range(3), repeat=4)))
+    complete = (kinds != INCOMPLETE).all(axis=1) & ((kinds == SETS_AND_PAIR).sum(axis=1) == 1)
+    return {
+        "suit_kinds": suit_tables[0],
+        "chow_kinds": suit_tables[1],
+        "honor_kinds": honor_kinds,
+        "all_honors": all_honors,
+        "complete": complete
+    }
+
+
+if __name__ == "__main__":
+    for path in build_all():
+        print(path)
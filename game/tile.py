@@ -23,12 +23,16 @@ Value = StrEnum("Value", [
     ("NORTH", "north"),
     ("WEST", "west")
 ])
+# position of each value in the enum definition, used to order tiles
+VALUE_ORDER = {value: i for i, value in enumerate(Value)}
 
 
 class Tile:
     def __init__(self, suit: Suit, value: Value) -> None:
         self.suit = suit
         self.value = value
+        # tiles are hashed constantly (Counters, TILE_TO_ID lookups), and enum hashing is slow
+        self._hash = hash((suit, value))
 
     def __str__(self) -> str:
         if self.suit == Suit.FLOWER:
@@ -43,8 +47,7 @@ class Tile:
         if self.suit != other.suit:
             return self.suit.value < other.suit.value
         # otherwise, compare by value using enum def order
-        enum_list = list(Value)
-        return enum_list.index(self.value) < enum_list.index(other.value)
+        return VALUE_ORDER[self.value] < VALUE_ORDER[other.value]
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Tile):
@@ -52,4 +55,4 @@ class Tile:
         return self.suit == other.suit and self.value == other.value
 
     def __hash__(self) -> int:
-        return hash((self.suit, self.value))
+        return self._hash
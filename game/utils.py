@@ -1,11 +1,15 @@
 from game.tile import Tile, Suit, Value
-from game.constants import Action, NUM_ACTIONS, TILE_TO_ID, CHOW_TO_ID
+from game.constants import Action, NUM_ACTIONS, TILE_TO_ID, CHOW_TO_ID, ID_TO_TILE, FLOWER_TILES
+from game.constants import Observation, NUM_OBSERVATIONS, NUM_TILES
 import random
 from collections import Counter
-from typing import TypedDict, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, TypedDict, Optional
 
 
-FAAN = {
+# read-only, like the tables in game.constants, as every game and thread shares it
+FAAN: Mapping[str, int] = MappingProxyType({
     # Hand types
     "common_hand": 1,
     "all_pung_kong": 3,
@@ -38,15 +42,31 @@ FAAN = {
     "no_flowers": 1,
     "own_flower": 1,
     "set_of_flowers": 2
-}
-
-NON_HONOR_SUITS = {Suit.DOT, Suit.BAMBOO, Suit.CHARACTER}
-HONOR_SUITS = {Suit.DRAGON, Suit.WIND}
-
-NUMBER_VALUES = list(Value)[:9]
-DRAGON_VALUES = list(Value)[9:12]
-WIND_VALUES = list(Value)[12:]
-FLOWER_VALUES = list(Value)[:8]
+})
+
+NON_HONOR_SUITS = frozenset({Suit.DOT, Suit.BAMBOO, Suit.CHARACTER})
+HONOR_SUITS = frozenset({Suit.DRAGON, Suit.WIND})
+
+NUMBER_VALUES = tuple(Value)[:9]
+DRAGON_VALUES = tuple(Value)[9:12]
+WIND_VALUES = tuple(Value)[12:]
+FLOWER_VALUES = tuple(Value)[:8]
+
+THIRTEEN_ORPHANS = frozenset({
+    Tile(Suit.BAMBOO, Value.ONE),
+    Tile(Suit.BAMBOO, Value.NINE),
+    Tile(Suit.DOT, Value.ONE),
+    Tile(Suit.DOT, Value.NINE),
+    Tile(Suit.CHARACTER, Value.ONE),
+    Tile(Suit.CHARACTER, Value.NINE),
+    Tile(Suit.DRAGON, Value.RED),
+    Tile(Suit.DRAGON, Value.GREEN),
+    Tile(Suit.DRAGON, Value.WHITE),
+    Tile(Suit.WIND, Value.EAST),
+    Tile(Suit.WIND, Value.SOUTH),
+    Tile(Suit.WIND, Value.NORTH),
+    Tile(Suit.WIND, Value.WEST)
+})
 
 
 class HandStateDict(TypedDict):
@@ -77,6 +97,7 @@ class GameStateDict(TypedDict):
     done: bool
     winning_hand_state: HandStateDict | None
     phase: str
+    visible: list[int]  # copies of each tile id in discards and exposed (non-flower) melds, kept up to date by the game
     players: dict[int, PlayerStateDict]
 
 
@@ -86,33 +107,46 @@ class PlayerActionDict(TypedDict):
     state: Optional[HandStateDict]
 
 
+class UkeireDict(TypedDict):
+    shanten: int  # shanten after the discard
+    accepted: dict[int, int]  # tile id -> live copies, for every tile that would lower the shanten
+    live: int  # live copies of all accepted tiles
+
+
+# the 144 tiles in a fixed order, every wall is a shuffled copy -- tiles are never changed, so walls share them
+WALL_TILES = ID_TO_TILE * 4 + FLOWER_TILES
+
+
 def init_wall(seed: int | None = None) -> list[Tile]:
     '''Initializes and shuffles the mahjong wall'''
-    wall = []
-    for suit in Suit:
-        if suit in NON_HONOR_SUITS:
-            for value in NUMBER_VALUES:
-                tile = Tile(suit, value)
-                wall.append(tile)
-        elif suit == Suit.DRAGON:
-            for value in DRAGON_VALUES:
-                tile = Tile(suit, value)
-                wall.append(tile)
-        elif suit == Suit.WIND:
-            for value in WIND_VALUES:
-                tile = Tile(suit, value)
-                wall.append(tile)
-    wall *= 4
-    # Add in flower tiles
-    for value in FLOWER_VALUES:
-        tile = Tile(Suit.FLOWER, value)
-        wall.append(tile)
-
+    wall = list(WALL_TILES)
     rng = random.Random(seed)
     rng.shuffle(wall)
     return wall
 
 
+def copy_game_state(game_state: GameStateDict) -> GameStateDict:
+    '''Returns a copy of the game state that can be mutated independently (tiles themselves are shared)'''
+    new_state = game_state.copy()
+    new_state["wall"] = game_state["wall"].copy()
+    new_state["visible"] = game_state["visible"].copy()
+    winning_hand_state = game_state["winning_hand_state"]
+    if winning_hand_state is not None:
+        new_state["winning_hand_state"] = {
+            **winning_hand_state,
+            "win_condition": winning_hand_state["win_condition"].copy()
+        }
+    new_state["players"] = {
+        p_id: {
+            **player_state,
+            "hand": player_state["hand"].copy(),
+            "melds": [meld.copy() for meld in player_state["melds"]],
+            "discards": player_state["discards"].copy()
+        } for p_id, player_state in game_state["players"].items()
+    }
+    return new_state
+
+
 def score_hand(melds: list[list[Tile]], state: HandStateDict) -> int:
     '''Given melds and game state, return the number of faan'''
     score = 0
@@ -284,31 +318,15 @@ def check_win(
         # if no melds or all flower melds, then the current hand is concealed
         state["win_condition"].append("concealed_hand")
 
-    # Check for thirteen orphans
-    thirteen_orphans = {
-        Tile(Suit.BAMBOO, Value.ONE),
-        Tile(Suit.BAMBOO, Value.NINE),
-        Tile(Suit.DOT, Value.ONE),
-        Tile(Suit.DOT, Value.NINE),
-        Tile(Suit.CHARACTER, Value.ONE),
-        Tile(Suit.CHARACTER, Value.NINE),
-        Tile(Suit.DRAGON, Value.RED),
-        Tile(Suit.DRAGON, Value.GREEN),
-        Tile(Suit.DRAGON, Value.WHITE),
-        Tile(Suit.WIND, Value.EAST),
-        Tile(Suit.WIND, Value.SOUTH),
-        Tile(Suit.WIND, Value.NORTH),
-        Tile(Suit.WIND, Value.WEST)
-    }
-    if thirteen_orphans.issubset(tile_counts):
-        # If all required tiles are in the hand, then it must be that the hand is a thirteen orphans
+    # Check for thirteen orphans -- every orphan and nothing else
+    if THIRTEEN_ORPHANS == tile_counts.keys():
         state["thirteen_orphans"] = True
         return [p_state["hand"]], state
 
     # Check for nine gates
     if state["win_condition"]:
-        # Check if all tiles are of a single suit
-        if len(set(tile.suit for tile in p_state["hand"])) == 1:
+        # Check if all tiles (incl. a discard) are of a single suit
+        if len(set(tile.suit for tile in tile_counts)) == 1:
             suit = p_state["hand"][0].suit
             # Check if each number of the suit is in the hand
             for val in range(1, 10):
@@ -321,6 +339,8 @@ def check_win(
                     state["nine_gates"] = True
                     return [p_state["hand"]], state
 
+    # every exposed meld (but flowers) stands for one of the four sets
+    sets_needed = 4 - sum(1 for meld in p_state["melds"] if meld[0].suit != Suit.FLOWER)
     possible_wins = []
     for tile in tile_counts:
         # Check over all possible pairs
@@ -329,9 +349,11 @@ def check_win(
             status, melds = _check_meld(tile_counts)
             if status:
                 for meld in melds:
-                    possible_wins.append(meld + [[tile]*2])
+                    # kongs still in the hand change the number of sets a hand of its size splits into
+                    if len(meld) == sets_needed:
+                        possible_wins.append(meld + [[tile]*2])
             tile_counts[tile] += 2
-    best_win = max(possible_wins, key=lambda x: score_hand(x, state)) if possible_wins else []
+    best_win = max(possible_wins, key=lambda x: score_hand(p_state["melds"] + x, state)) if possible_wins else []
     return best_win, state
 
 
@@ -340,10 +362,8 @@ def _check_meld(tile_counts: Counter[Tile]) -> tuple[bool, list[list[list[Tile]]
     if tile_counts.total() == 0:
         return True, [[]]
 
-    # Get tile with a non-zero count
-    for tile in tile_counts:
-        if tile_counts[tile] > 0:
-            break
+    # Get the lowest tile with a non-zero count -- it can only start a chow, never sit in the middle of one
+    tile = min(tile for tile in tile_counts if tile_counts[tile] > 0)
 
     melds = []
     # Check for kongs
@@ -420,7 +440,7 @@ def check_chow(p_state: PlayerStateDict, tile: Tile, current_player: bool) -> li
 
     possible_chows = []
     # Check if tile is in middle position of chow
-    if 2 <= int(tile.value) <= 9:
+    if 2 <= int(tile.value) <= 8:
         tl = Tile(tile.suit, Value(str(int(tile.value)-1)))
         tr = Tile(tile.suit, Value(str(int(tile.value)+1)))
         if tl in hand and tr in hand:
@@ -472,3 +492,353 @@ def get_action_mask(game_state: GameStateDict, p_id: int, discarded_tile: Tile |
             tile_id = TILE_TO_ID[pung[0]]
             mask[Action.PUNG + tile_id] = 1
     return mask
+
+
+def tiles_to_counts(tiles: list[Tile]) -> list[int]:
+    '''Returns the number of copies of each tile id in a list of (non-flower) tiles'''
+    counts = [0] * NUM_TILES
+    for tile in tiles:
+        counts[TILE_TO_ID[tile]] += 1
+    return counts
+
+
+def keep_value(counts: list[int], tile_id: int) -> int:
+    '''How much a tile is worth keeping, based on its copies and neighbours in the hand'''
+    value = 4 * (counts[tile_id] - 1)
+    if tile_id >= 27:  # honors
+        return value
+    pos = tile_id % 9
+    for d in (-2, -1, 1, 2):
+        if 0 <= pos + d <= 8:
+            value += 2 * counts[tile_id + d]
+    return value + min(pos, 8 - pos, 2)
+
+
+def get_visible_counts(game_state: GameStateDict) -> list[int]:
+    '''Counts the copies of each tile id in all discards and exposed (non-flower) melds'''
+    visible = [0] * NUM_TILES
+    for player_state in game_state["players"].values():
+        for meld in player_state["melds"]:
+            if meld[0].suit == Suit.FLOWER:
+                continue
+            for tile in meld:
+                visible[TILE_TO_ID[tile]] += 1
+        for tile in player_state["discards"]:
+            visible[TILE_TO_ID[tile]] += 1
+    return visible
+
+
+def _pareto(entries: set[tuple[int, int, int]]) -> tuple[tuple[int, int, int], ...]:
+    '''Drops every (sets, sets + partial sets, pair) entry that is matched or beaten by another entry'''
+    return tuple(
+        x for x in entries
+        if not any(y != x and y[0] >= x[0] and y[1] >= x[1] and y[2] >= x[2] for y in entries)
+    )
+
+
+@lru_cache(maxsize=None)
+def _suit_partitions(counts: tuple[int, ...], honors: bool) -> tuple[tuple[int, int, int], ...]:
+    '''
+    Returns the useful decompositions of the tiles of a single suit as (sets, sets + partial sets, pair) entries
+    The shanten of a hand only grows with each of the three numbers, so dominated entries are dropped
+    The first tile is split off in every possible way and the rest of the suit is looked up recursively,
+    so suits that share their remaining tiles share the work
+    '''
+    i = 0
+    while i < len(counts) and counts[i] == 0:
+        i += 1
+    if i == len(counts):
+        return ((0, 0, 0),)
+
+    found: set[tuple[int, int, int]] = set()
+
+    def split(removed: tuple[int, ...], sets: int, partials: int, pair: int) -> None:
+        rest = list(counts)
+        for j in removed:
+            rest[j] -= 1
+        for m, b, e in _suit_partitions(tuple(rest), honors):
+            if e + pair <= 1:
+                found.add((m + sets, b + sets + partials, e + pair))
+
+    if counts[i] >= 3:
+        split((i, i, i), 1, 0, 0)  # pung
+    if counts[i] >= 2:
+        split((i, i), 0, 0, 1)  # eye
+        split((i, i), 0, 1, 0)  # partial pung
+    if not honors:
+        if i + 2 < len(counts) and counts[i + 1] and counts[i + 2]:
+            split((i, i + 1, i + 2), 1, 0, 0)  # chow
+        # partial chows (adjacent or with a gap)
+        for j in (i + 1, i + 2):
+            if j < len(counts) and counts[j]:
+                split((i, j), 0, 1, 0)
+    split((i,), 0, 0, 0)  # leave one copy of the tile unused
+    return _pareto(found)
+
+
+_BLOCKS = ((0, 9), (9, 18), (18, 27), (27, NUM_TILES))  # tile id ranges of each suit, honors last
+_ORPHAN_IDS = (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33)
+_ORPHAN_SET = frozenset(_ORPHAN_IDS)
+
+
+def _block_partitions(counts: list[int], block: int) -> tuple[tuple[int, int, int], ...]:
+    start, end = _BLOCKS[block]
+    return _suit_partitions(tuple(counts[start:end]), block == 3)
+
+
+def _merge_partitions(
+    combined: tuple[tuple[int, int, int], ...],
+    partitions: tuple[tuple[int, int, int], ...],
+    sets_needed: int
+) -> tuple[tuple[int, int, int], ...]:
+    '''Merges the decompositions of one more suit into the decompositions of the suits seen so far'''
+    merged: dict[tuple[int, int], int] = {}
+    for a1, b1, e1 in combined:
+        for a2, b2, e2 in partitions:
+            e = e1 + e2
+            if e > 1:
+                continue
+            a = a1 + a2
+            b = b1 + b2
+            key = (a if a < sets_needed else sets_needed, e)
+            if b > sets_needed:
+                b = sets_needed
+            if merged.get(key, -1) < b:
+                merged[key] = b
+    return tuple((a, b, e) for (a, e), b in merged.items())
+
+
+def _best_value(
+    combined: tuple[tuple[int, int, int], ...],
+    partitions: tuple[tuple[int, int, int], ...],
+    sets_needed: int
+) -> int:
+    '''
+    Returns the highest 2 * sets + partial sets + pair over all merged decompositions
+    With sets and partial sets capped at sets_needed this equals sets + (sets + partial sets) + pair
+    '''
+    best = 0
+    for a1, b1, e1 in combined:
+        for a2, b2, e2 in partitions:
+            if e1 + e2 > 1:
+                continue
+            a = a1 + a2
+            b = b1 + b2
+            value = (a if a < sets_needed else sets_needed) + (b if b < sets_needed else sets_needed) + e1 + e2
+            if value > best:
+                best = value
+    return best
+
+
+def _orphans_shanten(counts: list[int]) -> int:
+    orphans = [counts[i] for i in _ORPHAN_IDS]
+    return 13 - sum(1 for cnt in orphans if cnt) - any(cnt >= 2 for cnt in orphans)
+
+
+def calc_shanten(counts: list[int], num_melds: int = 0) -> int:
+    '''
+    Returns the number of tiles the concealed hand needs to exchange to be ready to win (-1 if already a win)
+    counts is indexed by tile id, num_melds is the number of exposed (non-flower) melds
+    '''
+    sets_needed = 4 - num_melds
+    combined = ((0, 0, 0),)
+    for block in range(3):
+        combined = _merge_partitions(combined, _block_partitions(counts, block), sets_needed)
+    shanten = 2 * sets_needed - _best_value(combined, _block_partitions(counts, 3), sets_needed)
+
+    # Thirteen orphans is only possible with a fully concealed hand
+    if num_melds == 0:
+        shanten = min(shanten, _orphans_shanten(counts))
+    return shanten
+
+
+def calc_discard_shanten(counts: list[int], num_melds: int = 0) -> dict[int, int]:
+    '''
+    Returns the shanten of the hand after discarding each tile id in it
+    The decompositions of the untouched suits are shared between all candidate discards
+    '''
+    sets_needed = 4 - num_melds
+    p0, p1, p2, p3 = (_block_partitions(counts, block) for block in range(4))
+    # rest[k] -- merged decompositions of every suit except suit k
+    first_two = _merge_partitions(p0, p1, sets_needed)
+    last_two = _merge_partitions(p2, p3, sets_needed)
+    rest = [
+        _merge_partitions(p1, last_two, sets_needed),
+        _merge_partitions(p0, last_two, sets_needed),
+        _merge_partitions(first_two, p3, sets_needed),
+        _merge_partitions(first_two, p2, sets_needed)
+    ]
+
+    # discarding can only move a hand away from thirteen orphans
+    orphans = _orphans_shanten(counts) if num_melds == 0 else NUM_TILES
+
+    shantens = {}
+    for block, (start, end) in enumerate(_BLOCKS):
+        for tile_id in range(start, end):
+            if not counts[tile_id]:
+                continue
+            counts[tile_id] -= 1
+            shanten = 2 * sets_needed - _best_value(rest[block], _block_partitions(counts, block), sets_needed)
+            if orphans <= shanten:
+                shanten = min(shanten, _orphans_shanten(counts))
+            counts[tile_id] += 1
+            shantens[tile_id] = shanten
+    return shantens
+
+
+def _connects(counts: list[int], tile_id: int) -> bool:
+    '''Whether a drawn tile could form a pair, set or partial set with the tiles in counts'''
+    if counts[tile_id]:
+        return True
+    if tile_id >= 27:  # honors
+        return False
+    pos = tile_id % 9
+    return any(0 <= pos + d <= 8 and counts[tile_id + d] for d in (-2, -1, 1, 2))
+
+
+def calc_ukeire(counts: list[int], visible: list[int], num_melds: int = 0) -> dict[int, UkeireDict]:
+    '''
+    Returns the shanten after discarding each tile id in the hand, the tiles that would then lower it (ukeire)
+    and how many copies of them are live -- neither in the hand nor in visible (e.g. game_state["visible"])
+    A draw only changes the decompositions of its own suit, so the merged decompositions of the other suits
+    are shared between all (discard, draw) pairs, and each drawn suit is decomposed once for all discards
+    '''
+    sets_needed = 4 - num_melds
+    parts = [_block_partitions(counts, block) for block in range(4)]
+    # pairs[j, k] -- merged decompositions of the two suits other than j and k
+    pairs = {}
+    for j in range(4):
+        for k in range(j + 1, 4):
+            a, b = (block for block in range(4) if block not in (j, k))
+            pairs[j, k] = pairs[k, j] = _merge_partitions(parts[a], parts[b], sets_needed)
+    # rest[j] -- merged decompositions of every suit except suit j
+    rest = [_merge_partitions(pairs[j, (j + 1) % 4], parts[(j + 1) % 4], sets_needed) for j in range(4)]
+    # draws worth checking in each suit -- an isolated tile adds nothing to any decomposition
+    draws = [
+        [tile_id for tile_id in range(start, end) if counts[tile_id] < 4 and _connects(counts, tile_id)]
+        for start, end in _BLOCKS
+    ]
+    drawn: dict[int, tuple[tuple[int, int, int], ...]] = {}  # decompositions of a suit with one tile drawn
+    live = [max(4 - seen - cnt, 0) for seen, cnt in zip(visible, counts)]
+    # neither discards nor draws can lower the thirteen orphans shanten by more than one in total
+    orphans = _orphans_shanten(counts) if num_melds == 0 else NUM_TILES
+
+    ukeire: dict[int, UkeireDict] = {}
+    for block, (start, end) in enumerate(_BLOCKS):
+        for discard in range(start, end):
+            if not counts[discard]:
+                continue
+            counts[discard] -= 1
+            own = _block_partitions(counts, block)
+            shanten = 2 * sets_needed - _best_value(rest[block], own, sets_needed)
+            check_orphans = orphans <= shanten
+            if check_orphans:
+                shanten = min(shanten, _orphans_shanten(counts))
+
+            accepted = {}
+            for other in range(4):
+                if other == block:
+                    combined = rest[block]
+                    candidates = [draw for draw in range(start, end) if counts[draw] < 4 and _connects(counts, draw)]
+                else:
+                    combined = _merge_partitions(pairs[block, other], own, sets_needed)
+                    candidates = draws[other]
+                for draw in candidates:
+                    counts[draw] += 1
+                    if other == block:
+                        partitions = _block_partitions(counts, block)
+                    else:
+                        partitions = drawn.get(draw)
+                        if partitions is None:
+                            partitions = drawn[draw] = _block_partitions(counts, other)
+                    after = 2 * sets_needed - _best_value(combined, partitions, sets_needed)
+                    if check_orphans and draw in _ORPHAN_SET:
+                        after = min(after, _orphans_shanten(counts))
+                    counts[draw] -= 1
+                    if after < shanten:
+                        accepted[draw] = live[draw]
+            if check_orphans:
+                # isolated terminals and honors can still complete thirteen orphans
+                for draw in _ORPHAN_IDS:
+                    if draw in accepted or counts[draw] >= 4 or _connects(counts, draw):
+                        continue
+                    counts[draw] += 1
+                    if _orphans_shanten(counts) < shanten:
+                        accepted[draw] = live[draw]
+                    counts[draw] -= 1
+            counts[discard] += 1
+            ukeire[discard] = {"shanten": shanten, "accepted": accepted, "live": sum(accepted.values())}
+    return ukeire
+
+
+def get_observation(game_state: GameStateDict, p_id: int) -> list[int]:
+    '''Encodes the game state visible to player p_id as a fixed-length feature vector'''
+    obs = [0] * NUM_OBSERVATIONS
+    for tile in game_state["players"][p_id]["hand"]:
+        obs[Observation.HAND + TILE_TO_ID[tile]] += 1
+
+    # Public information of every seat, ordered relative to p_id
+    for seat, player_state in game_state["players"].items():
+        offset = (seat - p_id) % 4
+        for meld in player_state["melds"]:
+            if meld[0].suit == Suit.FLOWER:
+                obs[Observation.FLOWERS + offset] += 1
+                continue
+            for tile in meld:
+                obs[Observation.MELDS + offset * NUM_TILES + TILE_TO_ID[tile]] += 1
+        for tile in player_state["discards"]:
+            obs[Observation.DISCARDS + offset * NUM_TILES + TILE_TO_ID[tile]] += 1
+
+    obs[Observation.WALL] = len(game_state["wall"])
+    obs[Observation.PHASE] = int(game_state["phase"] == "discard")
+    return obs
+
+
+def meld_to_action(meld_type: str, meld: list[Tile]) -> int:
+    '''Returns the action index of a single chow, pung, or kong meld'''
+    if meld_type == "chow":
+        return Action.CHOW + CHOW_TO_ID[meld[0]]
+    if meld_type == "pung":
+        return Action.PUNG + TILE_TO_ID[meld[0]]
+    if meld_type == "kong":
+        return Action.KONG + TILE_TO_ID[meld[0]]
+    raise ValueError(f"Unknown meld type {meld_type}")
+
+
+def get_options_mask(options: dict[str, list[list[Tile]]]) -> list[int]:
+    '''
+    Given the meld options offered to a player by the game, returns an action mask
+    Unlike get_action_mask, only the options actually offered by the game are marked
+    '''
+    mask = [0] * NUM_ACTIONS
+    mask[Action.PASS] = 1
+    for meld_type, melds in options.items():
+        if not melds:
+            continue
+        if meld_type == "win":
+            mask[Action.WIN] = 1
+            continue
+        for meld in melds:
+            mask[meld_to_action(meld_type, meld)] = 1
+    return mask
+
+
+def decode_meld_action(action: int, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+    '''Converts an action index back into the (meld_type, melds) answer expected by the game'''
+    if action == Action.PASS:
+        return "", []
+    if action == Action.WIN and options.get("win"):
+        return "win", options["win"]
+    for meld_type, melds in options.items():
+        if meld_type == "win":
+            continue
+        for meld in melds:
+            if meld_to_action(meld_type, meld) == action:
+                return meld_type, [meld]
+    raise ValueError(f"Action {action} is not one of the available options")
+
+
+def decode_discard_action(action: int, hand: list[Tile]) -> int:
+    '''Converts a discard action index into an index into the player's hand'''
+    tile = ID_TO_TILE[action - Action.DISCARD]
+    return hand.index(tile)
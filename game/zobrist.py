@@ -0,0 +1,212 @@
+'''
+Zobrist hashing of game states and a transposition table keyed by it
+
+Every (zone, seat, tile code, copy index) has a random 64-bit key, with zones for the hand, the discards and two
+for the melds, one for chows and one for all other melds (pungs, kongs, pairs and flowers): holding k copies of a
+tile in a zone XORs in the keys of copies 0..k-1, so the hash ignores the order of tiles within a zone and moving
+one tile changes it by two XORs. The copies of each tile in the two meld zones determine the melds themselves, so
+states that group the same exposed tiles differently (123b 123b 123b and 111b 222b 333b) hash differently. The
+wall is not hashed, its tiles are whatever is left, so states that differ only in the order of the wall share a
+hash. The flags and the current player are hashed on demand, as they are set in many places but only take a few
+lookups to combine.
+'''
+from __future__ import annotations
+import random
+from typing import Generic, TypedDict, TypeVar
+from game.constants import HASH_TO_CODE, NUM_CODES, NUM_PLAYERS
+from game.tile import Tile
+from game.utils import GameStateDict
+
+HAND, MELD, DISCARD, CHOW = range(4)
+NUM_ZONES = 4
+MAX_COPIES = 4
+
+_rng = random.Random(0x2B992DDFA23249D6)
+TILE_KEYS = [_rng.getrandbits(64) for _ in range(NUM_ZONES * NUM_PLAYERS * NUM_CODES * MAX_COPIES)]
+CURRENT_PLAYER_KEYS = [_rng.getrandbits(64) for _ in range(NUM_PLAYERS)]
+FLAG_KEYS = [_rng.getrandbits(64) for _ in range(6)]  # first, discard, kong, double_kong, draw, done
+DISCARD_PHASE_KEY = _rng.getrandbits(64)
+ROUND_WIND_KEYS = {wind: _rng.getrandbits(64) for wind in ("east", "south", "west", "north")}
+del _rng
+_NO_COUNTS = (0,) * (NUM_ZONES * NUM_PLAYERS * NUM_CODES)
+
+
+def meld_zone(meld: list[Tile]) -> int:
+    '''The zone of the tiles of a meld, CHOW for chows and MELD for the rest'''
+    return CHOW if len(meld) == 3 and meld[0] != meld[1] else MELD
+
+
+def flags_hash(game_state: GameStateDict) -> int:
+    '''Hash of everything in the state other than where the tiles are'''
+    h = CURRENT_PLAYER_KEYS[game_state["current_player"]] ^ ROUND_WIND_KEYS[game_state["round_wind"]]
+    flags = (
+        game_state["first"], game_state["discard"], game_state["kong"],
+        game_state["double_kong"], game_state["draw"], game_state["done"]
+    )
+    for flag, key in zip(flags, FLAG_KEYS):
+        if flag:
+            h ^= key
+    if game_state["phase"] == "discard":
+        h ^= DISCARD_PHASE_KEY
+    return h
+
+
+class ZobristHash:
+    '''Incrementally updated hash of where the tiles of a game are, add() and remove() are O(1)'''
+    __slots__ = ("value", "counts")
+
+    def __init__(self) -> None:
+        self.value = 0
+        self.counts = [0] * (NUM_ZONES * NUM_PLAYERS * NUM_CODES)  # copies of each tile in each zone of each seat
+
+    def clear(self) -> None:
+        '''Back to the hash of no tiles anywhere, in place'''
+        self.value = 0
+        self.counts[:] = _NO_COUNTS
+
+    @classmethod
+    def from_state(cls, game_state: GameStateDict) -> "ZobristHash":
+        zobrist = cls()
+        counts = zobrist.counts
+        value = 0
+        for p_id, player_state in game_state["players"].items():
+            melds = player_state["melds"]
+            zones = (
+                (HAND, player_state["hand"]),
+                (MELD, [tile for meld in melds if meld_zone(meld) == MELD for tile in meld]),
+                (CHOW, [tile for meld in melds if meld_zone(meld) == CHOW for tile in meld]),
+                (DISCARD, player_state["discards"])
+            )
+            for zone, tiles in zones:
+                # add() inlined, this runs for every tile in the game
+                offset = (zone * NUM_PLAYERS + p_id) * NUM_CODES
+                for tile in tiles:
+                    slot = offset + HASH_TO_CODE[hash(tile)]
+                    copy = counts[slot]
+                    counts[slot] = copy + 1
+                    value ^= TILE_KEYS[slot * MAX_COPIES + copy]
+        zobrist.value = value
+        return zobrist
+
+    def copy(self) -> "ZobristHash":
+        zobrist = ZobristHash.__new__(ZobristHash)
+        zobrist.value = self.value
+        zobrist.counts = self.counts.copy()
+        return zobrist
+
+    def add(self, zone: int, p_id: int, tile: Tile) -> None:
+        slot = (zone * NUM_PLAYERS + p_id) * NUM_CODES + HASH_TO_CODE[hash(tile)]
+        copy = self.counts[slot]
+        self.counts[slot] = copy + 1
+        self.value ^= TILE_KEYS[slot * MAX_COPIES + copy]
+
+    def remove(self, zone: int, p_id: int, tile: Tile) -> None:
+        slot = (zone * NUM_PLAYERS + p_id) * NUM_CODES + HASH_TO_CODE[hash(tile)]
+        copy = self.counts[slot] - 1
+        self.counts[slot] = copy
+        self.value ^= TILE_KEYS[slot * MAX_COPIES + copy]
+
+    def move(self, zone: int, p_id: int, to_zone: int, to_p_id: int, tile: Tile) -> None:
+        # remove() then add(), inlined as this runs for every tile that moves
+        code = HASH_TO_CODE[hash(tile)]
+        counts = self.counts
+        slot = (zone * NUM_PLAYERS + p_id) * NUM_CODES + code
+        copy = counts[slot] - 1
+        counts[slot] = copy
+        h = TILE_KEYS[slot * MAX_COPIES + copy]
+        slot = (to_zone * NUM_PLAYERS + to_p_id) * NUM_CODES + code
+        copy = counts[slot]
+        counts[slot] = copy + 1
+        self.value ^= h ^ TILE_KEYS[slot * MAX_COPIES + copy]
+
+    def key(self, game_state: GameStateDict) -> int:
+        '''Hash of the whole state, the game_state the tiles were tracked for'''
+        return self.value ^ flags_hash(game_state)
+
+
+def hash_state(game_state: GameStateDict) -> int:
+    '''Hash of a state computed from scratch, equal to MahjongGame.hash_key for the same state'''
+    return ZobristHash.from_state(game_state).key(game_state)
+
+
+V = TypeVar("V")
+
+
+class TableStatsDict(TypedDict):
+    size: int
+    used: int  # occupied slots
+    probes: int
+    hits: int
+    hit_rate: float
+    stores: int
+    replacements: int  # stores that evicted the entry of another state
+    rejections: int  # stores dropped to keep a deeper entry of the current search
+
+
+class TranspositionTable(Generic[V]):
+    '''
+    Fixed number of slots (a power of two) indexed by the low bits of the key, the full key is kept to tell states
+    apart. A store only evicts another state's entry if that entry is from an earlier search (see new_search) or
+    was stored with no more depth, so expensive results survive cheap ones.
+    '''
+
+    def __init__(self, size: int = 1 << 16) -> None:
+        if size < 1 or size & (size - 1):
+            raise ValueError("size must be a power of two")
+        self.size = size
+        self._mask = size - 1
+        self._keys: list[int | None] = [None] * size
+        self._values: list[V | None] = [None] * size
+        self._depths = [0] * size
+        self._ages = [0] * size
+        self.age = 0
+        self.probes = self.hits = self.stores = self.replacements = self.rejections = 0
+
+    def get(self, key: int) -> V | None:
+        '''The value stored for key, or None'''
+        self.probes += 1
+        i = key & self._mask
+        if self._keys[i] != key:
+            return None
+        self.hits += 1
+        return self._values[i]
+
+    def put(self, key: int, value: V, depth: int = 0) -> bool:
+        '''Stores value for key, depth being how much work it took, returns whether it was stored'''
+        i = key & self._mask
+        stored = self._keys[i]
+        if stored is not None and stored != key:
+            if self._ages[i] == self.age and self._depths[i] > depth:
+                self.rejections += 1
+                return False
+            self.replacements += 1
+        self._keys[i] = key
+        self._values[i] = value
+        self._depths[i] = depth
+        self._ages[i] = self.age
+        self.stores += 1
+        return True
+
+    def new_search(self) -> None:
+        '''Marks the entries stored so far as old, any store may replace them'''
+        self.age += 1
+
+    def clear(self) -> None:
+        self._keys = [None] * self.size
+        self._values = [None] * self.size
+        self.probes = self.hits = self.stores = self.replacements = self.rejections = 0
+
+    def __len__(self) -> int:
+        return self.size - self._keys.count(None)
+
+    def stats(self) -> TableStatsDict:
+        return {
+            "size": self.size,
+            "used": len(self),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "rejections": self.rejections
+        }
@@ -0,0 +1,13 @@
+from pathlib import Path
+from typing import Iterator
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def table_cache(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    '''Keeps the lookup tables the tests build out of the user's cache directory'''
+    path = tmp_path_factory.mktemp("tables")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("HKMAHJONG_TABLES", str(path))
+        yield path
+
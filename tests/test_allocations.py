@@ -0,0 +1,180 @@
+import gc
+import random
+import sys
+import tracemalloc
+from collections import Counter
+from typing import Callable, Iterator
+import pytest
+from game.fuzz import CaseDict, random_case
+from game.mahjong import MahjongGame
+from game.player import RandomAIPlayer
+from game.utils import _check_meld, check_chow, check_win
+
+Thunk = Callable[[], object]
+
+
+Budget = dict[str, int | None]
+
+# Budgets in bytes, and blocks for "blocks", by CPython version, measured with some headroom; other versions allocate
+# differently and are skipped until budgets are measured for them. The workloads are the same every run (fixed hands
+# and seeds), only their allocations are measured and never their time. A change that needs more should say why in
+# its commit and raise the budget to the new numbers from the failure report. None is not checked: steps leave their
+# moves in the game, so they keep what they allocate.
+CALIBRATED: dict[tuple[int, int], dict[str, Budget]] = {
+    (3, 11): {
+        "check_win": {"peak": 4_500, "mean": 1_600, "blocks": 8, "retained": 256},
+        "_check_meld": {"peak": 2_000, "mean": 800, "blocks": 4, "retained": 256},
+        "check_chow": {"peak": 1_700, "mean": 500, "blocks": 4, "retained": 256},
+        "step": {"peak": 10_000, "mean": 3_000, "blocks": 4, "retained": None},
+        "game": {"peak": 48_000, "mean": 40_000, "blocks": 160, "retained": 1_024},
+    },
+}
+BUDGETS = CALIBRATED.get(sys.version_info[:2])
+NUM_CASES = 400
+NUM_GAMES = 4
+
+
+def corpus() -> list[CaseDict]:
+    '''Random hands of the fuzzer's styles (complete, flush, honors, ...), the same every run'''
+    return [random_case(random.Random(seed)) for seed in range(NUM_CASES)]
+
+
+def check_win_calls() -> Iterator[Thunk]:
+    for case in corpus():
+        yield lambda case=case: check_win(case["player"], case["tile"], case["self_pick"])
+
+
+def check_meld_calls() -> Iterator[Thunk]:
+    for case in corpus():
+        counts = Counter(case["player"]["hand"])  # _check_meld puts back what it takes out
+        yield lambda counts=counts: _check_meld(counts)
+
+
+def check_chow_calls() -> Iterator[Thunk]:
+    for case in corpus():
+        yield lambda case=case: check_chow(case["player"], case["tile"], False)
+
+
+def new_game(seed: int) -> MahjongGame:
+    game = MahjongGame(seed, verbose=False)
+    game.set_players([RandomAIPlayer(i, seed) for i in range(4)])
+    return game
+
+
+def step_calls() -> Iterator[Thunk]:
+    for seed in range(NUM_GAMES):
+        game = new_game(seed)
+        while not game.game_state["done"]:
+            yield game.step
+
+
+def play(seed: int) -> MahjongGame:
+    game = new_game(seed)
+    while not game.game_state["done"]:
+        game.step()
+    return game
+
+
+def game_calls() -> Iterator[Thunk]:
+    for seed in range(NUM_GAMES):
+        yield lambda seed=seed: play(seed)
+
+
+WORKLOADS: dict[str, Callable[[], Iterator[Thunk]]] = {
+    "check_win": check_win_calls,
+    "_check_meld": check_meld_calls,
+    "check_chow": check_chow_calls,
+    "step": step_calls,
+    "game": game_calls,
+}
+
+
+def measure(calls: Iterator[Thunk]) -> dict[str, int]:
+    '''
+    Bytes and blocks allocated by the calls, only while each runs, so building the calls does not count: peak is the
+    most bytes allocated at once by one call, mean the mean of those peaks, blocks the mean number of blocks a call
+    leaves allocated, its result included, and retained the bytes left after every call, with their results dropped.
+    CPython only counts the blocks alive, so blocks freed within a call are not counted, peak covers those.
+    '''
+    peak = total = blocks = num_calls = 0
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        for call in calls:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            before = sys.getallocatedblocks()
+            result = call()
+            blocks += sys.getallocatedblocks() - before
+            size = tracemalloc.get_traced_memory()[1] - current
+            peak = max(peak, size)
+            total += size
+            num_calls += 1
+            del call, result
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    num_calls = max(num_calls, 1)
+    return {"peak": peak, "mean": total // num_calls, "blocks": blocks // num_calls, "retained": retained}
+
+
+def top_sites(calls: Iterator[Thunk], limit: int = 10) -> list[str]:
+    '''
+    Where the memory kept by the calls and their results was allocated, biggest first. Each call is made as it is
+    yielded, the calls of a workload may depend on the ones before (steps of one game)
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [call() for call in calls]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del results
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [str(stat) for stat in stats[:limit]]
+
+
+def report(name: str, measured: dict[str, int], budget: Budget, sites: list[str]) -> str:
+    lines = [f"allocation budget of {name} exceeded (- budget, + measured)"]
+    for metric, limit in budget.items():
+        if limit is not None and measured[metric] > limit:
+            unit = "blocks" if metric == "blocks" else "B"
+            lines += [f"- {metric}: {limit:,} {unit}", f"+ {metric}: {measured[metric]:,} {unit}"]
+    lines += ["top allocation sites:"] + [f"  {site}" for site in sites]
+    return "\n".join(lines)
+
+
+def check_budget(name: str, budget: Budget) -> str | None:
+    '''The failure report of the workload if it allocates more than its budget, else None'''
+    for call in WORKLOADS[name]():  # warm up lru_caches, interned strings and free lists
+        call()
+    measured = measure(WORKLOADS[name]())
+    over = [
+        metric for metric, limit in budget.items()
+        if limit is not None and measured[metric] > limit
+    ]
+    return report(name, measured, budget, top_sites(WORKLOADS[name]())) if over else None
+
+
+@pytest.mark.parametrize("name", list(WORKLOADS))
+def test_allocation_budget(name: str) -> None:
+    if BUDGETS is None:
+        pytest.skip(f"no allocation budgets measured for Python {sys.version_info[0]}.{sys.version_info[1]}")
+    failure = check_budget(name, BUDGETS[name])
+    assert failure is None, failure
+
+
+@pytest.mark.parametrize("name", list(WORKLOADS))
+def test_budget_report(name: str) -> None:
+    failure = check_budget(name, {"peak": 1, "mean": 1, "retained": None})
+    assert failure is not None
+    lines = failure.splitlines()
+    assert lines[0] == f"allocation budget of {name} exceeded (- budget, + measured)"
+    assert lines[1] == "- peak: 1 B" and lines[2].startswith("+ peak: ")
+    assert lines[3] == "- mean: 1 B" and lines[4].startswith("+ mean: ")
+    assert lines[5] == "top allocation sites:" and len(lines) > 6
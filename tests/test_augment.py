@@ -0,0 +1,86 @@
+import numpy as np
+from game.augment import SUIT_PERMUTATIONS, augment_batch, permute_actions, permute_masks, permute_observations
+from game.augment import permute_state, tile_permutation
+from game.constants import Action, ID_TO_TILE, NUM_ACTIONS, NUM_OBSERVATIONS
+from game.mahjong import MahjongGame
+from game.player import Player
+from game.tile import Tile
+from game.utils import GameStateDict, copy_game_state, get_observation, get_action_mask, get_options_mask
+from game.utils import meld_to_action, decode_meld_action, decode_discard_action
+
+
+class ScriptedPlayer(Player):
+    '''Records every decision as (seat, obs, mask, action), choosing actions at random or from a script'''
+
+    def __init__(self, id: int, log: list, rng: np.random.Generator | None = None, script: list | None = None) -> None:
+        super().__init__(id)
+        self.log = log
+        self.rng = rng
+        self.script = script
+
+    def choose(self, state: GameStateDict, mask: list[int]) -> int:
+        if self.script is not None:
+            action = self.script[len(self.log)]
+        else:
+            assert self.rng is not None
+            action = int(self.rng.choice(np.flatnonzero(mask)))
+        self.log.append((self.id, get_observation(state, self.id), mask, action))
+        return action
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        return decode_meld_action(self.choose(state, get_options_mask(options)), options)
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        action = self.choose(state, get_action_mask(state, self.id, None))
+        return decode_discard_action(action, state["players"][self.id]["hand"])
+
+
+def play(game: MahjongGame) -> None:
+    while not game.game_state["done"]:
+        game.step()
+
+
+def test_tile_permutation() -> None:
+    assert list(tile_permutation((0, 1, 2))) == list(range(34))
+    tiles = tile_permutation((2, 0, 1))
+    assert tiles[0] == 18 and tiles[9] == 0 and tiles[26] == 17
+    assert list(tiles[27:]) == list(range(27, 34))
+    chow = meld_to_action("chow", [ID_TO_TILE[i] for i in (3, 4, 5)])
+    assert permute_actions(chow, (2, 0, 1)) == meld_to_action("chow", [ID_TO_TILE[i] for i in (21, 22, 23)])
+    for action in (Action.WIN, Action.PASS, Action.PUNG + 27):
+        assert permute_actions(action, (2, 0, 1)) == action
+
+
+def test_permuted_game_replay() -> None:
+    for seed in range(3):
+        log: list = []
+        rng = np.random.default_rng(seed)
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([ScriptedPlayer(i, log, rng) for i in range(4)])
+        start = copy_game_state(game.game_state)
+        play(game)
+        assert log
+
+        obs = np.array([row[1] for row in log])
+        masks = np.array([row[2] for row in log])
+        actions = np.array([row[3] for row in log])
+        aug_obs, aug_masks, aug_actions = augment_batch(obs, masks, actions)
+        assert aug_obs.shape == (6 * len(log), NUM_OBSERVATIONS)
+        assert aug_masks.shape == (6 * len(log), NUM_ACTIONS)
+
+        for k, perm in enumerate(SUIT_PERMUTATIONS):
+            rows = slice(k * len(log), (k + 1) * len(log))
+            replay_log: list = []
+            script = list(aug_actions[rows])
+            replay = MahjongGame.from_state(
+                permute_state(start, perm),
+                [ScriptedPlayer(i, replay_log, script=script) for i in range(4)],
+                verbose=False
+            )
+            play(replay)
+            assert [row[0] for row in replay_log] == [row[0] for row in log]
+            assert (np.array([row[1] for row in replay_log]) == aug_obs[rows]).all()
+            assert (np.array([row[2] for row in replay_log]) == aug_masks[rows]).all()
+            assert (permute_observations(obs, perm) == aug_obs[rows]).all()
+            assert (permute_masks(masks, perm) == aug_masks[rows]).all()
+            assert replay.get_payoffs() == game.get_payoffs()
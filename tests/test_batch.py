@@ -0,0 +1,135 @@
+import numpy as np
+from game.batch import check_win_batch
+from game.constants import ID_TO_TILE, NUM_TILES
+from game.tile import Tile, Suit
+from game.utils import PlayerStateDict, calc_shanten, check_win, score_hand, FLOWER_VALUES, WIND_VALUES
+
+ORPHAN_IDS = [0, 8, 9, 17, 18, 26] + list(range(27, NUM_TILES))
+
+
+def random_case(rng: np.random.Generator) -> tuple[list[int], PlayerStateDict, int, bool]:
+    '''A random (mostly) complete hand as (concealed tile ids, player state, winning tile id, self pick)'''
+    left = [4] * NUM_TILES
+    # keep to one suit and the honors, or to terminals and honors, now and then to reach the flush/orphan hands
+    style = rng.choice(["any", "flush", "terminals", "honors"], p=[0.55, 0.2, 0.15, 0.1])
+    suit = int(rng.integers(3))
+    allowed = [
+        t for t in range(NUM_TILES)
+        if style == "any" or (style == "flush" and (t >= 27 or t // 9 == suit))
+        or (style == "terminals" and t in ORPHAN_IDS) or (style == "honors" and t >= 27)
+    ]
+
+    def take_set() -> list[int] | None:
+        for _ in range(20):
+            start = int(rng.choice(allowed))
+            if rng.random() < 0.5 and start < 27 and start % 9 <= 6 and style in ("any", "flush"):
+                tiles = [start, start + 1, start + 2]
+            else:
+                tiles = [start] * 3
+            if all(left[t] >= tiles.count(t) for t in tiles):
+                for t in tiles:
+                    left[t] -= 1
+                return tiles
+        return None
+
+    melds = []
+    num_melds = int(rng.choice([0, 0, 1, 2, 3, 4]))
+    for _ in range(num_melds):
+        tiles = take_set()
+        if tiles is None:
+            break
+        if tiles[0] == tiles[1] and left[tiles[0]] and rng.random() < 0.3:
+            tiles.append(tiles[0])  # kong
+            left[tiles[0]] -= 1
+        melds.append([ID_TO_TILE[t] for t in tiles])
+
+    if style == "terminals" and not melds and rng.random() < 0.3:
+        hand = ORPHAN_IDS + [int(rng.choice(ORPHAN_IDS))]  # thirteen orphans
+    elif style == "flush" and not melds and rng.random() < 0.3:
+        hand = [9 * suit + i for i in (0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 8, 8)] + [9 * suit + int(rng.integers(9))]
+    else:
+        hand = []
+        for _ in range(4 - len(melds)):
+            tiles = take_set()
+            hand += tiles if tiles is not None else [int(rng.choice(allowed))] * 3
+        hand += [int(rng.choice(allowed))] * 2
+    if rng.random() < 0.3:
+        # most of these are near misses
+        hand[int(rng.integers(len(hand)))] = int(rng.integers(NUM_TILES))
+    # at most 4 copies of a tile
+    counts = np.minimum(np.bincount(hand, minlength=NUM_TILES), 4)
+    hand = [t for t in range(NUM_TILES) for _ in range(counts[t])]
+    while len(hand) < 3 * (4 - len(melds)) + 2:
+        t = int(rng.integers(NUM_TILES))
+        if hand.count(t) < 4:
+            hand.append(t)
+
+    flowers = rng.choice(len(FLOWER_VALUES), int(rng.choice([0, 0, 1, 2, 4])), replace=False)
+    melds += [[Tile(Suit.FLOWER, FLOWER_VALUES[i])] for i in flowers]
+    player_state: PlayerStateDict = {
+        "id": 0,
+        "seat_wind": WIND_VALUES[int(rng.integers(4))].value,
+        "hand": [],
+        "melds": melds,
+        "discards": []
+    }
+    return hand, player_state, hand[int(rng.integers(len(hand)))], bool(rng.random() < 0.5)
+
+
+def test_check_win_batch_complete() -> None:
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        size = rng.choice([2, 5, 8, 11, 14])
+        # tiles from a narrow range, so that complete hands are common
+        low = rng.integers(0, 30)
+        pool = np.repeat(np.arange(low, min(low + rng.integers(4, 12), 34)), 4)
+        if len(pool) <= size:
+            continue
+        tiles = rng.choice(pool, size, replace=False)
+        counts = np.bincount(tiles, minlength=34)
+        expected = calc_shanten(counts.tolist(), (14 - size) // 3) == -1
+        assert check_win_batch(counts[None])[0] == expected
+        # the same hand with its last tile passed separately
+        counts[tiles[-1]] -= 1
+        assert check_win_batch(counts[None], tiles=tiles[-1:])[0] == expected
+
+
+def test_check_win_batch_matches_check_win() -> None:
+    rng = np.random.default_rng(1)
+    cases = [random_case(rng) for _ in range(3000)]
+    counts = np.zeros((len(cases), NUM_TILES), dtype=np.int8)
+    for row, (hand, _, tile, _) in enumerate(cases):
+        counts[row] = np.bincount(hand, minlength=NUM_TILES)
+        counts[row, tile] -= 1
+    tiles = np.array([tile for _, _, tile, _ in cases])
+    self_pick = np.array([self_pick for _, _, _, self_pick in cases])
+    states = [player_state for _, player_state, _, _ in cases]
+    wins, faan = check_win_batch(counts, states, tiles, self_pick, "south", faan=True)
+
+    num_wins = 0
+    for row, (hand, player_state, tile, pick) in enumerate(cases):
+        tiles_in_hand = [ID_TO_TILE[t] for t in hand]
+        if not pick:
+            tiles_in_hand.remove(ID_TO_TILE[tile])
+        melds, hand_state = check_win({**player_state, "hand": tiles_in_hand}, ID_TO_TILE[tile], pick)
+        assert wins[row] == bool(melds), (hand, player_state["melds"], tile, pick)
+        if melds:
+            num_wins += 1
+            hand_state["round_wind"] = "south"
+            assert faan[row] == score_hand(player_state["melds"] + melds, hand_state), (hand, player_state, tile, pick)
+        else:
+            assert faan[row] == 0
+    assert num_wins > len(cases) // 2
+
+
+def test_check_win_batch_kongs_in_hand() -> None:
+    # the tables never split off kongs, hands whose size needs them fall back to check_win
+    hand = [0, 0, 1, 2, 2, 27, 27, 27, 27, 30, 30, 30, 30, 9, 9]
+    counts = np.bincount(hand, minlength=NUM_TILES)[None]
+    tiles = np.array([1])
+    player_state: PlayerStateDict = {"id": 0, "seat_wind": "east", "hand": [], "melds": [], "discards": []}
+    wins, faan = check_win_batch(counts, player_state, tiles, faan=True)
+    assert wins[0] and faan[0] > 0
+    # three kongs and a pair are only three sets
+    counts = np.bincount([0] * 4 + [4] * 4 + [8] * 4 + [27] * 2, minlength=NUM_TILES)[None]
+    assert not check_win_batch(counts, player_state)[0]
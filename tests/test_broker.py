@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+import pytest
+from game.broker import InferenceBroker, BrokerPlayer
+from game.constants import NUM_ACTIONS, NUM_OBSERVATIONS, Action
+from game.mahjong import MahjongGame
+
+
+def first_legal(obs_batch: np.ndarray, mask_batch: np.ndarray) -> np.ndarray:
+    return np.argmax(mask_batch, axis=1)
+
+
+def test_broker_batches_requests() -> None:
+    batch_sizes = []
+
+    def policy(obs_batch: np.ndarray, mask_batch: np.ndarray) -> np.ndarray:
+        batch_sizes.append(len(obs_batch))
+        return first_legal(obs_batch, mask_batch)
+
+    results: dict[int, int] = {}
+    with InferenceBroker(policy, max_batch_size=4, max_wait=0.05) as broker:
+        def worker(i: int) -> None:
+            mask = [0] * NUM_ACTIONS
+            mask[i] = 1
+            results[i] = broker.request([0] * NUM_OBSERVATIONS, mask)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = broker.stats()
+    assert results == {i: i for i in range(8)}
+    assert sum(batch_sizes) == 8
+    assert max(batch_sizes) <= 4
+    assert stats["requests"] == 8
+    assert stats["batches"] == len(batch_sizes)
+    assert 0 < stats["fill_rate"] <= 1
+
+
+def test_broker_flushes_on_timeout() -> None:
+    with InferenceBroker(first_legal, max_batch_size=64, max_wait=0.001) as broker:
+        mask = [0] * NUM_ACTIONS
+        mask[Action.PASS] = 1
+        assert broker.request([0] * NUM_OBSERVATIONS, mask) == Action.PASS
+        stats = broker.stats()
+    assert stats["timeout_batches"] == 1
+    assert stats["full_batches"] == 0
+
+
+def test_broker_fails_short_batches() -> None:
+    def short(obs_batch: np.ndarray, mask_batch: np.ndarray) -> np.ndarray:
+        return first_legal(obs_batch, mask_batch)[:-1]
+
+    with InferenceBroker(short, max_batch_size=4, max_wait=0.05) as broker:
+        mask = [0] * NUM_ACTIONS
+        mask[Action.PASS] = 1
+        futures = [broker.submit([0] * NUM_OBSERVATIONS, mask) for _ in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+
+
+def test_broker_player_games() -> None:
+    rng = np.random.default_rng(0)
+
+    def random_legal(obs_batch: np.ndarray, mask_batch: np.ndarray) -> list[int]:
+        return [int(rng.choice(np.flatnonzero(mask))) for mask in mask_batch]
+
+    games = [MahjongGame(seed) for seed in range(4)]
+    with InferenceBroker(random_legal, max_batch_size=4, max_wait=0.01) as broker:
+        for game in games:
+            game.set_players([BrokerPlayer(i, broker) for i in range(4)])
+
+        def play(game: MahjongGame) -> None:
+            while not game.game_state["done"]:
+                game.step()
+        threads = [threading.Thread(target=play, args=(game,)) for game in games]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = broker.stats()
+    assert all(game.game_state["done"] for game in games)
+    assert stats["requests"] > 0
+    assert stats["mean_batch_size"] > 1
@@ -0,0 +1,63 @@
+import pytest
+from game.dataset import ShardWriter, read_shards, self_play_samples
+from game.league import AGENTS
+from game.mahjong import MahjongGame
+from game.player import Player, RandomAIPlayer
+
+heuristic = AGENTS["heuristic"]
+
+
+def make_players(seed: int) -> list[Player]:
+    return [RandomAIPlayer(0, seed)] + [heuristic(i, seed) for i in range(1, 4)]
+
+
+def test_self_play_samples() -> None:
+    won = 0
+    for seed in range(6):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players(make_players(seed))
+        while not game.game_state["done"]:
+            game.step()
+        payoffs = game.get_payoffs()
+        won += any(payoffs)
+
+        samples = list(self_play_samples(make_players, [seed]))
+        assert {seat for _, _, _, seat, _ in samples} == {0, 1, 2, 3}
+        for obs, mask, action, seat, reward in samples:
+            assert mask[action] == 1
+            assert reward == payoffs[seat]
+    assert won
+
+
+def test_shards_round_trip(tmp_path) -> None:
+    samples = list(self_play_samples(make_players, range(4)))
+    with ShardWriter(tmp_path, shard_size=50) as writer:
+        writer.write(iter(samples))
+    assert writer.num_samples == len(samples)
+    assert len(writer.paths) == -(-len(samples) // 50)
+    assert sorted(tmp_path.glob("*.npz")) == writer.paths
+
+    batches = list(read_shards(tmp_path, batch_size=32, buffer_size=64, seed=0))
+    assert all(len(batch["action"]) == 32 for batch in batches[:-1])
+    read = [
+        (tuple(obs), tuple(mask), action, seat, reward)
+        for batch in batches
+        for obs, mask, action, seat, reward in zip(
+            batch["obs"].tolist(), batch["mask"].astype(int).tolist(), batch["action"].tolist(),
+            batch["seat"].tolist(), batch["reward"].tolist()
+        )
+    ]
+    written = [(tuple(obs), tuple(mask), action, seat, reward) for obs, mask, action, seat, reward in samples]
+    assert sorted(read) == sorted(written)
+    # shuffled across shards
+    assert [row[2] for row in read] != [row[2] for row in written]
+
+    dropped = list(read_shards(writer.paths, batch_size=32, buffer_size=64, seed=0, drop_last=True))
+    assert sum(len(batch["action"]) for batch in dropped) == len(samples) // 32 * 32
+
+
+def test_shard_writer_closed(tmp_path) -> None:
+    writer = ShardWriter(tmp_path, shard_size=4)
+    assert writer.close() == []
+    with pytest.raises(ValueError):
+        writer.add([0], [0], 0, 0, 0)
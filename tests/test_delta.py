@@ -0,0 +1,62 @@
+from game.constants import Delta
+from game.delta import ALL_SEATS, DeltaApplier, DeltaRecorder, view_of
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer, Player, RandomAIPlayer
+
+VIEWERS = [ALL_SEATS, frozenset(), frozenset({2})]
+
+
+def players(seed: int) -> list[Player]:
+    if seed % 2:
+        return [RandomAIPlayer(i, seed) for i in range(4)]
+    return [HeuristicAIPlayer(i, budget=float("inf")) for i in range(4)]
+
+
+def test_mirror() -> None:
+    kinds = set()
+    for seed in range(12):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players(players(seed))
+        recorder = DeltaRecorder(game, keyframe_interval=8)
+        appliers = [DeltaApplier() for _ in VIEWERS]
+        for applier, reveal in zip(appliers, VIEWERS):
+            assert applier.apply(recorder.keyframe(reveal))
+        late = DeltaApplier()
+        for _ in range(2):  # a game, then another deal on the same game
+            while not game.game_state["done"]:
+                game.step()
+                deltas = recorder.flush()
+                kinds |= {delta[0] for delta in deltas}
+                for applier, reveal in zip(appliers, VIEWERS):
+                    assert applier.apply(recorder.message(deltas, reveal))
+                    assert applier.view == view_of(game.game_state, reveal)
+                assert late.apply(recorder.message(deltas)) == late.synced
+                if recorder.keyframe_due:
+                    late.apply(recorder.keyframe())
+                    assert late.view == view_of(game.game_state)
+            game.reset(seed + 100)
+            deltas = recorder.flush()
+            kinds |= {delta[0] for delta in deltas}
+            for applier, reveal in zip(appliers, VIEWERS):
+                assert applier.apply(recorder.message(deltas, reveal))
+                assert applier.view == view_of(game.game_state, reveal)
+    assert kinds >= {Delta.RESET, Delta.DRAW, Delta.FLOWER, Delta.DISCARD, Delta.CLAIM, Delta.MELD, Delta.END}
+
+
+def test_hidden_and_gaps() -> None:
+    game = MahjongGame(3, verbose=False)
+    game.set_players(players(3))
+    recorder = DeltaRecorder(game)
+    applier = DeltaApplier()
+    game.step()
+    assert not applier.apply(recorder.message(recorder.flush(), frozenset()))  # no keyframe yet
+    applier.apply(recorder.keyframe(frozenset()))
+    assert applier.view is not None and all(tile is None for tile in applier.view["players"][0]["hand"])
+    recorder.flush()  # missed by the applier
+    game.step()
+    assert not applier.apply(recorder.message(recorder.flush(), frozenset())) and not applier.synced
+    assert applier.apply(recorder.keyframe(frozenset())) and applier.synced
+
+    recorder.detach()
+    game.step()
+    assert game.events is None
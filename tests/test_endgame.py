@@ -0,0 +1,54 @@
+from game.constants import Action, TILE_TO_CODE
+from game.endgame import EndgameSolver
+from game.scenario import ScenarioDict, build_state, parse_tiles
+from game.utils import copy_game_state
+
+WAITING_ON_EAST = "123b 456b 789b RRR E"
+# the other seats hold one tile each behind four exposed pungs, so the whole tree is a few thousand nodes
+OPEN_HANDS: ScenarioDict = {
+    "hands": [WAITING_ON_EAST, "9d", "9c", "1d"],
+    "melds": [[], ["111c", "222c", "333c", "444c"], ["555c", "666c", "777c", "888c"], ["222d", "333d", "444d", "555d"]]
+}
+UNLIMITED = float("inf")  # the tests bound the search by nodes, never by time
+
+
+def test_last_draw() -> None:
+    state = build_state({"hands": [WAITING_ON_EAST, None, None, None], "wall": "E", "wall_size": 1}, seed=0)
+    result = EndgameSolver().solve(state)
+    assert result["solved"] and result["values"] is not None
+    values = result["values"]
+    assert values[0] > 0 and values[1] == values[2] == values[3] == -values[0] / 3
+    assert result["best_actions"] == {TILE_TO_CODE[parse_tiles("E")[0]]: Action.WIN}
+
+
+def test_chance() -> None:
+    state = build_state({**OPEN_HANDS, "wall": "E S", "wall_size": 2}, seed=0)
+    solver = EndgameSolver(max_nodes=100_000, max_time=UNLIMITED)
+    result = solver.solve(state)
+    assert result["solved"] and result["values"] is not None
+    assert abs(sum(result["values"])) < 1e-9
+    assert set(result["best_actions"]) == {TILE_TO_CODE[tile] for tile in parse_tiles("E S")}
+    # each order of the wall is equally likely, solve both with the first tile already drawn
+    branches = []
+    for tile in state["wall"][::-1]:
+        branch = copy_game_state(state)
+        branch["wall"].remove(tile)
+        branch["players"][0]["hand"].append(tile)
+        branch["discard"] = True
+        values = solver.solve(branch)["values"]
+        assert values is not None
+        branches.append(values)
+    for seat in range(4):
+        assert abs(result["values"][seat] - (branches[0][seat] + branches[1][seat]) / 2) < 1e-9
+
+
+def test_budget_and_memo() -> None:
+    state = build_state({**OPEN_HANDS, "wall": "E S N", "wall_size": 3}, seed=0)
+    result = EndgameSolver(max_nodes=10, max_time=UNLIMITED).solve(state)
+    assert not result["solved"] and result["values"] is None and result["nodes"] > 10
+    solver = EndgameSolver(max_nodes=100_000, max_time=UNLIMITED)
+    first = solver.solve(state)
+    second = solver.solve(state)
+    assert first["solved"] and first["values"] == second["values"]
+    assert second["nodes"] < first["nodes"]  # the children of the root are in the table
+    assert first["nodes_per_second"] > 0
@@ -0,0 +1,39 @@
+import pytest
+from game.constants import TILE_TO_ID
+from game.equity import estimate_equity, simulate_equity
+from game.mahjong import MahjongGame
+from game.player import RandomAIPlayer
+
+
+@pytest.fixture
+def game() -> MahjongGame:
+    game = MahjongGame(5, verbose=False)
+    game.set_players([RandomAIPlayer(i, seed=i) for i in range(4)])
+    for _ in range(8):
+        game.step()
+    game.deal_tile_step(game.game_state["current_player"])
+    return game
+
+
+def test_estimate_equity(game: MahjongGame) -> None:
+    state = game.game_state
+    seat = state["current_player"]
+    equity = estimate_equity(state, seat, 64, seed=0)
+    assert set(equity) == {TILE_TO_ID[tile] for tile in state["players"][seat]["hand"]}
+    for entry in equity.values():
+        assert 0 <= entry["win"] + entry["deal_in"] <= 1
+        assert entry["expected_faan"] >= entry["win"]  # every win is worth at least a faan
+    assert estimate_equity(state, seat, 64, seed=0) == equity
+    with pytest.raises(ValueError):
+        estimate_equity(state, (seat + 1) % 4)
+
+
+@pytest.mark.parametrize("opponents", ["random", "heuristic"])
+def test_equity_matches_engine(game: MahjongGame, opponents: str) -> None:
+    state = game.game_state
+    seat = state["current_player"]
+    discard = TILE_TO_ID[state["players"][seat]["hand"][0]]
+    fast = estimate_equity(state, seat, 1000, opponents, seed=0)[discard]
+    slow = simulate_equity(state, seat, discard, 100, opponents, seed=0)
+    assert abs(fast["win"] - slow["win"]) < 0.1
+    assert abs(fast["deal_in"] - slow["deal_in"]) < 0.1
@@ -0,0 +1,42 @@
+import pytest
+from game.evaluate import evaluate_duplicate, seat_rotations, play_game, play_games
+from game.league import AGENTS
+from game.player import RandomAIPlayer
+
+heuristic = AGENTS["heuristic"]
+
+
+def test_seat_rotations() -> None:
+    assert seat_rotations(["a", "b", "b", "b"]) == [
+        ("a", "b", "b", "b"), ("b", "a", "b", "b"), ("b", "b", "a", "b"), ("b", "b", "b", "a")
+    ]
+    assert seat_rotations(["a", "b", "a", "b"]) == [("a", "b", "a", "b"), ("b", "a", "b", "a")]
+    with pytest.raises(ValueError):
+        seat_rotations(["a", "b"])
+
+
+def test_identical_agents() -> None:
+    # the same agent under two names plays the same games in every rotation, so the difference is exactly 0
+    result = evaluate_duplicate({"a": heuristic, "b": heuristic}, ["a", "b", "b", "b"], range(5))
+    assert result["games"] == 20
+    assert result["differences"]["a - b"] == {"mean": 0.0, "ci": 0.0, "n": 5}
+    assert play_game({"a": heuristic}, ["a"] * 4, 0) == play_game({"a": heuristic}, ["a"] * 4, 0)
+
+
+def test_evaluate_duplicate() -> None:
+    agents = {"heuristic": heuristic, "random": RandomAIPlayer}
+    result = evaluate_duplicate(agents, ["heuristic", "random", "heuristic", "random"], range(12))
+    difference = result["differences"]["heuristic - random"]
+    assert difference["mean"] - difference["ci"] > 0
+    # payoffs are zero-sum, and both agents sit in two seats of every game
+    assert result["agents"]["heuristic"]["mean"] == pytest.approx(-result["agents"]["random"]["mean"])
+    # the same walls in worker processes
+    assert evaluate_duplicate(agents, ["heuristic", "random", "heuristic", "random"], range(12), workers=2) == result
+
+
+def test_play_games_threaded() -> None:
+    agents = {"heuristic": heuristic, "random": RandomAIPlayer}
+    seating = ["heuristic", "random", "heuristic", "random"]
+    serial = play_games(agents, seating, range(8))
+    assert serial == [play_game(agents, seating, seed) for seed in range(8)]
+    assert play_games(agents, seating, range(8), threads=4) == serial
@@ -0,0 +1,58 @@
+import random
+import pytest
+from game import fuzz
+from game.fuzz import CaseDict, check_invariants, random_case, shrink
+from game.mahjong import MahjongGame
+from game.player import RandomAIPlayer
+from game.tile import Suit
+
+
+def test_candidates_match() -> None:
+    result = fuzz.fuzz(3000, num_games=4, seed=1)
+    assert result["mismatches"] == {"check_win_batch": 0} and not result["reproducers"]
+    assert result["steps"] > 0 and not result["violations"]
+    with pytest.raises(ValueError):
+        fuzz.fuzz(10, candidates=["unknown"])
+
+
+def test_cases() -> None:
+    rng = random.Random(0)
+    cases = [random_case(rng) for _ in range(2000)]
+    assert random_case(random.Random(0)) == cases[0]
+    assert sum(fuzz.REFERENCES["check_win"](case) != (False, 0) for case in cases) > 400
+    upgrades = [case for case in cases if case["self_pick"] and fuzz.REFERENCES["check_kong"](case)]
+    assert upgrades and sum(fuzz.REFERENCES["check_kong"](case) != () for case in cases) > len(upgrades)
+    assert any(meld[0].suit == Suit.FLOWER for case in cases for meld in case["player"]["melds"])
+
+
+def test_shrink(monkeypatch: pytest.MonkeyPatch) -> None:
+    def broken(cases: list[CaseDict]) -> list[object]:
+        # forgets the faan of the set of flowers
+        results = []
+        for case in cases:
+            win, faan = fuzz._win(case)
+            flowers = sum(meld[0].suit == Suit.FLOWER for meld in case["player"]["melds"])
+            results.append((win, faan - 2 * (win and flowers >= 4)))
+        return results
+
+    monkeypatch.setitem(fuzz.CANDIDATES, "broken", ("check_win", broken))
+    result = fuzz.fuzz(2000, candidates=["broken"], max_reports=2)
+    assert result["mismatches"]["broken"] > 0 and len(result["reproducers"]) in (1, 2)
+    case = result["reproducers"][0]["case"]
+    # nothing is left that does not matter: no discards, no other flowers, the winds of the first seat
+    assert not case["player"]["discards"] and not case["self_pick"]
+    assert sum(meld[0].suit == Suit.FLOWER for meld in case["player"]["melds"]) == 4
+    assert case["player"]["seat_wind"] == case["round_wind"] == "east"
+    assert shrink(case, "broken") == case
+
+
+def test_invariants() -> None:
+    game = MahjongGame(0, verbose=False)
+    game.set_players([RandomAIPlayer(i, 0) for i in range(4)])
+    for _ in range(10):
+        game.step()
+    assert check_invariants(game) == []
+    game.game_state["wall"].pop()
+    game.game_state["visible"][0] += 1
+    problems = check_invariants(game)
+    assert len(problems) == 2 and "copies" in problems[0]
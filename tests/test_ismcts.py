@@ -0,0 +1,25 @@
+from game.ismcts import ISMCTSPlayer, run_search
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+
+
+def test_run_search() -> None:
+    game = MahjongGame(0, verbose=False)
+    game.set_players([HeuristicAIPlayer(i) for i in range(4)])
+    game.game_state["phase"] = "discard"
+    stats, iterations = run_search(game.game_state, 0, 0.05, seed=0)
+    assert iterations > 0
+    assert sum(visits for visits, _ in stats.values()) == iterations
+    # the search must not touch the real game
+    assert len(game.game_state["players"][0]["hand"]) == 14
+
+
+def test_ismcts_player_game() -> None:
+    player = ISMCTSPlayer(0, budget=0.005, seed=0)
+    game = MahjongGame(3, verbose=False)
+    game.set_players([player] + [HeuristicAIPlayer(i) for i in range(1, 4)])
+    while not game.game_state["done"]:
+        game.step()
+    assert player.searches > 0
+    assert player.iterations >= player.searches
+    assert player.iterations_per_second > 0
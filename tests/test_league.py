@@ -0,0 +1,38 @@
+import pytest
+from game.league import AGENTS, League
+from game.player import Player, RandomAIPlayer
+
+heuristic = AGENTS["heuristic"]
+
+
+def random_player(seat: int, seed: int) -> Player:
+    return RandomAIPlayer(seat, seed)
+
+
+def test_league(tmp_path) -> None:
+    out = tmp_path / "standings.txt"
+    league = League({"heuristic": heuristic, "copy": heuristic, "random": random_player}, max_walls=40)
+    pairings = {(p["a"], p["b"]): p for p in league.run(out=out)}
+
+    # decided early, in favour of the heuristic
+    assert pairings["heuristic", "random"]["result"] == "a"
+    assert pairings["copy", "random"]["result"] == "a"
+    assert pairings["heuristic", "random"]["walls"] < 40
+    # identical agents are never told apart
+    assert pairings["heuristic", "copy"]["result"] == "undecided"
+    assert pairings["heuristic", "copy"]["walls"] == 40
+    assert pairings["heuristic", "copy"]["mean"] == 0.0
+
+    standings = league.standings()
+    assert standings[-1]["agent"] == "random"
+    assert (standings[-1]["wins"], standings[-1]["losses"], standings[-1]["undecided"]) == (0, 2, 0)
+    assert "random" in out.read_text()
+
+
+def test_league_workers() -> None:
+    agents = {"heuristic": heuristic, "random": random_player}
+    pairing = League(agents, max_walls=30).run(workers=2)[0]
+    assert pairing["result"] == "a"
+    assert pairing["walls"] < 30
+    with pytest.raises(ValueError):
+        League({"random": random_player})
@@ -1,6 +1,8 @@
-from game.mahjong import MahjongGame
-from game.player import HumanPlayer, RandomAIPlayer
+from game.mahjong import GamePool, MahjongGame
+from game.player import HumanPlayer, Player, RandomAIPlayer, HeuristicAIPlayer
+from game.scenario import build_game, parse_tiles
 from game.tile import Tile, Suit, Value
+from game.utils import GameStateDict, get_visible_counts
 
 
 def test_init_game() -> None:
@@ -25,7 +27,7 @@ def test_check_heavenly_hand() -> None:
     t2 = Tile(Suit.BAMBOO, Value.TWO)
     t3 = Tile(Suit.BAMBOO, Value.THREE)
     t4 = Tile(Suit.DRAGON, Value.RED)
-    t5 = Tile(Suit.WIND, Value.RED)
+    t5 = Tile(Suit.WIND, Value.WEST)
     game.game_state["players"][0]["hand"] = [t1, t2, t3] * 3 + [t4] * 3 + [t5] * 2
     game.step()
     assert game.game_state["winning_hand_state"] is not None
@@ -39,9 +41,9 @@ def test_check_earthly_hand() -> None:
     t2 = Tile(Suit.BAMBOO, Value.TWO)
     t3 = Tile(Suit.BAMBOO, Value.THREE)
     t4 = Tile(Suit.DRAGON, Value.RED)
-    t5 = Tile(Suit.WIND, Value.RED)
+    t5 = Tile(Suit.WIND, Value.WEST)
     game.game_state["players"][1]["hand"] = [t1, t2, t3] * 3 + [t4] * 3 + [t5]
-    game.game_state["players"][0]["discards"] = [Tile(Suit.WIND, Value.RED)]
+    game.game_state["players"][0]["discards"] = [Tile(Suit.WIND, Value.WEST)]
     game.resolve_other_actions(t5, 0)
     assert game.game_state["winning_hand_state"] is not None
     assert "earthly_hand" in game.game_state["winning_hand_state"]["win_condition"]
@@ -56,3 +58,98 @@ def test_deal_tile() -> None:
     game.deal_tile(0)
     assert tile in game.game_state["players"][0]["hand"]
     assert len(game.game_state["wall"]) == 0
+
+
+def test_copy() -> None:
+    game = MahjongGame(0, verbose=False)
+    game.set_players([RandomAIPlayer(i, 0) for i in range(4)])
+    copy = game.copy()
+    copy.game_state["players"][0]["hand"].pop()
+    copy.game_state["wall"].pop()
+    assert len(game.game_state["players"][0]["hand"]) == 14
+    assert len(game.game_state["wall"]) == len(copy.game_state["wall"]) + 1
+
+
+def test_payoffs() -> None:
+    game = MahjongGame(verbose=False)
+    game.set_players([RandomAIPlayer(i) for i in range(4)])
+    t1 = Tile(Suit.BAMBOO, Value.ONE)
+    t2 = Tile(Suit.BAMBOO, Value.TWO)
+    t3 = Tile(Suit.BAMBOO, Value.THREE)
+    t4 = Tile(Suit.DRAGON, Value.RED)
+    t5 = Tile(Suit.WIND, Value.WEST)
+    game.game_state["first"] = False
+    game.game_state["players"][1]["hand"] = [t1, t2, t3] * 3 + [t4] * 3 + [t5]
+    game.game_state["players"][0]["discards"] = [t5]
+    game.resolve_other_actions(t5, 0)
+    assert game.get_winner() == 1
+    payoffs = game.get_payoffs()
+    assert payoffs[1] > 0
+    assert payoffs[0] == -payoffs[1]
+    assert payoffs[2] == payoffs[3] == 0
+
+
+def test_visible_counts() -> None:
+    game = MahjongGame(3, verbose=False)
+    game.set_players([HeuristicAIPlayer(i) for i in range(4)])
+    while not game.game_state["done"]:
+        game.step()
+        assert game.game_state["visible"] == get_visible_counts(game.game_state)
+    assert game.copy().game_state["visible"] == game.game_state["visible"]
+
+
+class ClaimingPlayer(Player):
+    '''Takes the highest claim offered and records the seats it was asked for'''
+
+    def __init__(self, id: int, queried: list[int]) -> None:
+        super().__init__(id)
+        self.queried = queried
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        self.queried.append(self.id)
+        for meld_type in ("win", "kong", "pung", "chow"):
+            if options[meld_type]:
+                return meld_type, options[meld_type] if meld_type == "win" else [options[meld_type][0]]
+        return "", []
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        return 0
+
+
+def test_claim_tiers() -> None:
+    # seat 1 can chow the 5d, seat 2 can pung it and seat 3 wins on it
+    hands = [None, "46d 12b 789c EEE SS N", "55d 456b 111c WWW N S", "123b 456b 789b RRR 5d"]
+    for winner, (queried, skipped) in {
+        True: ([3], {"win": 0, "kong": 2, "pung": 2, "chow": 1}),
+        False: ([2], {"win": 0, "kong": 0, "pung": 1, "chow": 1})
+    }.items():
+        seats: list[int] = []
+        game = build_game(
+            {"hands": hands if winner else hands[:3] + ["123b 456b 789b RRR G"], "discards": ["5d", "", "", ""]},
+            [ClaimingPlayer(i, seats) for i in range(4)],
+            seed=0
+        )
+        assert game.resolve_other_actions(parse_tiles("5d")[0], 0)
+        assert seats == queried and game.claim_checks_skipped == skipped
+        assert game.get_winner() == (3 if winner else None)
+
+
+def test_reset() -> None:
+    pool = GamePool(1)
+    game = pool.acquire(0, [RandomAIPlayer(i, 0) for i in range(4)])
+    state = game.game_state
+    while not state["done"]:
+        game.step()
+    pool.release(game)
+    assert game.players == []
+    for seed in (1, 2):
+        fresh = MahjongGame(seed, verbose=False)
+        fresh.set_players([RandomAIPlayer(i, seed) for i in range(4)])
+        with pool.game(seed, [RandomAIPlayer(i, seed) for i in range(4)]) as game:
+            assert game.game_state is state and len(pool) == 0  # the same objects, dealt again
+            assert game.game_state == fresh.game_state and game.hash_key == fresh.hash_key
+            while not fresh.game_state["done"]:
+                fresh.step()
+                game.step()
+            assert game.game_state == fresh.game_state
+        assert len(pool) == 1
@@ -1,7 +1,10 @@
+import copy
+import pickle
 import pytest
-from game.player import HumanPlayer
+from game.player import HumanPlayer, HeuristicAIPlayer, RandomAIPlayer
 from game.tile import Tile, Suit, Value
 from game.utils import GameStateDict
+from game.constants import NUM_TILES
 
 
 @pytest.fixture
@@ -23,6 +26,7 @@ def state() -> GameStateDict:
         "done": False,
         "winning_hand_state": None,
         "phase": "discard",
+        "visible": [0] * NUM_TILES,
         "players": {
             0: {
                 "id": 0,
@@ -64,3 +68,43 @@ def test_discard_tile(p1: HumanPlayer, state: GameStateDict) -> None:
     t5 = [Tile(Suit.WIND, Value.WEST)]
     state["players"][p1.id]["hand"] = t2 * 3 + t1 * 3 + t3 * 3 + t4 * 3 + t5 * 2
     assert p1.query_discard(state, sorted_hand=True, idx=4) == 0
+
+
+def test_heuristic_discard(state: GameStateDict) -> None:
+    p1 = HeuristicAIPlayer(1, budget=1.0)
+    t1 = [Tile(Suit.BAMBOO, Value.ONE)]
+    t2 = [Tile(Suit.BAMBOO, Value.TWO)]
+    t3 = [Tile(Suit.BAMBOO, Value.THREE)]
+    t4 = [Tile(Suit.DRAGON, Value.RED)]
+    t5 = [Tile(Suit.WIND, Value.WEST)]
+    t6 = [Tile(Suit.DOT, Value.NINE)]
+    state["players"][p1.id]["hand"] = t1 * 3 + t2 * 3 + t3 * 3 + t4 * 2 + t6 + t5 * 2
+    idx = p1.query_discard(state)
+    assert state["players"][p1.id]["hand"][idx] == t6[0]
+    assert p1.num_decisions == 1
+
+
+def test_heuristic_meld(state: GameStateDict) -> None:
+    p1 = HeuristicAIPlayer(1, budget=1.0)
+    t1 = Tile(Suit.DOT, Value.ONE)
+    t2 = Tile(Suit.DRAGON, Value.RED)
+    t3 = Tile(Suit.CHARACTER, Value.NINE)
+    chow = [Tile(Suit.DOT, Value.TWO), Tile(Suit.DOT, Value.THREE), Tile(Suit.DOT, Value.FOUR)]
+    gap = [Tile(Suit.BAMBOO, Value.FIVE), Tile(Suit.BAMBOO, Value.SEVEN)]
+    state["phase"] = "meld"
+    state["current_player"] = 0
+    state["players"][p1.id]["hand"] = [t1] * 3 + [t3] * 3 + chow + gap + [t2] * 2
+    # pung of a dragon scores a faan
+    state["players"][0]["discards"] = [t2]
+    assert p1.query_meld(state, {"win": [], "kong": [], "pung": [[t2] * 3], "chow": []}) == ("pung", [[t2] * 3])
+    # always declare a win
+    assert p1.query_meld(state, {"win": [[t2] * 2]}) == ("win", [[t2] * 2])
+
+
+def test_random_player_copies() -> None:
+    player = RandomAIPlayer(0, seed=1)
+    player.rng.random()
+    clones = [copy.deepcopy(player), pickle.loads(pickle.dumps(player))]
+    expected = [player.rng.random() for _ in range(5)]
+    for clone in clones:
+        assert [clone.rng.random() for _ in range(5)] == expected
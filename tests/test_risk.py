@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from game.constants import TILE_TO_ID
+from game.mahjong import MahjongGame
+from game.player import FOLD_THREAT, HeuristicAIPlayer, RandomAIPlayer
+from game.risk import RiskTable
+from game.scenario import build_game, build_state, parse_tiles
+
+
+def test_follows_game() -> None:
+    for seed in range(6):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([RandomAIPlayer(i, seed) for i in range(4)])
+        table = RiskTable(game)
+        while not game.game_state["done"]:
+            p_id = game.game_state["current_player"]
+            game.step()
+            state = game.game_state
+            assert (table.visible == state["visible"]).all()
+            for seat, player_state in state["players"].items():
+                assert all(table.discarded[seat, TILE_TO_ID[tile]] for tile in player_state["discards"])
+                assert table.sets[seat] == sum(len(meld) > 1 for meld in player_state["melds"])
+            discards = state["players"][p_id]["discards"]
+            claimed = state["discard"] or state["kong"]
+            if not state["done"] and not claimed and state["current_player"] != p_id and discards:
+                # not claimed, so let go by every seat but the one who discarded it, until they draw
+                tile_id = TILE_TO_ID[discards[-1]]
+                assert [table.passed[seat, tile_id] for seat in range(4)] == [seat != p_id for seat in range(4)]
+                assert not table.passed[p_id].any()  # it drew (or claimed) this step
+        danger = table.danger
+        assert danger.shape == (4, 34) and (danger >= 0).all() and (danger <= 1).all()
+        game.reset(seed)
+        assert not table.discarded.any() and (table.visible == game.game_state["visible"]).all()
+
+
+def test_danger() -> None:
+    state = build_state({
+        "hands": [None, "123b 456b 789b E", None, None],
+        "melds": [[], ["RRR"], [], []],
+        "discards": ["", "1d 2d", "W W W W", ""]
+    }, seed=0)
+    table = RiskTable()
+    table.rebuild(state)
+    danger = table.danger[1]
+    dot = {tile: TILE_TO_ID[parse_tiles(tile)[0]] for tile in ("2d", "5d", "8d", "9d", "W")}
+    assert danger[dot["W"]] == 0  # every copy is out
+    assert danger[dot["2d"]] < 0.3 * danger[dot["8d"]]  # discarded by the seat
+    assert danger[dot["9d"]] < danger[dot["8d"]] < danger[dot["5d"]]
+    assert table.threat[1] > table.threat[3]
+    obs = table.observation(0)
+    assert obs.shape == (3, 34) and obs.dtype == np.float32 and np.allclose(obs[0], danger)
+    assert table.safest(0, [dot["5d"], dot["W"]]) == dot["W"]
+
+
+def test_folding_player() -> None:
+    # seat 1 has four exposed pungs and seat 0 is far from ready
+    game = build_game({
+        "hands": ["1b 4b 7b 2d 5d 8d 3c 6c 9c E S W N R", "1d", None, None],
+        "melds": [[], ["111c", "222c", "333c", "444c"], [], []],
+        "discards": ["", "5d 8d", "", ""],
+        "discard": True
+    }, seed=0)
+    table = RiskTable(game)
+    assert table.threat[1] >= FOLD_THREAT
+    state = game.game_state
+    hand = state["players"][0]["hand"]
+    folder = HeuristicAIPlayer(0, budget=float("inf"), risk=table)
+    fold = TILE_TO_ID[hand[folder.query_discard(state)]]
+    efficient = TILE_TO_ID[hand[HeuristicAIPlayer(0, budget=float("inf")).query_discard(state)]]
+    assert fold == table.safest(0, [TILE_TO_ID[tile] for tile in hand]) and fold != efficient
+    # a copy of the game does not update the table, the player notices once they part
+    copy = game.copy([folder] + [RandomAIPlayer(i, 0) for i in range(1, 4)])
+    assert copy.risk is None
+    copy.step()
+    with pytest.raises(RuntimeError):
+        folder.query_discard(copy.game_state)
@@ -0,0 +1,66 @@
+import multiprocessing as mp
+import pickle
+import pytest
+from game.constants import NUM_ACTIONS, NUM_OBSERVATIONS
+from game.rollout import RolloutWriter, SharedRolloutBuffer
+
+
+def write_rows(writer: RolloutWriter, num_rows: int) -> None:
+    for i in range(num_rows):
+        writer.add([i % 100] * NUM_OBSERVATIONS, [i % 2] * NUM_ACTIONS, i, writer.worker_id, i % 7 - 3)
+    writer.close()
+
+
+def test_rollout_buffer_processes() -> None:
+    with SharedRolloutBuffer(3, chunk_size=16, num_chunks=2) as buffer:
+        # 100 rows do not fill the last chunk, which close() publishes anyway
+        workers = [mp.Process(target=write_rows, args=(buffer.make_writer(w), 100)) for w in range(3)]
+        for p in workers:
+            p.start()
+        actions: dict[int, list[int]] = {0: [], 1: [], 2: []}
+        while sum(map(len, actions.values())) < 300:
+            item = buffer.get(timeout=10)
+            assert item is not None
+            w, chunk = item
+            assert (chunk["seat"] == w).all()
+            assert (chunk["obs"] == (chunk["action"] % 100)[:, None]).all()
+            assert (chunk["mask"] == (chunk["action"] % 2)[:, None]).all()
+            actions[w] += chunk["action"].tolist()
+            del chunk
+            buffer.release(w)
+        for p in workers:
+            p.join()
+        assert all(p.exitcode == 0 for p in workers)
+        assert actions == {w: list(range(100)) for w in range(3)}
+        assert buffer.pending() == 0
+        assert buffer.get(timeout=0.01) is None
+
+
+def test_rollout_buffer_holds_chunks() -> None:
+    with SharedRolloutBuffer(1, chunk_size=2, num_chunks=3) as buffer:
+        writer = pickle.loads(pickle.dumps(buffer.make_writer(0)))
+        for i in range(4):
+            writer.add([0] * NUM_OBSERVATIONS, [0] * NUM_ACTIONS, i, 0, 0)
+        assert buffer.pending() == 2
+        item = buffer.get(timeout=0)
+        assert item is not None and item[1]["action"].tolist() == [0, 1]
+        # the next chunk of a worker waits until the previous one is released
+        assert buffer.get(timeout=0) is None
+        buffer.release(0)
+        item = buffer.get(timeout=0)
+        assert item is not None and item[1]["action"].tolist() == [2, 3]
+        del item
+        buffer.release(0)
+        writer.close()
+    with pytest.raises(ValueError):
+        SharedRolloutBuffer(1, num_chunks=1)
+
+
+def test_rollout_writer_closes_full_ring() -> None:
+    with SharedRolloutBuffer(1, chunk_size=2, num_chunks=2) as buffer:
+        writer = buffer.make_writer(0)
+        for i in range(4):
+            writer.add([0] * NUM_OBSERVATIONS, [0] * NUM_ACTIONS, i, 0, 0)
+        # every chunk is waiting for the learner, closing does not wait for it
+        writer.close()
+        assert buffer.pending() == 2
@@ -0,0 +1,74 @@
+from collections import Counter
+import numpy as np
+import pytest
+from game.constants import TILE_TO_ID
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+from game.sampler import HiddenStateSampler, get_unseen_counts, CODE_TO_TILE
+
+
+def all_tiles(game: MahjongGame) -> Counter:
+    state = game.game_state
+    tiles = Counter(state["wall"])
+    for player_state in state["players"].values():
+        tiles.update(player_state["hand"])
+        tiles.update(player_state["discards"])
+        tiles.update(tile for meld in player_state["melds"] for tile in meld)
+    return tiles
+
+
+@pytest.fixture
+def game() -> MahjongGame:
+    game = MahjongGame(0, verbose=False)
+    game.set_players([HeuristicAIPlayer(i) for i in range(4)])
+    for _ in range(10):
+        game.step()
+    return game
+
+
+def test_sample_states(game: MahjongGame) -> None:
+    sampler = HiddenStateSampler(game.game_state, 1, seed=0)
+    for state in sampler.sample_states(5):
+        sampled = MahjongGame.from_state(state, verbose=False)
+        assert all_tiles(sampled) == all_tiles(game)
+        assert len(state["wall"]) == len(game.game_state["wall"])
+        assert state["players"][1] == game.game_state["players"][1]
+        for p_id in (0, 2, 3):
+            assert len(state["players"][p_id]["hand"]) == len(game.game_state["players"][p_id]["hand"])
+            assert state["players"][p_id]["melds"] == game.game_state["players"][p_id]["melds"]
+            assert all(tile in TILE_TO_ID for tile in state["players"][p_id]["hand"])
+
+
+def test_sample_arrays(game: MahjongGame) -> None:
+    state = game.game_state
+    hand_counts, walls = HiddenStateSampler(state, 2, seed=0).sample_arrays(100)
+    assert hand_counts.shape == (100, 4, 34)
+    assert walls.shape == (100, len(state["wall"]))
+    for p_id, player_state in state["players"].items():
+        assert (hand_counts[:, p_id].sum(axis=1) == len(player_state["hand"])).all()
+    # hidden hands and wall together hold exactly the unseen tiles
+    unseen = np.array(get_unseen_counts(state, 2))
+    hidden = np.zeros((100, len(unseen)), dtype=int)
+    hidden[:, :34] = hand_counts.sum(axis=1)
+    hidden[:, :34] -= hand_counts[:, 2]
+    for i, wall in enumerate(walls):
+        hidden[i] += np.bincount(wall, minlength=len(unseen))
+    assert (hidden == unseen).all()
+
+
+def test_sampler_seed(game: MahjongGame) -> None:
+    first = HiddenStateSampler(game.game_state, 0, seed=7).sample_arrays(10)
+    second = HiddenStateSampler(game.game_state, 0, seed=7).sample_arrays(10)
+    assert all((a == b).all() for a, b in zip(first, second))
+    states = HiddenStateSampler(game.game_state, 0, seed=7).sample_states(10)
+    assert [[CODE_TO_TILE[code] for code in wall] for wall in first[1]] == [state["wall"] for state in states]
+
+
+def test_sample_games(game: MahjongGame) -> None:
+    players = [HeuristicAIPlayer(i) for i in range(4)]
+    wall = list(game.game_state["wall"])
+    for sampled in HiddenStateSampler(game.game_state, 3, seed=1).sample_games(3, players):
+        while not sampled.game_state["done"]:
+            sampled.step()
+    # the real game is untouched
+    assert game.game_state["wall"] == wall
@@ -0,0 +1,123 @@
+import pytest
+from game.mahjong import MahjongGame
+from game.player import Player, RandomAIPlayer
+from game.scenario import build_game, build_state, format_tiles, parse_tiles, sample_states, snapshot_states
+from game.scenario import to_scenario, validate_state
+from game.tile import Suit, Tile, Value
+from game.utils import GameStateDict
+
+
+class GreedyPlayer(Player):
+    '''Takes the first option offered, in order win, kong, pung, chow, and discards the last tile drawn'''
+
+    def query_meld(self, state: GameStateDict, options: dict[str, list[list[Tile]]]) -> tuple[str, list[list[Tile]]]:
+        for meld_type in ("win", "kong", "pung", "chow"):
+            if options.get(meld_type):
+                return meld_type, options[meld_type] if meld_type == "win" else [options[meld_type][0]]
+        return "", []
+
+    def query_discard(self, state: GameStateDict, sorted_hand: bool = False) -> int:
+        return len(state["players"][self.id]["hand"]) - 1
+
+
+def greedy_players() -> list[Player]:
+    return [GreedyPlayer(i) for i in range(4)]
+
+
+def play(game: MahjongGame) -> None:
+    while not game.game_state["done"]:
+        game.step()
+
+
+def test_notation() -> None:
+    tiles = parse_tiles("123b 55d EEE P 28f")
+    assert tiles[:2] == [Tile(Suit.BAMBOO, Value.ONE), Tile(Suit.BAMBOO, Value.TWO)]
+    assert tiles[6] == Tile(Suit.WIND, Value.EAST) and tiles[8] == Tile(Suit.DRAGON, Value.WHITE)
+    assert tiles[-1] == Tile(Suit.FLOWER, Value.EIGHT)
+    assert parse_tiles(format_tiles(tiles)) == tiles
+    for text in ("12", "b", "9f", "X"):
+        with pytest.raises(ValueError):
+            parse_tiles(text)
+
+
+def test_round_trip() -> None:
+    game = MahjongGame(3, verbose=False)
+    game.set_players([RandomAIPlayer(i, i) for i in range(4)])
+    for _ in range(20):
+        game.step()
+    validate_state(game.game_state)
+    assert build_state(to_scenario(game.game_state)) == game.game_state
+
+
+def test_validation() -> None:
+    with pytest.raises(ValueError):
+        build_state({"hands": ["11111b", None, None, None]})
+    with pytest.raises(ValueError):
+        build_state({"hands": ["123b", None, None, None]})
+    with pytest.raises(ValueError):
+        build_state({"melds": [["124b"], [], [], []]})
+    with pytest.raises(ValueError):
+        build_state({"wall_size": 200})
+    state = build_state({}, seed=0)
+    state["wall"].pop()
+    with pytest.raises(ValueError):
+        validate_state(state)
+
+
+def test_fill() -> None:
+    spec = {"hands": ["123b 456b 789b RRR E", None, None, None], "wall": "E S", "wall_size": 10, "current_player": 0}
+    state = build_state(spec, seed=1)
+    assert len(state["wall"]) == 10 and state["wall"][-2:] == parse_tiles("S E")
+    assert sum(len(state["players"][p]["discards"]) for p in range(4)) > 0
+    assert build_state(spec, seed=1) == state
+
+
+def test_heavenly_hand() -> None:
+    game = build_game({"hands": ["123b 123b 123b RRR WW", None, None, None], "first": True}, greedy_players(), 0)
+    game.step()
+    state = game.game_state["winning_hand_state"]
+    assert state is not None and "heavenly_hand" in state["win_condition"]
+
+
+def test_earthly_hand() -> None:
+    spec = {"hands": ["1d 2d 3d 4d 5d 6d 7d 8d 9d 1c 2c 3c 4c W", "123b 123b 123b RRR W", None, None], "first": True}
+    game = build_game(spec, greedy_players(), 0)
+    game.step()
+    state = game.game_state["winning_hand_state"]
+    assert game.get_winner() == 1
+    assert state is not None and "earthly_hand" in state["win_condition"]
+
+
+def test_rob_kong() -> None:
+    spec = {
+        "hands": ["1c 2c 3c 4c 5c 6c 7c 8c 9c S", "123b 456b 789b 46d EE", None, None],
+        "melds": [["555d"], [], [], []],
+        "wall": "5d",
+        "current_player": 0
+    }
+    game = build_game(spec, greedy_players(), 0)
+    game.step()
+    state = game.game_state["winning_hand_state"]
+    assert game.get_winner() == 1
+    assert state is not None and "rob_kong" in state["win_condition"]
+
+
+def test_last_draw() -> None:
+    spec = {"hands": ["123b 456b 789b RRR E", None, None, None], "wall": "E", "wall_size": 1}
+    game = build_game(spec, greedy_players(), 0)
+    play(game)
+    state = game.game_state["winning_hand_state"]
+    assert game.get_winner() == 0
+    assert state is not None and {"self_pick", "last_draw"} <= set(state["win_condition"])
+
+
+def test_generators() -> None:
+    states = sample_states(50, {"wall_size": 20}, lambda s: len(s["players"][0]["melds"]) > 0, seed=0)
+    assert len(states) == 50 and all(len(s["players"][0]["melds"]) > 0 for s in states)
+    states = snapshot_states(20, lambda s: len(s["wall"]) < 30, seed=0)
+    assert len(states) == 20
+    for state in states:
+        validate_state(state)
+        assert len(state["wall"]) < 30
+    with pytest.raises(RuntimeError):
+        sample_states(1, predicate=lambda s: False, max_attempts=10)
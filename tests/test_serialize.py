@@ -0,0 +1,50 @@
+import pytest
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+from game.serialize import STATE_SIZE, serialize_state, deserialize_state
+from game.utils import GameStateDict, copy_game_state
+
+
+def play_states(seed: int) -> list[GameStateDict]:
+    '''A copy of the state after every step of a game'''
+    game = MahjongGame(seed, verbose=False)
+    game.set_players([HeuristicAIPlayer(i) for i in range(4)])
+    states = [copy_game_state(game.game_state)]
+    while not game.game_state["done"]:
+        game.step()
+        states.append(copy_game_state(game.game_state))
+    return states
+
+
+def test_round_trip() -> None:
+    won = 0
+    for seed in range(20):
+        for state in play_states(seed):
+            buf = serialize_state(state)
+            assert len(buf) == STATE_SIZE
+            assert deserialize_state(bytes(buf)) == state
+        won += state["winning_hand_state"] is not None
+    assert won
+
+
+def test_pool_buffer() -> None:
+    states = play_states(0)
+    pool = bytearray(len(states) * STATE_SIZE)
+    view = memoryview(pool)
+    for i, state in enumerate(states):
+        serialize_state(state, view, i * STATE_SIZE)
+    assert [deserialize_state(view, i * STATE_SIZE) for i in range(len(states))] == states
+    # decoded states continue the same game
+    game = MahjongGame.from_state(deserialize_state(view, 10 * STATE_SIZE), verbose=False)
+    assert game.game_state == states[10]
+    with pytest.raises(ValueError):
+        serialize_state(states[0], view, len(pool) - 1)
+
+
+def test_invalid_states() -> None:
+    state = play_states(1)[0]
+    with pytest.raises(ValueError):
+        deserialize_state(bytes(STATE_SIZE))
+    state["wall"] += state["wall"][:10]
+    with pytest.raises(ValueError):
+        serialize_state(state)
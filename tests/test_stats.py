@@ -0,0 +1,62 @@
+import json
+import random
+from pathlib import Path
+import pytest
+from game.mahjong import MahjongGame
+from game.player import HeuristicAIPlayer
+from game.stats import GameStats, QuantileSketch, play_stats, run
+
+
+def test_sketch() -> None:
+    rng = random.Random(0)
+    values = [rng.expovariate(0.01) for _ in range(5000)] + [0.0] * 100
+    parts = [QuantileSketch(0.01) for _ in range(3)]
+    for i, value in enumerate(values):
+        parts[i % 3].add(value)
+    sketch = parts[0]
+    sketch.merge(parts[1])
+    sketch.merge(parts[2])
+    values.sort()
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1e-9
+    assert sketch.quantile(0.0) == 0.0 and sketch.quantile(1.0) == values[-1]
+    assert QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict()))).quantile(0.5) == sketch.quantile(0.5)
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(0.05))
+
+
+def test_merge() -> None:
+    parts = [play_stats(range(start, start + 10)) for start in (0, 10, 20)]
+    left = GameStats().merge(parts[0]).merge(parts[1]).merge(parts[2])
+    right = GameStats().merge(parts[2]).merge(GameStats().merge(parts[1]).merge(parts[0]))
+    assert left.to_dict() == right.to_dict() == run(30, chunk_size=7).to_dict()
+    summary = left.summary()
+    assert summary["games"] == 30
+    assert abs(summary["draw_rate"] + sum(summary["win_rate_by_seat"]) - 1) < 1e-9
+    assert abs(sum(summary["payoff_by_seat"])) < 1e-9
+    assert summary["turns"]["min"] <= summary["turns"]["p50"] <= summary["turns"]["max"]
+    assert GameStats.from_dict(json.loads(json.dumps(left.to_dict()))).to_dict() == left.to_dict()
+
+
+def test_add_game(tmp_path: Path) -> None:
+    stats = GameStats()
+    game = MahjongGame(1, verbose=False)
+    game.set_players([HeuristicAIPlayer(i, budget=float("inf")) for i in range(4)])
+    with pytest.raises(ValueError):
+        stats.add_game(game)
+    steps = 0
+    while not game.game_state["done"]:
+        game.step()
+        steps += 1
+    stats.add_game(game)
+    winning = game.game_state["winning_hand_state"]
+    assert winning is not None and sum(stats.wins) == 1 and sum(stats.faan) == 1
+    assert stats.turns == game.turns == steps - (winning is None)
+    assert sum(stats.claims.values()) == sum(game.claims.values()) > 0
+    game.reset(2)
+    assert game.turns == 0 and not any(game.claims.values())
+
+    stats.write_json(tmp_path / "stats.json")
+    data = json.loads((tmp_path / "stats.json").read_text())
+    assert data["summary"]["games"] == 1 and GameStats.from_dict(data["state"]).to_dict() == stats.to_dict()
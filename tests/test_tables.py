@@ -0,0 +1,46 @@
+from pathlib import Path
+import numpy as np
+import pytest
+from game import tables, utils
+
+SIZE = 10
+
+
+def squares() -> dict[str, np.ndarray]:
+    return {"squares": np.arange(SIZE) ** 2}
+
+
+@pytest.fixture
+def table_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("HKMAHJONG_TABLES", str(tmp_path))
+    monkeypatch.setattr(tables, "_LOADED", {})
+    monkeypatch.setitem(tables._BUILDERS, "test", squares)
+    return tmp_path
+
+
+def test_load_tables(table_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    loaded = tables.load_tables("test")
+    assert loaded["squares"].tolist() == [i ** 2 for i in range(10)]
+    assert loaded is tables.load_tables("test")
+    path = table_dir / f"test-{tables.table_key('test')}"
+    assert (path / "squares.npy").exists() and (path / "meta.json").exists()
+
+    # a new process maps the file instead of building the tables
+    tables._LOADED.clear()
+    monkeypatch.setattr(tables, "_write_tables", lambda name, path: pytest.fail("tables rebuilt"))
+    loaded = tables.load_tables("test")
+    assert loaded["squares"].base is not None  # a view of the mapping
+    assert loaded["squares"].tolist() == [i ** 2 for i in range(10)]
+
+
+def test_stale_tables(table_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    key = tables.table_key("test")
+    tables.load_tables("test")
+    monkeypatch.setattr(utils, "FAAN", {})
+    assert tables.table_key("test") == key  # the builder does not use game.utils
+    monkeypatch.setitem(globals(), "SIZE", 11)
+    assert tables.table_key("test") != key  # but a constant it uses changed
+    paths = tables.build_all()
+    assert table_dir / f"test-{tables.table_key('test')}" in paths
+    assert not (table_dir / f"test-{key}").exists()
+    assert {path.name.split("-")[0] for path in table_dir.iterdir()} == {"test", "win"}
@@ -1,8 +1,11 @@
 import pytest
+import random
 from game.utils import check_win, check_kong, check_pung, check_chow, score_hand, get_action_mask
+from game.utils import get_observation, get_options_mask, decode_meld_action
+from game.utils import tiles_to_counts, calc_shanten, calc_discard_shanten, calc_ukeire
 from game.utils import HandStateDict, GameStateDict, PlayerStateDict
 from game.tile import Tile, Suit, Value
-from game.constants import NUM_ACTIONS
+from game.constants import NUM_ACTIONS, NUM_TILES, Action, Observation
 
 
 @pytest.fixture
@@ -86,6 +89,18 @@ def test_check_win_discard2(p1: PlayerStateDict) -> None:
     assert set(tuple(i) for i in w) == set(tuple(i) for i in ref)
 
 
+def test_check_win_unordered_hand(p1: PlayerStateDict) -> None:
+    # the middle tile of a chow comes first in the hand
+    t3, t4, t5 = (Tile(Suit.BAMBOO, v) for v in (Value.THREE, Value.FOUR, Value.FIVE))
+    t6 = Tile(Suit.DOT, Value.EIGHT)
+    t7 = Tile(Suit.WIND, Value.WEST)
+    t8 = Tile(Suit.DRAGON, Value.RED)
+    p1["hand"] = [t4, t3, t5] + [t6] * 3 + [t7] * 2 + [t4, t5, t3] + [t8] * 3
+    w, s = check_win(p1, None, True)
+    ref = [[t3, t4, t5]] * 2 + [[t6] * 3] + [[t8] * 3] + [[t7] * 2]
+    assert sorted(tuple(sorted(i)) for i in w) == sorted(tuple(i) for i in ref)
+
+
 def test_check_pung_cp(p1: PlayerStateDict) -> None:
     t1 = Tile(Suit.DOT, Value.ONE)
     p1["hand"] = [t1] * 3
@@ -123,6 +138,14 @@ def test_check_not_chow(p1: PlayerStateDict) -> None:
     assert not check_chow(p1, t2, True)
 
 
+def test_check_chow_nine(p1: PlayerStateDict) -> None:
+    t1 = Tile(Suit.DOT, Value.SEVEN)
+    t2 = Tile(Suit.DOT, Value.EIGHT)
+    t3 = Tile(Suit.DOT, Value.NINE)
+    p1["hand"] = [t1, t2]
+    assert check_chow(p1, t3, False) == [[t1, t2, t3]]
+
+
 def test_score_hand1() -> None:
     t1 = [Tile(Suit.BAMBOO, Value.ONE)]
     t2 = [Tile(Suit.BAMBOO, Value.TWO)]
@@ -265,6 +288,7 @@ def test_action_mask_meld() -> None:
         "done": False,
         "winning_hand_state": None,
         "phase": "meld",  # game phase -- "meld", "discard", informs action mask generation
+        "visible": [0] * NUM_TILES,
     }
     mask = get_action_mask(game_state, 0, t4)
     exp_res = [0] * NUM_ACTIONS
@@ -302,9 +326,163 @@ def test_action_mask_discard() -> None:
         "done": False,
         "winning_hand_state": None,
         "phase": "discard",  # game phase -- "meld", "discard", informs action mask generation
+        "visible": [0] * NUM_TILES,
     }
     mask = get_action_mask(game_state, 0, None)
     exp_res = [0] * NUM_ACTIONS
     exp_res[10:14] = [1, 1, 1, 1]  # discard bamboos
     exp_res[33] = 1  # discard west wind
     assert mask == exp_res
+
+
+def test_observation(p1: PlayerStateDict) -> None:
+    t1 = Tile(Suit.DOT, Value.ONE)
+    t2 = Tile(Suit.WIND, Value.WEST)
+    t3 = Tile(Suit.FLOWER, Value.TWO)
+    p1["hand"] = [t1, t1]
+    p1["melds"] = [[t2] * 3, [t3]]
+    p1["discards"] = [t2]
+    game_state: GameStateDict = {
+        "players": {
+            0: p1
+        },
+        "wall": [t1] * 5,
+        "round_wind": "east",
+        "current_player": 0,
+        "first": False,
+        "discard": False,
+        "kong": False,
+        "double_kong": False,
+        "draw": False,
+        "done": False,
+        "winning_hand_state": None,
+        "phase": "discard",
+        "visible": [0] * NUM_TILES,
+    }
+    obs = get_observation(game_state, 0)
+    assert obs[Observation.HAND + 0] == 2
+    assert obs[Observation.MELDS + 33] == 3
+    assert obs[Observation.DISCARDS + 33] == 1
+    assert obs[Observation.FLOWERS] == 1
+    assert obs[Observation.WALL] == 5
+    assert obs[Observation.PHASE] == 1
+    # seats are relative to the observing player
+    game_state["players"][3] = p1
+    assert get_observation(game_state, 3)[Observation.MELDS + 33] == 3
+
+
+def test_options_mask_round_trip() -> None:
+    t1 = Tile(Suit.BAMBOO, Value.THREE)
+    t2 = Tile(Suit.BAMBOO, Value.FOUR)
+    t3 = Tile(Suit.BAMBOO, Value.FIVE)
+    options = {
+        "win": [],
+        "kong": [],
+        "pung": [[t3] * 3],
+        "chow": [[t1, t2, t3]]
+    }
+    mask = get_options_mask(options)
+    assert [i for i in range(NUM_ACTIONS) if mask[i]] == [43, 68, Action.PASS]
+    assert decode_meld_action(43, options) == ("chow", [[t1, t2, t3]])
+    assert decode_meld_action(68, options) == ("pung", [[t3] * 3])
+    assert decode_meld_action(Action.PASS, options) == ("", [])
+    with pytest.raises(ValueError):
+        decode_meld_action(Action.WIN, options)
+
+
+def test_shanten_win() -> None:
+    t1 = [Tile(Suit.BAMBOO, Value.ONE)]
+    t2 = [Tile(Suit.BAMBOO, Value.TWO)]
+    t3 = [Tile(Suit.BAMBOO, Value.THREE)]
+    t4 = [Tile(Suit.DRAGON, Value.RED)]
+    t5 = [Tile(Suit.WIND, Value.WEST)]
+    counts = tiles_to_counts(t1 * 3 + t2 * 3 + t3 * 3 + t4 * 3 + t5 * 2)
+    assert calc_shanten(counts) == -1
+    # with an exposed meld, only 3 sets and a pair are needed
+    assert calc_shanten(tiles_to_counts(t1 * 3 + t2 * 3 + t3 * 3 + t5 * 2), 1) == -1
+
+
+def test_shanten_ready() -> None:
+    t1 = [Tile(Suit.DOT, Value.ONE)]
+    t2 = [Tile(Suit.DOT, Value.TWO)]
+    t4 = [Tile(Suit.DOT, Value.FOUR)]
+    t5 = [Tile(Suit.DRAGON, Value.RED)]
+    t6 = [Tile(Suit.WIND, Value.WEST)]
+    counts = tiles_to_counts(t1 * 3 + t2 + t4 + t5 * 3 + t6 * 3 + t2 * 2)
+    assert calc_shanten(counts) == 0  # waiting on 3 dot
+
+
+def test_shanten_thirteen_orphans() -> None:
+    counts = [0] * 34
+    for tile_id in (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32):
+        counts[tile_id] = 1
+    counts[0] = 2
+    assert calc_shanten(counts) == 0
+    assert calc_shanten(counts, 1) > 0
+
+
+def test_discard_shanten() -> None:
+    t1 = [Tile(Suit.BAMBOO, Value.ONE)]
+    t2 = [Tile(Suit.BAMBOO, Value.TWO)]
+    t3 = [Tile(Suit.BAMBOO, Value.THREE)]
+    t4 = [Tile(Suit.DRAGON, Value.RED)]
+    t5 = [Tile(Suit.WIND, Value.WEST)]
+    counts = tiles_to_counts(t1 * 3 + t2 * 3 + t3 * 3 + t4 * 2 + t5 * 3)
+    shantens = calc_discard_shanten(counts)
+    for tile_id, shanten in shantens.items():
+        counts[tile_id] -= 1
+        assert calc_shanten(counts) == shanten
+        counts[tile_id] += 1
+    assert min(shantens.values()) == 0
+
+
+def test_ukeire() -> None:
+    t1 = [Tile(Suit.DOT, Value.ONE)]
+    t2 = [Tile(Suit.DOT, Value.TWO)]
+    t4 = [Tile(Suit.DOT, Value.FOUR)]
+    t5 = [Tile(Suit.DRAGON, Value.RED)]
+    t6 = [Tile(Suit.WIND, Value.WEST)]
+    t7 = [Tile(Suit.BAMBOO, Value.NINE)]
+    counts = tiles_to_counts(t1 * 3 + t2 + t4 + t5 * 3 + t6 * 3 + t2 * 2 + t7)
+    visible = [0] * NUM_TILES
+    visible[2] = 3  # three of the 3 dots are gone
+    ukeire = calc_ukeire(counts, visible)
+    # discarding the 9 bamboo leaves a hand waiting on the last 3 dot or one of the three other 4 dots
+    assert ukeire[17] == {"shanten": 0, "accepted": {2: 1, 3: 3}, "live": 4}
+
+    # matches checking every discard and draw one by one
+    rng = random.Random(0)
+    for num_melds in (0, 0, 1, 2):
+        tiles = [tile_id for tile_id in range(NUM_TILES) for _ in range(4)]
+        rng.shuffle(tiles)
+        counts = [0] * NUM_TILES
+        for tile_id in tiles[:14 - 3 * num_melds]:
+            counts[tile_id] += 1
+        ukeire = calc_ukeire(counts, visible, num_melds)
+        assert set(ukeire) == {tile_id for tile_id in range(NUM_TILES) if counts[tile_id]}
+        for discard, entry in ukeire.items():
+            counts[discard] -= 1
+            shanten = calc_shanten(counts, num_melds)
+            accepted = set()
+            for draw in range(NUM_TILES):
+                if counts[draw] < 4:
+                    counts[draw] += 1
+                    if calc_shanten(counts, num_melds) < shanten:
+                        accepted.add(draw)
+                    counts[draw] -= 1
+            counts[discard] += 1
+            assert entry["shanten"] == shanten
+            assert set(entry["accepted"]) == accepted
+            assert entry["live"] == sum(max(4 - visible[i] - counts[i], 0) for i in accepted)
+
+
+def test_ukeire_thirteen_orphans() -> None:
+    counts = [0] * NUM_TILES
+    for tile_id in (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32):
+        counts[tile_id] = 1
+    counts[0] = 2
+    counts[4] = 1
+    ukeire = calc_ukeire(counts, [0] * NUM_TILES)
+    # without the 5 dot the hand waits on the last wind, which nothing else connects to
+    assert ukeire[4]["shanten"] == 0
+    assert ukeire[4]["accepted"] == {33: 4}
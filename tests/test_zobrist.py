@@ -0,0 +1,59 @@
+import pytest
+from game.mahjong import MahjongGame
+from game.player import RandomAIPlayer
+from game.scenario import build_state, parse_tiles
+from game.utils import copy_game_state
+from game.zobrist import TranspositionTable, hash_state
+
+
+def test_incremental_hash() -> None:
+    for seed in range(10):
+        game = MahjongGame(seed, verbose=False)
+        game.set_players([RandomAIPlayer(i, seed) for i in range(4)])
+        keys = set()
+        while not game.game_state["done"]:
+            assert game.hash_key == hash_state(game.game_state)
+            keys.add(game.hash_key)
+            game.step()
+        assert game.hash_key == hash_state(game.game_state)
+        assert game.copy().hash_key == game.hash_key
+        assert len(keys) > 1
+
+
+def test_hash_contents() -> None:
+    game = MahjongGame(0, verbose=False)
+    state = copy_game_state(game.game_state)
+    state["players"][0]["hand"].reverse()
+    state["wall"].reverse()
+    assert hash_state(state) == game.hash_key  # order of the hand and the wall does not matter
+    state["current_player"] = 1
+    assert hash_state(state) != game.hash_key
+    state = copy_game_state(game.game_state)
+    state["players"][0]["discards"].append(state["players"][0]["hand"].pop())
+    assert hash_state(state) != game.hash_key
+
+
+def test_hash_meld_grouping() -> None:
+    # the same exposed tiles as three chows and as three pungs
+    chows = build_state({"melds": [["123b", "123b", "123b"], [], [], []], "wall_size": 20}, seed=0)
+    pungs = copy_game_state(chows)
+    pungs["players"][0]["melds"] = [parse_tiles("111b"), parse_tiles("222b"), parse_tiles("333b")]
+    assert hash_state(chows) != hash_state(pungs)
+
+
+def test_transposition_table() -> None:
+    with pytest.raises(ValueError):
+        TranspositionTable(100)
+    table: TranspositionTable[str] = TranspositionTable(4)
+    assert table.get(1) is None
+    assert table.put(1, "a", depth=5)
+    assert table.get(1) == "a"
+    assert not table.put(5, "b", depth=1)  # same slot, shallower
+    assert table.get(5) is None and table.get(1) == "a"
+    assert table.put(5, "b", depth=5)
+    assert table.get(5) == "b" and table.get(1) is None
+    table.new_search()
+    assert table.put(9, "c", depth=0)  # entries of an earlier search are always replaced
+    stats = table.stats()
+    assert stats["used"] == 1 and stats["rejections"] == 1 and stats["replacements"] == 2
+    assert stats["hits"] == 3 and stats["probes"] == 6